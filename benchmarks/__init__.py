@@ -0,0 +1,16 @@
+"""
+Offline benchmarks of the igstrand pipeline.
+
+  python -m benchmarks generate -o /tmp/corpus -n 1000     synthetic refnum files
+  python -m benchmarks run --sizes 10,1000                 timed scenarios, JSON results
+  python -m benchmarks compare old.json new.json           compare two result files
+
+Run from the repository root. The modules of src/ are imported from there.
+"""
+import os
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(REPO_DIR, "src")
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
@@ -0,0 +1,125 @@
+#!/usr/bin/python3
+"""
+usage: python -m benchmarks generate -o DIR -n DOMAINS [--seed S]
+       python -m benchmarks run [--sizes 10,1000,10000,100000] [--scenarios load,...] [-r 3] [-o results.json]
+       python -m benchmarks compare OLD.json NEW.json
+"""
+import os
+import sys
+import json
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+
+from . import REPO_DIR
+from .corpus import generate_corpus, write_input_file
+from .scenarios import SIZES, scenarios, prepare_corpus, run_scenario
+
+RESULTS_DIR = os.path.join(REPO_DIR, "benchmarks", "results")
+
+
+def git_commit():
+    """
+    (commit id, uncommitted changes) of the repository, (None, None) without git.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout.strip()
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_DIR,
+                                capture_output=True, text=True, check=True).stdout
+        return commit, bool(status.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def run_benchmarks(sizes, scenario_names, repeat, seed, work_dir):
+    commit, dirty = git_commit()
+    run_info = {"created": datetime.now(timezone.utc).isoformat(timespec="seconds"), "commit": commit, "dirty": dirty,
+                "python": platform.python_version(), "platform": platform.platform(), "cpu_count": os.cpu_count(),
+                "seed": seed, "repeat": repeat, "results": []}
+    for size in sizes:
+        size_dir = os.path.join(work_dir, f"corpus_{size}")
+        corpus = prepare_corpus(size_dir, size, seed)
+        for name in scenario_names:
+            result = run_scenario(name, corpus, size_dir, repeat)
+            run_info["results"].append(result)
+            print(f"{name:10s} {size:>7d} domains  best {result['best']:9.3f} s  "
+                  f"{result['domains_per_second']:11.1f} domains/s  {result['note']}")
+        shutil.rmtree(size_dir)
+    return run_info
+
+
+def compare_results(old_file, new_file):
+    with open(old_file) as f:
+        old = json.load(f)
+    with open(new_file) as f:
+        new = json.load(f)
+    old_best = {(result["scenario"], result["size"]): result["best"] for result in old["results"]}
+    print(f"old: {old.get('commit')} {old.get('created')}")
+    print(f"new: {new.get('commit')} {new.get('created')}")
+    print(f"{'scenario':10s} {'size':>7s} {'old s':>10s} {'new s':>10s} {'speedup':>8s}")
+    for result in new["results"]:
+        key = (result["scenario"], result["size"])
+        if key in old_best:
+            print(f"{key[0]:10s} {key[1]:>7d} {old_best[key]:10.3f} {result['best']:10.3f} {old_best[key] / result['best']:7.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description='Offline benchmarks of the igstrand pipeline')
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = subparsers.add_parser("generate", help="write a synthetic refnum corpus and its input file")
+    generate_parser.add_argument('-o', '--output', help='Folder for the *_refnum_igstrand.json files', required=True)
+    generate_parser.add_argument('-n', '--domains', help='Number of Ig domains', type=int, required=True)
+    generate_parser.add_argument('--seed', type=int, default=0)
+
+    run_parser = subparsers.add_parser("run", help="time the scenarios and record the results as JSON")
+    run_parser.add_argument('--sizes', help='Corpus sizes in domains, comma separated', default=",".join(map(str, SIZES)))
+    run_parser.add_argument('--scenarios', help=f"Comma separated: {', '.join(scenarios)}", default=",".join(scenarios))
+    run_parser.add_argument('-r', '--repeat', help='Timed runs per scenario, the best is reported', type=int, default=3)
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--work-dir', help='Folder for the corpora (default: a temporary folder)')
+    run_parser.add_argument('-o', '--output', help='Result file (default: benchmarks/results/<time>_<commit>.json)')
+
+    compare_parser = subparsers.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument('old')
+    compare_parser.add_argument('new')
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        input_lines = generate_corpus(args.output, args.domains, args.seed)
+        input_file = os.path.join(args.output, "input.txt")
+        write_input_file(input_lines, input_file)
+        print(f"{len(input_lines)} domains written to {args.output}, input lines in {input_file}")
+
+    elif args.command == "run":
+        sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+        scenario_names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+        unknown = [name for name in scenario_names if name not in scenarios]
+        if unknown:
+            parser.error(f"Unknown scenario {', '.join(unknown)}")
+
+        work_dir = args.work_dir or tempfile.mkdtemp(prefix="igstrand_bench_")
+        try:
+            run_info = run_benchmarks(sizes, scenario_names, args.repeat, args.seed, work_dir)
+        finally:
+            if not args.work_dir:
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+        output_file = args.output
+        if output_file is None:
+            os.makedirs(RESULTS_DIR, exist_ok=True)
+            stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            output_file = os.path.join(RESULTS_DIR, f"{stamp}_{(run_info['commit'] or 'nogit')[:8]}.json")
+        with open(output_file, "w") as f:
+            json.dump(run_info, f, indent=1)
+        print(f"Results written to {output_file}")
+
+    else:
+        compare_results(args.old, args.new)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+#!/usr/bin/python3
+"""
+Compare the json5 refnum loader with load_json_file (repair + json, json5 fallback).
+
+usage: python benchmarks/bench_json_loader.py [-i ../input/number_mapping_files] [-r 5]
+"""
+import os, sys
+import glob
+import time
+import argparse
+import json5
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import igstrand_domain_mapping
+from igstrand_domain_mapping import load_json_file
+
+
+def load_json_file_json5(file_path):
+    """
+    The loader before the fast path: patch the closing bracket and parse with json5.
+    """
+    with open(file_path, 'r') as file:
+        json_data = file.read().rstrip('\n')
+        if not json_data:
+            return None
+        if not json_data.endswith(']'):
+            json_data += ']'
+        return json5.loads(json_data)
+
+
+def time_loader(loader, file_paths, repeat):
+    """
+    Return the best wall time (seconds) of loading every file once, over repeat runs.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for file_path in file_paths:
+            loader(file_path)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    default_input = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "input", "number_mapping_files")
+    parser = argparse.ArgumentParser(description='Benchmark refnum json loaders')
+    parser.add_argument('-i', '--input', help='Folder with *_refnum_igstrand.json files', default=default_input)
+    parser.add_argument('-r', '--repeat', help='Number of timed runs', type=int, default=5)
+    args = parser.parse_args()
+
+    file_paths = sorted(glob.glob(os.path.join(args.input, "*_refnum_igstrand.json")))
+    if not file_paths:
+        sys.exit(f"No refnum files found in {args.input}")
+    total_bytes = sum(os.path.getsize(file_path) for file_path in file_paths)
+
+    # both loaders must agree before timing them
+    for file_path in file_paths:
+        if load_json_file(file_path) != load_json_file_json5(file_path):
+            sys.exit(f"Loaders disagree on {file_path}")
+
+    igstrand_domain_mapping.json_loader_stats.update({"fast": 0, "json5": 0})
+    json5_time = time_loader(load_json_file_json5, file_paths, args.repeat)
+    fast_time = time_loader(load_json_file, file_paths, args.repeat)
+
+    print(f"{len(file_paths)} files, {total_bytes / 1e6:.2f} MB, best of {args.repeat}")
+    print(f"json5 loader: {json5_time * 1000:10.1f} ms  {total_bytes / json5_time / 1e6:8.2f} MB/s")
+    print(f"fast loader : {fast_time * 1000:10.1f} ms  {total_bytes / fast_time / 1e6:8.2f} MB/s")
+    print(f"speedup     : {json5_time / fast_time:10.1f}x")
+    print(f"parser used : {igstrand_domain_mapping.json_loader_stats}")
@@ -0,0 +1,136 @@
+#!/usr/bin/python3
+"""
+Synthetic *_refnum_igstrand.json files in the format written by refnum.js: one entry
+per line, trailing commas after every list and object, several chains per PDB and
+several Ig domains per chain. The strand layouts follow the IgV, IgC1, IgC2 and IgI
+domains of input/number_mapping_files, so the 2D templates exist for every domain.
+"""
+import os
+import random
+
+# reference structures by Ig type, the refpdbname values of the mapping files
+reference_structures = {
+    "IgV": ["FAB-HEAVY_5esv_V-n1", "FAB-LIGHT_5esv_V-n1", "CD8a_1cd8A_human_V", "LAG3_7tzgD_human_V-n1"],
+    "IgC1": ["FAB-HEAVY_5esv_C1-n2", "FAB-LIGHT_5esv_C1-n2", "LAG3_7tzgD_human_C1-n2", "B2Microglobulin_7phrL_human_C1"],
+    "IgC2": ["CD2_1hnfA_human_C2-n2", "CD3g_6jxrg_human_C2"],
+    "IgI": ["BTLA_2aw2A_human_Iset", "JAM1_1nbqA_human_Iset-n2"],
+}
+
+# (strand, first number, last number) as commonly seen per Ig type
+strand_layouts = {
+    "IgV": [("A", 1546, 1552), ("A'", 1846, 1851), ("B", 2542, 2557), ("C", 3543, 3556), ("C'", 4545, 4556),
+            ("C''", 5546, 5554), ("D", 6545, 6555), ("E", 7545, 7558), ("F", 8544, 8558), ("G", 9543, 9558)],
+    "IgC1": [("A", 1544, 1557), ("B", 2541, 2558), ("C", 3544, 3555), ("C'", 4547, 4551), ("D", 6546, 6560),
+             ("E", 7541, 7557), ("F", 8542, 8556), ("G", 9544, 9556)],
+    "IgC2": [("A", 1545, 1556), ("B", 2542, 2559), ("C", 3543, 3570), ("C'", 4532, 4558), ("E", 7542, 7556),
+             ("F", 8541, 8558), ("G", 9545, 9557), ("G+", 9652, 9658)],
+    "IgI": [("A", 1543, 1551), ("A'", 1846, 1852), ("B", 2542, 2556), ("C", 3545, 3553), ("C'", 4547, 4553),
+            ("D", 6544, 6554), ("E", 7546, 7558), ("F", 8544, 8555), ("G", 9545, 9558)],
+}
+
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+PDB_ID_CHARS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+CHAIN_IDS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+def synthetic_pdb_id(index):
+    """
+    4 character id that is unique per index: "S" and three base 36 digits.
+    """
+    digits = ""
+    for _ in range(3):
+        index, digit = divmod(index, 36)
+        digits = PDB_ID_CHARS[digit] + digits
+    return "S" + digits
+
+
+def make_domain_data(rng, pdb_chain, first_residue, ig_type):
+    """
+    Residue entries of one domain: {"S000_A_12_V": "B2550"}, with loop residues at the
+    strand ends, a few undefined residues and unnumbered residues between the strands.
+    return: (data entries, last residue number)
+    """
+    data = []
+    residue_number = first_residue
+    for strand, first_number, last_number in strand_layouts[ig_type]:
+        first_number += rng.randint(-2, 2)
+        last_number += rng.randint(-2, 2)
+        for number in range(first_number, last_number + 1):
+            # some positions of a strand have no residue
+            if rng.random() < 0.03:
+                continue
+            residue_number += 1
+            residue_id = f"{pdb_chain}_{residue_number}_{rng.choice(AMINO_ACIDS)}"
+            if rng.random() < 0.002:
+                data.append((residue_id, "undefined"))
+            elif number == first_number or number == last_number:
+                data.append((residue_id, f"{strand}{number}_loop"))
+            else:
+                data.append((residue_id, f"{strand}{number}"))
+        residue_number += rng.randint(0, 4) # unnumbered loop residues
+    return data, residue_number
+
+
+def format_refnum_file(pdb_id, chains):
+    """
+    Text of a refnum file as refnum.js writes it.
+    chains: [(pdb_chain, [(domain key, reference, score, seqid, data), ...]), ...]
+    """
+    lines = ["[", f'{{"{pdb_id}": {{"Ig domain" : {1 if chains else 0}, "igs": [']
+    for pdb_chain, domains in chains:
+        lines.append(f'{{"{pdb_chain}": {{')
+        for domain_key, reference, score, seqid, data in domains:
+            lines.append(f'"{domain_key}": {{')
+            data_entries = [f'{{"{residue_id}": "{strand_number}"}},' for residue_id, strand_number in data]
+            lines.append(f'"refpdbname":"{reference}", "score":{score:.6g}, "seqid":{seqid:.6g}, '
+                         f'"nresAlign":{len(data)}, "data": [{data_entries[0]}')
+            lines.extend(data_entries[1:])
+            lines.append("],")
+            lines.append("},")
+        lines.append("}},")
+    lines.append("]}},")
+    lines.extend(["", "", "]"])
+    return "\n".join(lines) + "\n"
+
+
+def generate_corpus(output_dir, num_domains, seed=0, chains_per_pdb=3, domains_per_chain=2, non_ig_every=50):
+    """
+    Write refnum files with num_domains Ig domains in total to output_dir.
+    Every non_ig_every-th PDB has no Ig domain (not counted in num_domains).
+    return: input lines [(pdb, chain, domain), ...] of all generated domains
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    rng = random.Random(seed)
+    ig_types = list(strand_layouts)
+    input_lines = []
+    pdb_index = 0
+    while len(input_lines) < num_domains:
+        pdb_id = synthetic_pdb_id(pdb_index)
+        pdb_index += 1
+        chains = []
+        has_ig = not (non_ig_every and pdb_index % non_ig_every == 0)
+        for chain_id in CHAIN_IDS[:chains_per_pdb] if has_ig else ():
+            pdb_chain = f"{pdb_id}_{chain_id}"
+            domains = []
+            residue_number = rng.randint(0, 20)
+            for domain_order in range(domains_per_chain):
+                if len(input_lines) >= num_domains:
+                    break
+                ig_type = rng.choice(ig_types)
+                first_residue = residue_number + 1
+                data, residue_number = make_domain_data(rng, pdb_chain, residue_number, ig_type)
+                domain_key = f"{pdb_chain},{domain_order}_{first_residue}:{residue_number}:{rng.randint(1000, 4000)}"
+                domains.append((domain_key, rng.choice(reference_structures[ig_type]),
+                                rng.uniform(0.5, 1), rng.uniform(0.1, 1), data))
+                input_lines.append((pdb_id, chain_id, str(domain_order + 1)))
+            if domains:
+                chains.append((pdb_chain, domains))
+        with open(os.path.join(output_dir, f"{pdb_id}_refnum_igstrand.json"), "w") as refnum_file:
+            refnum_file.write(format_refnum_file(pdb_id, chains))
+    return input_lines
+
+
+def write_input_file(input_lines, file_path):
+    with open(file_path, "w") as input_file:
+        for input_line in input_lines:
+            input_file.write(" ".join(input_line) + "\n")
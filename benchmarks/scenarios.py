@@ -0,0 +1,155 @@
+#!/usr/bin/python3
+"""
+Timed scenarios on a synthetic corpus (see corpus.py). Every scenario prepares its
+data untimed and returns a run function that gives the measured seconds of one run.
+
+  load        parse every refnum file (load_json_file)
+  delineate   split the parsed chains into domain records (igdomain_delineate)
+  write_1d    write the AlignmentMatrix of all domains as 1D xlsx
+  write_2d    write the 2D figures; capped at the domains that fit in one sheet
+"""
+import os
+import glob
+import time
+import contextlib
+import numpy as np
+
+from . import REPO_DIR
+from .corpus import generate_corpus
+
+from igstrand_domain_mapping import load_json_file, igdomain_delineate, get_igmap_domain, clear_refnum_cache
+from alignment_matrix import AlignmentMatrix, build_alignment_matrix, merge_column_keys, reindex_columns
+from alignment_1D_igstrand import make_igmap_info, write_1d_excel
+from alignment_2D_igstrand import write_2d_alignment, template_row_col_default
+
+SIZES = (10, 1000, 10000, 100000)
+EXCEL_MAX_COLUMNS = 16384
+TEMPLATE_PATH = os.path.join(REPO_DIR, "input", "igstrand_template", "")
+MATRIX_CHUNK_DOMAINS = 5000
+
+
+def prepare_corpus(work_dir, num_domains, seed=0):
+    """
+    Generate the corpus of num_domains domains in work_dir/number_mapping_files/.
+    """
+    mapping_file_path = os.path.join(work_dir, "number_mapping_files", "")
+    input_lines = generate_corpus(mapping_file_path, num_domains, seed)
+    return {"mapping_file_path": mapping_file_path, "input_lines": input_lines,
+            "files": sorted(glob.glob(mapping_file_path + "*_refnum_igstrand.json"))}
+
+
+@contextlib.contextmanager
+def quiet():
+    """
+    The pipeline prints per domain messages; they go to devnull while timing.
+    """
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def iter_resolved_domains(corpus):
+    """
+    Domain records of the corpus, their residues parsed while the pipeline messages go
+    to devnull; records parse the residues on first access, which would otherwise
+    happen (and print) in the caller.
+    """
+    for input_line in corpus["input_lines"]:
+        with quiet():
+            map_igstrand_info = get_igmap_domain(input_line, "igstrand", corpus["mapping_file_path"])
+            if map_igstrand_info is not None:
+                map_igstrand_info["igstrand_data"]
+        yield input_line, map_igstrand_info
+    clear_refnum_cache()
+
+
+def build_matrix_in_chunks(corpus):
+    """
+    AlignmentMatrix of all corpus domains, built MATRIX_CHUNK_DOMAINS domains at a time
+    so the domain records of large corpora are never all in memory.
+    """
+    chunk, matrices = [], []
+    for pdb_chain_domain, map_igstrand_info in iter_resolved_domains(corpus):
+        chunk.append(make_igmap_info(pdb_chain_domain, map_igstrand_info))
+        if len(chunk) == MATRIX_CHUNK_DOMAINS:
+            matrices.append(build_alignment_matrix(chunk))
+            chunk = []
+    if chunk:
+        matrices.append(build_alignment_matrix(chunk))
+
+    columns = merge_column_keys(*[matrix.columns for matrix in matrices])
+    matrices = [reindex_columns(matrix, columns) for matrix in matrices]
+    return AlignmentMatrix([key for matrix in matrices for key in matrix.row_keys],
+                           [info for matrix in matrices for info in matrix.row_info], columns,
+                           np.concatenate([matrix.residues for matrix in matrices]),
+                           np.concatenate([matrix.loop for matrix in matrices]))
+
+
+def scenario_load(corpus, work_dir):
+    def run():
+        start = time.perf_counter()
+        for file_path in corpus["files"]:
+            load_json_file(file_path)
+        return time.perf_counter() - start
+    return run, len(corpus["input_lines"]), ""
+
+
+def scenario_delineate(corpus, work_dir):
+    def run():
+        elapsed = 0.0
+        with quiet():
+            for file_path in corpus["files"]:
+                json_data = load_json_file(file_path)
+                start = time.perf_counter()
+                for files_ig in json_data:
+                    for pdb_data in files_ig.values():
+                        for ig_parse in pdb_data["igs"]:
+                            for pdb_chain, chain_data in ig_parse.items():
+                                # residues are parsed on first access, read them all
+                                for domain in igdomain_delineate(chain_data, pdb_chain).values():
+                                    domain["igstrand_data"]
+                elapsed += time.perf_counter() - start
+        return elapsed
+    return run, len(corpus["input_lines"]), "parsing excluded"
+
+
+def scenario_write_1d(corpus, work_dir):
+    matrix = build_matrix_in_chunks(corpus)
+    output_file = os.path.join(work_dir, "bench_1D.xlsx")
+
+    def run():
+        start = time.perf_counter()
+        write_1d_excel(matrix, output_file)
+        return time.perf_counter() - start
+    return run, len(matrix.row_keys), f"{matrix.shape[1]} columns"
+
+
+def scenario_write_2d(corpus, work_dir):
+    max_domains = EXCEL_MAX_COLUMNS // template_row_col_default["V_column_range"]
+    resolved_domains = []
+    for pdb_chain_domain, map_igstrand_info in iter_resolved_domains(corpus):
+        if len(resolved_domains) == max_domains:
+            break
+        resolved_domains.append((pdb_chain_domain, map_igstrand_info))
+    output_file = os.path.join(work_dir, "bench_2D.xlsx")
+
+    def run():
+        start = time.perf_counter()
+        with quiet():
+            write_2d_alignment(resolved_domains, TEMPLATE_PATH, output_file, "igstrand", template_row_col_default)
+        return time.perf_counter() - start
+    note = f"capped at {max_domains} domains (sheet column limit)" if len(resolved_domains) < len(corpus["input_lines"]) else ""
+    return run, len(resolved_domains), note
+
+
+scenarios = {"load": scenario_load, "delineate": scenario_delineate, "write_1d": scenario_write_1d, "write_2d": scenario_write_2d}
+
+
+def run_scenario(name, corpus, work_dir, repeat=3):
+    """
+    return: result dict with the seconds of every run and the best throughput
+    """
+    run, num_domains, note = scenarios[name](corpus, work_dir)
+    seconds = [run() for _ in range(repeat)]
+    best = min(seconds)
+    return {"scenario": name, "size": len(corpus["input_lines"]), "domains": num_domains, "seconds": seconds,
+            "best": best, "domains_per_second": num_domains / best if best else None, "note": note}
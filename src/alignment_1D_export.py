@@ -0,0 +1,236 @@
+#!/usr/bin/python3
+"""
+Non-Excel writers of a 1D alignment (AlignmentMatrix): TSV, Parquet, aligned FASTA
+and Stockholm. All of them write row by row (Parquet in row groups), so they stay
+usable for inputs far beyond what an xlsx sheet can hold.
+"""
+import csv
+import json
+import shutil
+import tempfile
+import numpy as np
+
+# output formats of the 1D alignment and their file extension
+export_extensions = {"xlsx": "xlsx", "tsv": "tsv", "parquet": "parquet", "fasta": "fasta", "stockholm": "sto"}
+
+GAP = "-"
+PARQUET_ROW_GROUP = 10000
+
+
+def parse_formats(format_arg):
+    """
+    "xlsx,tsv" -> ["xlsx", "tsv"]; raises ValueError for unknown formats.
+    """
+    formats = [fmt.strip().lower() for fmt in format_arg.split(",") if fmt.strip()]
+    unknown = [fmt for fmt in formats if fmt not in export_extensions]
+    if unknown:
+        raise ValueError(f"Unknown 1D format {', '.join(unknown)}. Supported formats are {', '.join(export_extensions)}.")
+    return formats
+
+
+def _header_value(row_info, header):
+    """
+    Text of a header field as in the spreadsheet: lists (undefined_info) are joined.
+    """
+    value = row_info.get(header, "")
+    if isinstance(value, list):
+        return ",".join(str(elem) for elem in value)
+    return "" if value is None else str(value)
+
+
+def _aligned_rows(matrix, chunk_rows=4096):
+    """
+    Yield (row, aligned sequence) with GAP for positions without residue,
+    converting chunk_rows rows at a time.
+    """
+    gap_code = ord(GAP)
+    for start in range(0, len(matrix.row_keys), chunk_rows):
+        codes = np.where(matrix.present[start:start + chunk_rows], matrix.residues[start:start + chunk_rows], gap_code)
+        for offset, row_codes in enumerate(codes.astype(np.uint8)):
+            yield start + offset, row_codes.tobytes().decode("ascii")
+
+
+class Tsv1DWriter:
+    """
+    One row per domain: the header fields, then one column per igstrand position
+    holding the residue letter (empty when missing).
+    The 1D writers take the rows in matrices on the same columns, one or more write
+    calls, so the two pass pipeline can stream chunks of rows into them.
+    """
+
+    def __init__(self, output_file, columns, headers, name_width=None):
+        self.info_headers = [header for header in headers if header != "structure"]
+        self.tsv_file = open(output_file, "w", newline="")
+        self.writer = csv.writer(self.tsv_file, delimiter="\t", lineterminator="\n")
+        self.writer.writerow(["structure"] + self.info_headers + list(columns))
+
+    def write(self, matrix):
+        for row, aligned in _aligned_rows(matrix):
+            row_info = matrix.row_info[row]
+            self.writer.writerow([matrix.row_keys[row]] + [_header_value(row_info, header) for header in self.info_headers]
+                                 + ["" if letter == GAP else letter for letter in aligned])
+
+    def close(self):
+        self.tsv_file.close()
+
+
+class Fasta1DWriter:
+    """
+    Aligned FASTA; the header fields follow the name as key=value pairs.
+    """
+
+    def __init__(self, output_file, columns, headers, name_width=None):
+        self.info_headers = [header for header in headers if header != "structure"]
+        self.fasta_file = open(output_file, "w")
+
+    def write(self, matrix):
+        for row, aligned in _aligned_rows(matrix):
+            row_info = matrix.row_info[row]
+            description = " ".join(f"{header}={_header_value(row_info, header)}" for header in self.info_headers)
+            self.fasta_file.write(f">{matrix.row_keys[row]} {description}\n{aligned}\n")
+
+    def close(self):
+        self.fasta_file.close()
+
+
+def stockholm_name_width(max_name_length):
+    """
+    Width of the Stockholm name column: the longest "#=GR <name> LP" label and one space,
+    so every sequence and its loop line start at the same column.
+    """
+    return max_name_length + len("#=GR  LP") + 1
+
+
+class Stockholm1DWriter:
+    """
+    Stockholm alignment. The igstrand column keys are listed in #=GF CC lines, the
+    header fields in #=GS lines and the loop residues in a #=GR LP line (L: loop).
+    All #=GS lines come first, the alignment lines wait in a temporary file until close.
+    name_width: width of the name column, stockholm_name_width of the longest row key
+    """
+
+    def __init__(self, output_file, columns, headers, name_width):
+        self.info_headers = [header for header in headers if header != "structure"]
+        self.name_width = name_width
+        self.sto_file = open(output_file, "w")
+        self.sto_file.write("# STOCKHOLM 1.0\n")
+        self.sto_file.write("#=GF DE IgStrand 1D alignment\n")
+        self.sto_file.write(f"#=GF CC columns {' '.join(columns)}\n")
+        self.aligned_file = tempfile.TemporaryFile("w+")
+
+    def write(self, matrix):
+        for row, stru in enumerate(matrix.row_keys):
+            row_info = matrix.row_info[row]
+            for header in self.info_headers:
+                self.sto_file.write(f"#=GS {stru} {header} {_header_value(row_info, header) or '.'}\n")
+        for row, aligned in _aligned_rows(matrix):
+            stru = matrix.row_keys[row]
+            loop_line = np.where(matrix.loop[row] != 0, ord("L"), ord(".")).astype(np.uint8).tobytes().decode("ascii")
+            self.aligned_file.write(f"{stru.ljust(self.name_width)}{aligned}\n")
+            self.aligned_file.write(f"{('#=GR ' + stru + ' LP').ljust(self.name_width)}{loop_line}\n")
+
+    def close(self):
+        self.aligned_file.seek(0)
+        shutil.copyfileobj(self.aligned_file, self.sto_file)
+        self.aligned_file.close()
+        self.sto_file.write("//\n")
+        self.sto_file.close()
+
+
+class Parquet1DWriter:
+    """
+    Parquet file (zstd compressed): header fields as typed columns, one dictionary
+    encoded string column per igstrand position, the column order in the file
+    metadata. Requires pyarrow.
+    """
+
+    def __init__(self, output_file, columns, headers, name_width=None):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet output needs pyarrow: pip install pyarrow")
+        self.pa = pa
+
+        self.numeric_types = {"tmscore": pa.float64(), "seqid": pa.float64(), "nresAlign": pa.int32(), "3Ddomain_order": pa.int32()}
+        self.info_headers = [header for header in headers if header != "structure"]
+        self.fields = [pa.field("structure", pa.string())]
+        self.fields += [pa.field(header, self.numeric_types.get(header, pa.string())) for header in self.info_headers]
+        residue_type = pa.dictionary(pa.uint8(), pa.string())
+        self.fields += [pa.field(column, residue_type) for column in columns]
+        # residue codes are used directly as indices into all byte values
+        self.residue_letters = pa.array([chr(code) for code in range(256)], pa.string())
+        metadata = {"igstrand_columns": json.dumps(list(columns)), "headers": json.dumps(list(headers))}
+        self.schema = pa.schema(self.fields, metadata=metadata)
+        self.writer = pq.ParquetWriter(output_file, self.schema, compression="zstd")
+
+    def _header_column(self, matrix, header, rows):
+        values = [matrix.row_info[row].get(header, "") for row in rows]
+        if header in self.numeric_types:
+            return [None if value in ("", None) else value for value in values]
+        return [_header_value(matrix.row_info[row], header) for row in rows]
+
+    def write(self, matrix):
+        pa = self.pa
+        for start in range(0, len(matrix.row_keys), PARQUET_ROW_GROUP):
+            rows = range(start, min(start + PARQUET_ROW_GROUP, len(matrix.row_keys)))
+            arrays = [pa.array([matrix.row_keys[row] for row in rows], pa.string())]
+            arrays += [pa.array(self._header_column(matrix, header, rows), field.type)
+                       for header, field in zip(self.info_headers, self.fields[1:])]
+            residues = matrix.residues[rows.start:rows.stop]
+            present = matrix.present[rows.start:rows.stop]
+            for col in range(len(matrix.columns)):
+                codes = pa.array(residues[:, col], pa.uint8(), mask=~present[:, col])
+                arrays.append(pa.DictionaryArray.from_arrays(codes, self.residue_letters))
+            self.writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def matrix_records(matrix, headers):
+    """
+    The rows of the matrix as JSON ready dicts: the header fields as in the TSV output
+    plus "aligned", the residue letters of every column with GAP where there is none.
+    """
+    info_headers = [header for header in headers if header != "structure"]
+    records = []
+    for row, aligned in _aligned_rows(matrix):
+        row_info = matrix.row_info[row]
+        record = {"structure": matrix.row_keys[row]}
+        record.update((header, _header_value(row_info, header)) for header in info_headers)
+        record["aligned"] = aligned
+        records.append(record)
+    return records
+
+
+def write_matrix_with(writer_class, matrix, output_file, headers):
+    """
+    Write a whole matrix with one of the 1D writer classes.
+    """
+    name_width = stockholm_name_width(max([len(key) for key in matrix.row_keys], default=0))
+    writer = writer_class(output_file, matrix.columns, headers, name_width)
+    try:
+        writer.write(matrix)
+    finally:
+        writer.close()
+
+
+def write_1d_tsv(matrix, output_file, headers):
+    write_matrix_with(Tsv1DWriter, matrix, output_file, headers)
+
+
+def write_1d_fasta(matrix, output_file, headers):
+    write_matrix_with(Fasta1DWriter, matrix, output_file, headers)
+
+
+def write_1d_stockholm(matrix, output_file, headers):
+    write_matrix_with(Stockholm1DWriter, matrix, output_file, headers)
+
+
+def write_1d_parquet(matrix, output_file, headers):
+    write_matrix_with(Parquet1DWriter, matrix, output_file, headers)
+
+
+export_writers = {"tsv": write_1d_tsv, "parquet": write_1d_parquet, "fasta": write_1d_fasta, "stockholm": write_1d_stockholm}
+export_writer_classes = {"tsv": Tsv1DWriter, "parquet": Parquet1DWriter, "fasta": Fasta1DWriter, "stockholm": Stockholm1DWriter}
@@ -1,15 +1,21 @@
 #!/usr/bin/python3
-import os, sys
-import re
+import os
 import logging
-import pandas as pd
-import json, json5
 from openpyxl.styles import PatternFill, Font
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+import numpy as np
 import argparse
+import tempfile
+from itertools import islice
 
-from icn3d_igstrand_refnum import get_igstrand_reference, check_filename_exist
-from igstrand_domain_mapping import get_igmap_domain
+from domain_resolver import resolve_input_domains, iter_resolved_domains
+from input_reader import read_input_file, stream_input_file, input_save_name
+from alignment_matrix import build_alignment_matrix, merge_column_keys
+from alignment_1D_export import export_extensions, export_writers, export_writer_classes, parse_formats, stockholm_name_width
+from pipeline_profile import profile_stage, profile_count
+from alignment_1D_manifest import load_1d_state, save_1d_state, pending_input_lines, append_alignment_rows
+from residue_profile import ResidueProfile, write_residue_stats, group_by_fields, ALL_DOMAINS
 
 
 logging.basicConfig(
@@ -20,236 +26,369 @@ logging.basicConfig(
     datefmt='%Y-%m-%d %H:%M:%S',
 )
 
-def split_string(number_string):
+color_dict = {"A": "9400D3", "A'": "9400D3", "B": "ba55d3", "C": "0000FF", "C'": "6495ED",
+              "C''": "006400", "D": "00FF00", "E": "FFD700", "F": "FF8C00", "G": "FF0000",
+              "loop": "CCCCCC"}
+
+TWO_PASS_CHUNK_ROWS = 10000 # rows built into one matrix and written at a time by run_1d_two_pass
+
+headers = ['structure', 'refpdbname', 'tmscore','Igtype', '3dD_res_range', 'igD_res_range',  
+    'seqid', 'nresAlign', 'undefined_info']
+
+
+def make_igmap_info(pdb_chain_domain_input, map_igstrand_info):
     """
-    This will split the number into strand number and number part
-    input: "A'1248a"
-    ouput: A', 1248a
+    Key the domain record by pdb_chain_domain; domains without Ig mapping get empty values.
     """
-    match = re.search(r'^([^0-9]*)([0-9].*)$', number_string)
-    return match.groups() if match else None
+    map_igref_key = f"{pdb_chain_domain_input[0]}_{pdb_chain_domain_input[1]}_{pdb_chain_domain_input[2]}" 
+    if not map_igstrand_info:
+        parse_ig_refdata = {map_igref_key: {'3Ddomain_order': "",'3dD_res_range':"", 'igD_res_range':"", 'refpdbname':"", 'tmscore':"", 
+ 'seqid':"", 'nresAlign':"", 'Igtype': "",'undefined_info':[],"igstrand_data":{}}}
+       
+    else:
+        parse_ig_refdata = {map_igref_key:map_igstrand_info}
 
+    return parse_ig_refdata
 
-def sort_dict_by_key(dictionary):
-    """ 
-    Here's a function that sorts a dictionary by its keys based on the following rules:
-    If the key is an integer, sort by the integer value.
-    If the key is an integer followed by a single alphabet letter, 
-    sort by the integer value first, then sort by the alphabet letter.
 
+def make_1d_styles(color_map, font_size=12):
     """
-    sorted_keys = sorted(dictionary.keys(), key=lambda k: tuple(int(x) if x.isdigit() else x for x in re.findall(r'\d+|\D+', k)))
-
-    return {k: dictionary[k] for k in sorted_keys}
+    One font and fill per kind of 1D cell: header, x50 anchor, loop and one per strand
+    color. All cells of a kind share these objects, so no style object is created
+    per cell.
+    color_map: color map dictionary for strands
+    return: {kind of cell: (Font, PatternFill or None)}
+    """
+    def style(hex_code=None, size=font_size):
+        fill = PatternFill(start_color=hex_code, end_color=hex_code, fill_type='solid') if hex_code else None
+        return Font(size=size), fill
 
+    styles = {"header": style(size=font_size + 2), #write header two font larger
+              "anchor": style("FFD700"), # this for last 50 residues
+              "loop": style(color_map["loop"]),
+              "no_color": style('FFFFFF')}
+    for strand, hex_code in color_map.items():
+        if strand != "loop":
+            styles[strand] = style(hex_code)
+    return styles
 
-def read_input_file(file_path):
 
+def set_1d_style(cell, style):
     """
-    Read input file.
+    Set the (font, fill) of make_1d_styles on a cell.
     """
-    input_file = []
-    with open(file_path) as file_inut:
-        for file_lines in file_inut:
-           if file_lines.strip(): 
-                field = file_lines.strip().split(" ")
-                if len(field) == 3:
-                    input_file.append((field[0].upper(), field[1], field[2]))
-
-                else:
-                    print(f"Make sure {field} has three value: pdbid chain domain")
+    cell.font, fill = style
+    if fill is not None:
+        cell.fill = fill
 
-    return input_file
 
-def get_igmap_info(pdb_chain_domain_input, file_path):
+def get_column_styles(matrix, color_map):
     """
-    This will get the information based on the pdb_chain_domain.
-    This will check the files whether exits or not then will download.
+    Style of every residue column: "anchor" for x50 numbers, else its strand color.
     """
-    if get_igstrand_reference(pdb_chain_domain_input[0],  file_path +"number_mapping_files/"): #
-        map_igstrand_info = get_igmap_domain(pdb_chain_domain_input, "igstrand", file_path+"number_mapping_files/")
-        map_igref_key = f"{pdb_chain_domain_input[0]}_{pdb_chain_domain_input[1]}_{pdb_chain_domain_input[2]}" 
-        if not map_igstrand_info:
-            parse_ig_refdata = {map_igref_key: {'3Ddomain_order': "",'3dD_res_range':"", 'igD_res_range':"", 'refpdbname':"", 'tmscore':"", 
-     'seqid':"", 'nresAlign':"", 'Igtype': "",'undefined_info':[],"igstrand_data":{}}}
-           
+    column_styles = []
+    for strand, anchor in zip(matrix.column_strand, matrix.column_anchor):
+        pure_strand = strand.strip("+-_") # this is for color purpose.
+        if anchor:
+            column_styles.append("anchor")
         else:
-            parse_ig_refdata = {map_igref_key:map_igstrand_info}
+            column_styles.append(pure_strand if pure_strand in color_map and pure_strand != "loop" else "no_color")
+    return column_styles
 
-        return parse_ig_refdata
 
-
-def get_all_igrefnum_keys(all_ig_data):
+class Excel1DWriter:
     """
-    This will create all possible keys for given domain to create a
-    alignment.
+    The 1D excel sheet, written in openpyxl write only mode, so rows are streamed to
+    disk as they are appended. Same interface as the writers of alignment_1D_export:
+    write takes matrices on the columns given here, close saves the workbook.
     """
-    all_keys = {re.sub('[a-z]', '', y.split("_")[0]) for i in all_ig_data for x in i for y in i[x]['igstrand_data']if i[x]['igstrand_data']}
-
-    all_mapping_value = {split_string(key)[1]:split_string(key)[0] for key in all_keys}
-     # # sort by key to maintain the sequence
-    sorted_mapping_value = sort_dict_by_key(all_mapping_value)
-    sorted_mapping_value = {value+key:[] for key, value in sorted_mapping_value.items()}
 
-    return sorted_mapping_value
+    def __init__(self, output_file, columns, headers=headers, name_width=None):
+        self.output_file = output_file
+        self.wb = Workbook(write_only=True)
+        self.ws = self.wb.create_sheet()
+        self.styles = make_1d_styles(color_dict, font_size=12)
+        self.column_styles = None
+        #write column headers
+        header_cells = []
+        for header in list(headers) + list(columns):
+            header_cell = WriteOnlyCell(self.ws, value=header)
+            set_1d_style(header_cell, self.styles["header"])
+            header_cells.append(header_cell)
+        self.ws.append(header_cells)
+        self.headers_not_str_undefined = [elem for elem in headers if elem not in ["structure", "undefined_info"]]
+        self.n_columns = len(columns)
+
+    def write(self, matrix):
+        if self.column_styles is None:
+            self.column_styles = np.array(get_column_styles(matrix, color_dict), dtype=object)
+        with profile_stage("cell_filling_1d", items=len(matrix.row_keys)):
+            _append_1d_rows(self.ws, matrix, self.styles, self.column_styles, self.headers_not_str_undefined, self.n_columns)
+
+    def close(self):
+        with profile_stage("save_1d", items=1):
+            self.wb.save(self.output_file)
+
+
+def write_1d_excel(matrix, output_file):
+    """
+    Write an AlignmentMatrix into one excel sheet.
+    """
+    writer = Excel1DWriter(output_file, matrix.columns)
+    writer.write(matrix)
+    writer.close()
 
 
-def fill_excel_cell_residues(ig_data, ignumkey, out_cell, color_map):
+def _append_1d_rows(ws, matrix, styles, column_styles, headers_not_str_undefined, n_columns):
     """
-    ig_data: mapping key and value dictionary
-    ignumkey: C'4548
-    out_cell: destination cell
-    color_map: color map dictionary for strands
-
+    Append one row of cells per domain to the write only sheet.
     """
-    if ignumkey in ig_data:
-        res_id, loop_assign = ig_data[ignumkey]
-        out_cell.value = res_id
-        # if 50 number
-        if key_look[-2:] == "50":
-            hex_code = "FFD700" # this for last 50 residues
-            font = Font(size=16)
-            out_cell.font = font
-            fill = PatternFill(start_color=hex_code, end_color=hex_code, fill_type='solid')
-            out_cell.fill = fill
-            out_cell.font = font1
-        # now check loop.
-        elif loop_assign:
-            hex_code = color_map["loop"]
-            #print(hex_code)
-            fill = PatternFill(start_color=hex_code, end_color=hex_code, fill_type='solid')
-            out_cell.fill = fill
-            out_cell.font = font1
+    for row, stru in enumerate(matrix.row_keys):
+        row_info = matrix.row_info[row]
+        row_cells = [stru] + [row_info[header] for header in headers_not_str_undefined]
+        if isinstance(row_info["undefined_info"], list):
+             # Convert empty list to empty string
+            row_cells.append("")
         else:
-            #rest
-            # find the strand
+            row_cells.append(row_info["undefined_info"])
 
-            pure_strand = split_string(key_look)[0].strip("+-_") # this is for color purpose.
-            hex_code = color_map.get(pure_strand, 'FFFFFF')
-            fill = PatternFill(start_color=hex_code, end_color=hex_code, fill_type='solid')
-            out_cell.fill = fill
-            out_cell.font = font1
+        # now check loop; x50 anchors keep their color
+        row_styles = np.where((matrix.loop[row] != 0) & (column_styles != "anchor"), "loop", column_styles)
+        residue_cells = [None] * n_columns
+        for col in np.flatnonzero(matrix.present[row]):
+            residue_cell = WriteOnlyCell(ws, value=chr(matrix.residues[row, col]))
+            set_1d_style(residue_cell, styles[row_styles[col]])
+            residue_cells[col] = residue_cell
 
+        ws.append(row_cells + residue_cells)
 
 
-    else:
+def open_1d_writers(output_file_base, formats, columns, name_width):
+    """
+    One writer per requested format, output_file_base.<extension>.
+    return: {format: writer}
+    """
+    writers = {}
+    try:
+        for fmt in formats:
+            output_file = f"{output_file_base}.{export_extensions[fmt]}"
+            writer_class = Excel1DWriter if fmt == "xlsx" else export_writer_classes[fmt]
+            writers[fmt] = writer_class(output_file, columns, headers, name_width)
+    except Exception:
+        close_1d_writers(writers)
+        raise
+    return writers
 
-        out_cell.value = ""
 
+def close_1d_writers(writers):
+    for writer in writers.values():
+        writer.close()
 
-    return
 
-def fill_excel_reference_info(sorted_all_igrefnum, ref_headers, ws1, wb1, font_size):
+def write_1d_matrix(matrix, output_file_base, formats=("xlsx",)):
     """
-    This will fill the excel sheet based on the reference information.
+    Write the matrix in every requested format to output_file_base.<extension>.
+    return: list of written files
     """
-    # fill the column header
-    for col, header in enumerate(ref_headers, start=1): #excel col starts from 1
-        ws1.cell(row=1, column=col, value= header)
-        font = Font(size=font_size+2)  #write header two font larger                                                    
-        ws1.cell(row=1, column=col).font = font
-
-    # now fill the residues ig refnum headers. 
-    for col, hd in enumerate(sorted_all_igrefnum):
-        # filled header with number
-        destination_header_cell = ws1.cell(row = 1, column = col+ len(ref_headers) + 1) # first column for header
-        destination_header_cell.value = hd 
-        font = Font(size= font_size+2)
-        destination_header_cell.font = font
-
+    written_files = []
+    for fmt in formats:
+        output_file = f"{output_file_base}.{export_extensions[fmt]}"
+        with profile_stage(f"write_1d_{fmt}", items=len(matrix.row_keys)):
+            if fmt == "xlsx":
+                write_1d_excel(matrix, output_file)
+            else:
+                export_writers[fmt](matrix, output_file, headers)
+        profile_count(f"bytes_written_1d_{fmt}", os.path.getsize(output_file))
+        written_files.append(output_file)
+    return written_files
 
-    return
 
+def run_1d_alignment(resolved_domains, output_file_path, output_save_name, numbering_name, formats=("xlsx",),
+                     mapping_file_path=None, residue_stats=None):
+    """
+    Write the 1D alignment of resolved domains (see resolve_input_domains).
+    formats: any of export_extensions, xlsx is the spreadsheet.
+    mapping_file_path: when given, the state for later --append runs is saved next to the output.
+    residue_stats: "all", "Igtype" or "refpdbname" also writes the residue statistics per position.
+    """
+    print(f"Starting 1D alignment..")
+    all_file_info = [make_igmap_info(pdb_chain_domain, map_igstrand_info) for pdb_chain_domain, map_igstrand_info in resolved_domains]
+    with profile_stage("matrix_build", items=len(all_file_info)):
+        matrix = build_alignment_matrix(all_file_info)
+    output_file_base = f"{output_file_path}1D_mapping_{output_save_name}{numbering_name.lower()}"
+    written_files = write_1d_matrix(matrix, output_file_base, formats)
+    for output_file in written_files:
+        print(f"A 1D alignment file, {os.path.basename(output_file)}, is created in the {output_file_path}")
+    if mapping_file_path is not None:
+        save_1d_state(output_file_base, matrix, [pdb_chain_domain for pdb_chain_domain, _ in resolved_domains],
+                      mapping_file_path, numbering_name)
+    if residue_stats:
+        with profile_stage("residue_stats", items=len(resolved_domains)):
+            profile = ResidueProfile(None if residue_stats == ALL_DOMAINS else residue_stats).add_domains(resolved_domains)
+            for output_file in write_residue_stats(profile, output_file_base):
+                print(f"Residue statistics, {os.path.basename(output_file)}, are created in the {output_file_path}")
+    print()
+
+
+def run_1d_append(input_file_data, input_file_path, output_file_path, output_save_name, numbering_name, formats=("xlsx",),
+                  **resolve_options):
+    """
+    Add the input lines that are not in the saved 1D alignment yet, read the rows whose
+    mapping file changed again and write the outputs. Without a saved state every line
+    is resolved, as in run_1d_alignment.
+    resolve_options: passed on to resolve_input_domains (jobs, timeout, use_worker, workers)
+    """
+    mapping_file_path = input_file_path + "number_mapping_files/"
+    output_file_base = f"{output_file_path}1D_mapping_{output_save_name}{numbering_name.lower()}"
+    manifest, saved_matrix = load_1d_state(output_file_base, numbering_name)
+    if manifest is None:
+        resolved_domains = resolve_input_domains(input_file_data, input_file_path, numbering_name, **resolve_options)
+        run_1d_alignment(resolved_domains, output_file_path, output_save_name, numbering_name, formats, mapping_file_path)
+        return
+
+    new_lines, changed_rows, sources = pending_input_lines(manifest, input_file_data, mapping_file_path)
+    saved_lines = [tuple(row["input"]) for row in manifest["rows"]]
+    changed_lines = [saved_lines[row] for row in changed_rows]
+    print(f"Starting 1D alignment..")
+    print(f"Appending to 1D alignment: {len(saved_lines)} saved rows, {len(new_lines)} new, {len(changed_lines)} with a changed mapping file.")
+
+    # saved lines never hold "*", so the changed lines resolve one to one; a new "pdb chain *"
+    # line may list domains that are saved already
+    resolved_domains = resolve_input_domains(changed_lines + new_lines, input_file_path, numbering_name, **resolve_options)
+    changed_domains = resolved_domains[:len(changed_lines)]
+    saved_line_set = set(saved_lines)
+    new_domains = [(pdb_chain_domain, map_igstrand_info) for pdb_chain_domain, map_igstrand_info in resolved_domains[len(changed_lines):]
+                   if tuple(pdb_chain_domain) not in saved_line_set]
+    new_lines = [pdb_chain_domain for pdb_chain_domain, _ in new_domains]
+    with profile_stage("matrix_build", items=len(resolved_domains)):
+        matrix = append_alignment_rows(saved_matrix, changed_rows,
+                                       [make_igmap_info(*resolved) for resolved in changed_domains],
+                                       [make_igmap_info(*resolved) for resolved in new_domains])
+
+    written_files = write_1d_matrix(matrix, output_file_base, formats)
+    for output_file in written_files:
+        print(f"A 1D alignment file, {os.path.basename(output_file)}, is created in the {output_file_path}")
+    save_1d_state(output_file_base, matrix, saved_lines + new_lines, mapping_file_path, numbering_name, sources)
+    print()
+
+
+def _read_spooled_lines(spool_file_name):
+    """
+    Yield (pdb_chain_domain, resolved) of the lines spooled by run_1d_two_pass.
+    """
+    with open(spool_file_name) as spool_file:
+        for spool_line in spool_file:
+            pdb, chain, domain, resolved = spool_line.rstrip("\n").split("\t")
+            yield (pdb, chain, domain), resolved == "1"
 
 
+def run_1d_two_pass(input_lines, input_file_path, output_file_path, output_save_name, numbering_name, formats=("xlsx",),
+                    residue_stats=None, chunk_rows=TWO_PASS_CHUNK_ROWS, **resolve_options):
+    """
+    Write the 1D alignment without holding all domains in memory.
+    Pass 1 resolves the input lines to collect the union of the column keys and the
+    longest row name, and spools the expanded lines to a temporary file. Pass 2 reads
+    the domains of the spooled lines again and writes chunk_rows rows at a time to every
+    format, so memory depends on the chunk size and the columns, not on the number of domains.
+    input_lines: iterable of (pdb, chain, domain), read once (stdin works)
+    resolve_options: passed on to resolve_input_domains (jobs, timeout, use_worker, workers)
+    No state for --append is saved, it would hold the whole alignment.
+    """
+    print(f"Starting 1D alignment (two pass)..")
+    column_keys = set()
+    max_name_length = n_rows = 0
+    spool_file = tempfile.NamedTemporaryFile("w", prefix="input_1d_", suffix=".tsv", delete=False)
+    try:
+        # lines without a domain record are spooled as such, pass 2 does not try them again
+        with spool_file, profile_stage("pass1_columns") as stage:
+            for pdb_chain_domain, map_igstrand_info in iter_resolved_domains(input_lines, input_file_path, numbering_name,
+                                                                            **resolve_options):
+                spool_file.write("\t".join(pdb_chain_domain) + ("\t1\n" if map_igstrand_info else "\t0\n"))
+                max_name_length = max(max_name_length, len("_".join(pdb_chain_domain)))
+                if map_igstrand_info:
+                    column_keys.update(map_igstrand_info["igstrand_data"])
+                n_rows += 1
+            stage.items = n_rows
+        columns = merge_column_keys(column_keys)
+        print(f"1D alignment: {n_rows} rows, {len(columns)} columns.")
+
+        output_file_base = f"{output_file_path}1D_mapping_{output_save_name}{numbering_name.lower()}"
+        profile = ResidueProfile(None if residue_stats == ALL_DOMAINS else residue_stats) if residue_stats else None
+        writers = open_1d_writers(output_file_base, formats, columns, stockholm_name_width(max_name_length))
+        try:
+            with profile_stage("pass2_write", items=n_rows):
+                spooled_lines = _read_spooled_lines(spool_file.name)
+                while True:
+                    chunk = list(islice(spooled_lines, chunk_rows))
+                    if not chunk:
+                        break
+                    resolved_domains = iter(resolve_input_domains([pdb_chain_domain for pdb_chain_domain, resolved in chunk if resolved],
+                                                                  input_file_path, numbering_name, **resolve_options))
+                    chunk = [next(resolved_domains) if resolved else (pdb_chain_domain, None) for pdb_chain_domain, resolved in chunk]
+                    matrix = build_alignment_matrix([make_igmap_info(*resolved) for resolved in chunk], columns)
+                    for writer in writers.values():
+                        writer.write(matrix)
+                    if profile is not None:
+                        profile.add_domains(chunk)
+        finally:
+            close_1d_writers(writers)
+    finally:
+        os.remove(spool_file.name)
+
+    for fmt in formats:
+        output_file = f"{output_file_base}.{export_extensions[fmt]}"
+        profile_count(f"bytes_written_1d_{fmt}", os.path.getsize(output_file))
+        print(f"A 1D alignment file, {os.path.basename(output_file)}, is created in the {output_file_path}")
+    if profile is not None:
+        for output_file in write_residue_stats(profile, output_file_base):
+            print(f"Residue statistics, {os.path.basename(output_file)}, are created in the {output_file_path}")
+    print()
 
 
 if __name__== "__main__":
 
-    input_file_path = os.getenv('input_file_path')
-    output_file_path = os.getenv('output_file_path')
-    node_js_file_path = os.getenv('node_js_file_path')
-    numbering_name = os.getenv('numbering_name')
-        
-    # input_file_path = "../input/"
-    # output_file_path = "../output/"
-    # node_js_file_path = "node_js_script/"
-    # numbering_name = "igstrand"
+    input_file_path = os.getenv('input_file_path', "../input/")
+    output_file_path = os.getenv('output_file_path', "../output/")
+    node_js_file_path = os.getenv('node_js_file_path', "node_js_script/")
+    numbering_name = os.getenv('numbering_name', "igstrand")
 
     parser = argparse.ArgumentParser(description='Process input file')
-    parser.add_argument('-f', '--file', help='Input file name', required=True)
+    parser.add_argument('-f', '--file', help='Input file name, - reads stdin', required=True)
+    parser.add_argument('--dedupe', help='Skip repeated pdbid chain domain lines', action='store_true')
+    parser.add_argument('--sort-by-pdb', help='Group the input lines by pdb id', action='store_true')
+    parser.add_argument('-j', '--jobs', help='Parallel node processes creating missing mapping files', type=int, default=4)
+    parser.add_argument('--timeout', help='Seconds allowed to create one mapping file', type=float, default=600)
+    parser.add_argument('--worker', help='Keep node worker processes running instead of one node run per pdb', action='store_true')
+    parser.add_argument('--node-script', help='refnum.js creating the missing mapping files (e.g. refnum_worker_stub.js for offline tests)', default="./refnum.js")
+    parser.add_argument('--workers', help='Processes parsing the mapping files, input grouped by pdb (0: no extra processes)', type=int, default=0)
+    parser.add_argument('--format', help=f"1D output formats, comma separated: {', '.join(export_extensions)}", default="xlsx")
+    parser.add_argument('--append', help='Only add the lines that are not in the existing 1D output of this input file', action='store_true')
+    parser.add_argument('--residue-stats', help='Also write residue statistics per position, for all domains or per group',
+                        nargs='?', const=ALL_DOMAINS, choices=(ALL_DOMAINS,) + group_by_fields)
+    parser.add_argument('--two-pass', help='Stream the domains twice instead of holding them all in memory (no --append)', action='store_true')
     args = parser.parse_args()
+    try:
+        formats = parse_formats(args.format)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.two_pass and args.append:
+        parser.error("--two-pass can not be combined with --append")
     
 
-    input_file_data  = read_input_file(args.file)
-
-    
-    output_save_name = args.file.split(".")[0]
-
-    # deal the color
-
-  
-    color_dict = {"A": "9400D3", "A'": "9400D3", "B": "ba55d3", "C": "0000FF", "C'": "6495ED",
-              "C''": "006400", "D": "00FF00", "E": "FFD700", "F": "FF8C00", "G": "FF0000",
-              "loop": "CCCCCC"}
-
-    headers = ['structure', 'refpdbname', 'tmscore','Igtype', '3dD_res_range', 'igD_res_range',  
-    'seqid', 'nresAlign', 'undefined_info']
-
-    # input_file_data = [("7LQ7", "H", 1), 
-    #                 ("1CD8", "A", "1"), 
-    #                 ("7N4I", "L", "1"),
-    #                 ("1RHH", "B", "1"),
-    #                 ("5ESV", "A", "1"),
-    #                 ("5ESV", "B", "1")]
-    
-    wb = Workbook()
-    ws = wb.active
-    all_file_info = []
-
-    print(f"Starting 1D alignment..")
-
-    for pdb_chain_domain in input_file_data:
-        
-        all_file_info.append(get_igmap_info(pdb_chain_domain, input_file_path))
-            
-    sorted_all_mapping_value = get_all_igrefnum_keys(all_file_info)
-    #write column headers
-
-    fill_excel_reference_info(sorted_all_mapping_value, headers, ws, wb, font_size=12)
-
-  
-
-
-    for row_val, file in enumerate(all_file_info):
-
-        for stru in file:
-            font1 = Font(size=12)
-            ws.cell(row = row_val+2, column = 1, value = stru)
-            #print(file[stru])
-            igstrand_data = file[stru]["igstrand_data"]
-
-            headers_not_str_undefined = [elem for elem in headers if elem not in ["structure", "undefined_info"]]
-
-
-            [ws.cell(row=row_val+2, column=col, value=file[stru][header]) for col, header in enumerate(headers_not_str_undefined, start=2)] 
-            if isinstance(file[stru]["undefined_info"], list):
-                 # Convert empty list to empty string
-                ws.cell(row = row_val+2, column = len(headers), value = "")
-            else:
-                ws.cell(row = row_val+2, column = len(headers), value = file[stru]["undefined_info"])
-
-            for col, key_look in enumerate(sorted_all_mapping_value):
-                destination_cell = ws.cell(row = row_val+2, column = col+ len(headers) + 1)
-                fill_excel_cell_residues(igstrand_data, key_look, destination_cell, color_dict)
-
-    wb.save(f"{output_file_path}1D_mapping_{output_save_name}{numbering_name.lower()}.xlsx")
-print(f"A 1D alignment file, 1D_mapping_{numbering_name.lower()}.xlsx, is created in the {output_file_path}")
-print()
-
-
-
-            
-
-
-    # 
\ No newline at end of file
+    output_save_name = input_save_name(args.file)
+    resolve_options = {"jobs": args.jobs, "timeout": args.timeout, "use_worker": args.worker, "workers": args.workers,
+                       "node_script": args.node_script}
+    if args.two_pass:
+        input_lines = stream_input_file(args.file, args.dedupe, args.sort_by_pdb)
+        run_1d_two_pass(input_lines, input_file_path, output_file_path, output_save_name, numbering_name, formats,
+                        args.residue_stats, **resolve_options)
+    elif args.append:
+        if args.residue_stats:
+            print("Residue statistics are not written by --append runs, see residue_profile.py compute.")
+        run_1d_append(read_input_file(args.file, args.dedupe, args.sort_by_pdb), input_file_path, output_file_path,
+                      output_save_name, numbering_name, formats, **resolve_options)
+    else:
+        input_file_data  = read_input_file(args.file, args.dedupe, args.sort_by_pdb)
+        resolved_domains = resolve_input_domains(input_file_data, input_file_path, numbering_name, **resolve_options)
+        run_1d_alignment(resolved_domains, output_file_path, output_save_name, numbering_name, formats,
+                         residue_stats=args.residue_stats)
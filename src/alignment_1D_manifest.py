@@ -0,0 +1,136 @@
+#!/usr/bin/python3
+"""
+State of a written 1D alignment, kept next to it for --append runs:
+
+  1D_mapping_<name>igstrand.manifest.json  input lines of every row, the mapping file
+      each PDB was read from (size, mtime, hash), the column keys and the row fields
+  1D_mapping_<name>igstrand.matrix.npz      residues and loop flags of the rows
+
+An --append run resolves only the input lines that are not in the manifest and the
+lines whose mapping file changed, and writes the outputs again from the saved rows.
+"""
+import os
+import json
+import hashlib
+import numpy as np
+
+from mapping_files import find_mapping_file, read_mapping_bytes
+from alignment_matrix import AlignmentMatrix, build_alignment_matrix, merge_column_keys, reindex_columns
+
+MANIFEST_VERSION = 1
+
+
+def file_signature(pdb_name, mapping_file_path, previous=None):
+    """
+    {"size", "mtime_ns", "hash"} of the mapping file of pdb_name, None when it does not
+    exist or can not be read. The hash is of the decompressed content, so moving the file to another
+    layout (mapping_files.py migrate) does not count as a change. The hash of previous
+    is reused when size and mtime are unchanged.
+    """
+    file_path = find_mapping_file(pdb_name, mapping_file_path)
+    try:
+        stat = os.stat(file_path) if file_path else None
+    except FileNotFoundError:
+        stat = None
+    if stat is None:
+        return None
+    if previous and previous["size"] == stat.st_size and previous["mtime_ns"] == stat.st_mtime_ns:
+        return dict(previous)
+    try:
+        hasher = hashlib.blake2b(read_mapping_bytes(file_path), digest_size=16)
+    except ImportError: # a .zst file without the zstandard package, its rows have no mapping either
+        return None
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": hasher.hexdigest()}
+
+
+def save_1d_state(output_file_base, matrix, input_lines, mapping_file_path, numbering_name, sources=None):
+    """
+    Write the manifest and matrix files of output_file_base.
+    input_lines: (pdb, chain, domain) of every matrix row
+    sources: known signatures by pdb, so unchanged files are not hashed again
+    """
+    sources = dict(sources or {})
+    for pdb_name in {input_line[0] for input_line in input_lines}:
+        sources[pdb_name] = file_signature(pdb_name, mapping_file_path, sources.get(pdb_name))
+
+    manifest = {"version": MANIFEST_VERSION, "numbering_name": numbering_name, "columns": list(matrix.columns),
+                "rows": [{"input": list(input_line), "structure": stru, "info": row_info}
+                         for input_line, stru, row_info in zip(input_lines, matrix.row_keys, matrix.row_info)],
+                "sources": sources}
+
+    # temporary names first, so an interrupted run leaves the previous state
+    tmp_matrix_file = f"{output_file_base}.matrix.{os.getpid()}.tmp.npz"
+    np.savez_compressed(tmp_matrix_file, residues=matrix.residues, loop=matrix.loop)
+    tmp_manifest_file = f"{output_file_base}.manifest.json.{os.getpid()}.tmp"
+    with open(tmp_manifest_file, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_matrix_file, f"{output_file_base}.matrix.npz")
+    os.replace(tmp_manifest_file, f"{output_file_base}.manifest.json")
+
+
+def load_1d_state(output_file_base, numbering_name):
+    """
+    return: (manifest, AlignmentMatrix of the saved rows), or (None, None) when there is
+    no usable state for output_file_base
+    """
+    try:
+        with open(f"{output_file_base}.manifest.json") as f:
+            manifest = json.load(f)
+        with np.load(f"{output_file_base}.matrix.npz") as saved_matrix:
+            residues, loop = saved_matrix["residues"], saved_matrix["loop"]
+    except (FileNotFoundError, ValueError, KeyError) as e:
+        print(f"No previous 1D alignment state for {os.path.basename(output_file_base)}: {e}")
+        return None, None
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("numbering_name") != numbering_name or \
+            residues.shape != (len(manifest["rows"]), len(manifest["columns"])):
+        print(f"The 1D alignment state of {os.path.basename(output_file_base)} does not match this version, starting again.")
+        return None, None
+
+    matrix = AlignmentMatrix([row["structure"] for row in manifest["rows"]], [row["info"] for row in manifest["rows"]],
+                             manifest["columns"], residues, loop)
+    return manifest, matrix
+
+
+def pending_input_lines(manifest, input_file_data, mapping_file_path):
+    """
+    Split the work of an --append run.
+    return: new input lines (not in the manifest, input order), saved rows whose mapping
+    file changed (row indexes) and the current signatures of the saved sources
+    """
+    sources = {}
+    changed_pdbs = set()
+    for pdb_name, signature in manifest["sources"].items():
+        current = file_signature(pdb_name, mapping_file_path, signature)
+        sources[pdb_name] = current
+        # a missing file keeps the saved rows; a changed or newly created file is read again
+        if current is not None and (signature is None or current["hash"] != signature["hash"]):
+            changed_pdbs.add(pdb_name)
+
+    saved_lines = {tuple(row["input"]) for row in manifest["rows"]}
+    new_lines = [input_line for input_line in input_file_data if tuple(input_line) not in saved_lines]
+    changed_rows = [row for row, row_data in enumerate(manifest["rows"]) if row_data["input"][0] in changed_pdbs]
+    return new_lines, changed_rows, sources
+
+
+def append_alignment_rows(saved_matrix, changed_rows, changed_file_info, new_file_info):
+    """
+    Saved matrix with changed_rows replaced and the new rows appended. The column set
+    is extended when the new rows bring new igstrand positions.
+    changed_file_info / new_file_info: [{"5ESV_A_1": domain record}, ...] as made by make_igmap_info
+    """
+    update_matrix = build_alignment_matrix(changed_file_info + new_file_info)
+    columns = merge_column_keys(saved_matrix.columns, update_matrix.columns)
+    matrix = reindex_columns(saved_matrix, columns)
+    update_matrix = reindex_columns(update_matrix, columns)
+
+    n_changed = len(changed_rows)
+    for update_row, row in enumerate(changed_rows):
+        matrix.row_keys[row] = update_matrix.row_keys[update_row]
+        matrix.row_info[row] = update_matrix.row_info[update_row]
+    matrix.residues[changed_rows] = update_matrix.residues[:n_changed]
+    matrix.loop[changed_rows] = update_matrix.loop[:n_changed]
+
+    return AlignmentMatrix(matrix.row_keys + update_matrix.row_keys[n_changed:],
+                           matrix.row_info + update_matrix.row_info[n_changed:], columns,
+                           np.concatenate([matrix.residues, update_matrix.residues[n_changed:]]),
+                           np.concatenate([matrix.loop, update_matrix.loop[n_changed:]]))
@@ -1,27 +1,33 @@
 #!/usr/bin/python3
 
-import re, os, json
+import os, json
+import pickle
+import time
 from typing import Optional, Tuple, Dict, List
+import openpyxl
 from openpyxl import Workbook
 from openpyxl.reader.excel import load_workbook
 from openpyxl.worksheet.worksheet import Worksheet
-from openpyxl.styles import Font, Border,  PatternFill, Alignment
+from openpyxl.styles import Font, PatternFill, Alignment
 from copy import copy
 import argparse
 
 
 
-from igstrand_domain_mapping import get_igmap_domain
-from icn3d_igstrand_refnum import get_igstrand_reference, check_filename_exist
+from igstrand_number import POSITION_MASK, encode_igstrand_number, igstrand_fields, strand_name
+from pipeline_profile import profile_stage, profile_count
+from domain_resolver import resolve_input_domains
+from input_reader import read_input_file, input_save_name
 
-def split_string(number_string):
-    """
-    This will split the number into strand number and number part
-    input: "A'1248a"
-    ouput: A', 1248a
-    """
-    match = re.search(r'^([^0-9]*)([0-9].*)$', number_string)
-    return match.groups() if match else None
+color_dict = {"1": "9400D3",  "2": "ba55d3", "3": "0000FF", "4": "6495ED",
+              "5": "006400", "6": "00FF00", "7": "FFD700", "8": "FF8C00", "9": "FF0000",
+              "loop": "CCCCCC"}
+
+# template size in rows and columns; {Igtype}_row_range / {Igtype}_column_range
+# can be added, V_ ranges are used for all other types.
+template_row_col_default = {
+    "V_column_range": 21,
+    "V_row_range" : 47}
 
 def open_template_file(ig_type: str, numbering_name: str, file_path: str) -> Tuple[Worksheet, Workbook]:
     """
@@ -46,211 +52,357 @@ def open_template_file(ig_type: str, numbering_name: str, file_path: str) -> Tup
 
 
 
-def modify_excel_residue_mapping(id_chain_domain: Tuple[str, str, str], map_res: Dict[str, Tuple[str, str]],ref_struct: str, ig_type: str, ws: Worksheet, ws_out: Worksheet, template_length: Tuple[int, int], num_columns: int, color_dict: Dict[str, str]) -> Worksheet:
+# Compiled templates, see load_compiled_template. Bump the version when the
+# compiled form changes so old cache files are rebuilt.
+TEMPLATE_CACHE_VERSION = 4
+TEMPLATE_CACHE_DIR = "__template_cache__"
+_compiled_templates = {}
+
+
+def is_igstrand_number_cell(cell_value) -> bool:
     """
-    Fill the residues information in the Excel worksheet based on the provided mapping and write the modified values to a new Excel file with shifted columns.
+    Template cells holding a 4 character igstrand number such as 1550; they stay
+    empty when the domain has no residue there.
+    """
+    return bool(cell_value) and len(str(cell_value)) == 4 and str(cell_value)[0].isdigit()
+
+
+def compile_template(ws: Worksheet, template_length: Tuple[int, int]) -> Dict:
+    """
+    Read the template rectangle once into plain values and style objects, plus
+    the indexes modify_excel_residue_mapping needs.
 
     Args:
-    - id_chain_domain (Tuple[str, str, str]): A tuple containing id, chain, and domain information.
-    - map_res (Dict[str, Tuple[str, bool]]): A dictionary containing residue mapping information.
-    - ref_struct (str): reference structure mapping name.
-    - ig_type (str): The type of Ig.
-    - ws (Worksheet): The Excel worksheet to modify.
-    - ws_out: Worksheet: destination worksheet to write.
-    - template_range (tuple[int, int]):
-    - num_columns (int): The number of columns to shift.
-    - output_file_path (str): The path to save the modified Excel file.
+    - ws (Worksheet): template worksheet.
+    - template_length (Tuple[int, int]): rows and columns of the template.
 
     Returns:
-    - Worksheet
-    # """
-    # row_range = template_range["row_range"] # may be we can do also automation.
-    # col_range = template_range[f"{ig_type}_column_range"]
-
-    # Shift columns to the right and fill the new columns
+    - Dict: "cells" holds (row, col, value, fill, font, border) for every cell of the
+      rectangle, "styles" the distinct (fill, font, border) of the cells and
+      "cell_styles" the index of each cell's style in it,
+      "static_values" the value written when no residue is mapped,
+      "number_cells" maps the igstrand number code (igstrand_number, no strand) of
+      cells starting with a digit to cell indexes and "text_cells" maps the other
+      string values to cell indexes.
+    """
+    cells = []
+    styles = {}
+    cell_styles = []
+    static_values = []
+    number_cells = {}
+    text_cells = {}
     for row in range(1, template_length[0] + 1):
         for col in range(template_length[1], 0, -1):
             source_cell = ws.cell(row=row, column=col)
-       
-            new_column = col + num_columns
-            destination_cell = ws_out.cell(row=row, column=new_column)
             cell_value = source_cell.value
-            # color code based on strand not on template so
-            # if len(cell_value)== 4 and cell_value[0] in [str(i) for i in range(10)]: # this means this is igstrand number.
-            
-
-            res_id, loop_assign = map_res.get(str(cell_value), ("", False))
-            if res_id:
-                if loop_assign:
-                    color_code = color_dict["loop"]
-                else: # residues exits.
-                    if str(cell_value)[-2:] == "50":
-                        color_code= "FFFF00"
-                    else: #number exits but not anchor
-                        color_code = color_dict[str(cell_value)[0]] # based on first digit #you can copy color also from template. 
-                destination_cell.value = res_id
-                destination_cell.fill = PatternFill(start_color= color_code, end_color=color_code, fill_type='solid')
-
-            else:
-                destination_cell.fill  = copy(source_cell.fill)
-
-                if cell_value  == ig_type:
-                    destination_cell.value =ig_type +"_" +"_".join([str(elem) for elem in id_chain_domain])
-                    destination_cell_next = ws_out.cell(row=row, column=new_column+3) # write in next 6th column
-                    destination_cell_next.value = ref_struct
-                    destination_cell_next.font = Font(bold=True, size=16)
- 
-                    
-                    
-                elif cell_value and len(str(cell_value))== 4 and str(cell_value)[0] in [str(i) for i in range(10)]: 
-                    destination_cell.value = ""
-
-                else:
-                    destination_cell.value = cell_value
-                    
-            destination_cell.alignment = Alignment(horizontal='center')
-            destination_cell.font = copy(source_cell.font)
-            destination_cell.border = copy(source_cell.border)
-            
-
-    return ws_out
+            cell_index = len(cells)
+            cells.append((row, col, cell_value, copy(source_cell.fill), copy(source_cell.font), copy(source_cell.border)))
+            cell_styles.append(styles.setdefault(cells[-1][3:], len(styles)))
+            static_values.append("" if is_igstrand_number_cell(cell_value) else cell_value)
+            if cell_value is not None and str(cell_value)[:1].isdigit():
+                try:
+                    number_cells.setdefault(encode_igstrand_number(str(cell_value)), []).append(cell_index)
+                except ValueError:
+                    pass # a digit but no igstrand number, nothing maps to it
+            elif isinstance(cell_value, str):
+                text_cells.setdefault(cell_value, []).append(cell_index)
+    return {"version": TEMPLATE_CACHE_VERSION, "template_length": tuple(template_length), "cells": cells,
+            "styles": list(styles), "cell_styles": cell_styles, "static_values": static_values,
+            "number_cells": number_cells, "text_cells": text_cells}
 
 
-def read_input_file(file_path: str) -> List[Tuple[str, str, str]]:
+def load_compiled_template(ig_type: str, numbering_name: str, file_path: str, template_length: Tuple[int, int]) -> Dict:
     """
-    Read the input file containing pdb, chain, and domain information.
+    Return the compiled template, parsing the xlsx only when neither the in-memory
+    copy nor the cache file in file_path/__template_cache__/ matches its mtime and size.
 
-    Args:
-    - file_path (str): The path to the input file.
+    Args: as open_template_file, plus template_length (rows, columns).
 
     Returns:
-    - List[Tuple[str, str, str]]: A list of tuples containing pdb, chain, and domain information.
+    - Dict: compiled template, see compile_template.
     """
+    template_file = f"{file_path}{numbering_name.lower()}_template_{ig_type}.xlsx"
+    try:
+        template_stat = os.stat(template_file)
+    except FileNotFoundError as e:
+        raise FileNotFoundError(f"Template file is not found: {e}")
+    source_id = (template_stat.st_mtime_ns, template_stat.st_size)
+    template_length = tuple(template_length)
 
-   
-    input_file = list()
-
-    with open(file_path) as file_input:
-        for file_lines in file_input:
-            if file_lines.strip():
-                field = file_lines.strip().split(" ") 
-                if len(field) == 3:
-                    input_file.append((field[0].upper(), field[1], field[2]))
-
-                else:
-                    print(f"Make sure {field} has three value: pdbid chain domain")
-
-    return input_file
+    memory_key = (os.path.abspath(template_file), template_length)
+    compiled = _compiled_templates.get(memory_key)
+    if compiled is not None and compiled["source_id"] == source_id:
+        profile_count("template_memory_hits")
+        return compiled
 
+    with profile_stage("template_load", items=1):
+        compiled = _load_template_cache_file(ig_type, numbering_name, file_path, template_file, template_length, source_id)
+    _compiled_templates[memory_key] = compiled
+    return compiled
 
 
+def template_cache_info() -> Dict[str, int]:
+    """
+    Number of compiled templates held in memory.
+    """
+    return {"templates": len(_compiled_templates)}
 
-if __name__== "__main__":
-    parser = argparse.ArgumentParser(description='Process input file')
-    parser.add_argument('-f', '--file', help='Input file name', required=True)
-    args = parser.parse_args()
 
-    # input_file_path= "../input/"
-    # output_file_path = "../output/"
-    # node_js_file_path = "node_js_script/"
-    # numbering_name = "igstrand"
-    # template_row_col = {
-    #     "V_column_range": 21,
-    #     "V_row_range" : 47}
+def _load_template_cache_file(ig_type: str, numbering_name: str, file_path: str, template_file: str,
+                              template_length: Tuple[int, int], source_id: Tuple[int, int]) -> Dict:
+    """
+    Compiled template from the cache file, or compiled from the xlsx and cached.
+    """
+    cache_file = os.path.join(os.path.dirname(template_file), TEMPLATE_CACHE_DIR,
+                              f"{os.path.basename(template_file)}.{template_length[0]}x{template_length[1]}.pkl")
+    compiled = None
+    try:
+        with open(cache_file, "rb") as f:
+            compiled = pickle.load(f)
+        if (compiled.get("version") != TEMPLATE_CACHE_VERSION or compiled.get("source_id") != source_id
+                or compiled.get("openpyxl") != openpyxl.__version__):
+            compiled = None
+    except Exception:
+        compiled = None # unreadable, or pickled by other versions of the style classes
+
+    if compiled is not None:
+        profile_count("template_file_hits")
+    else:
+        profile_count("template_compiles")
+        ws, _ = open_template_file(ig_type, numbering_name, file_path)
+        compiled = compile_template(ws, template_length)
+        compiled["source_id"] = source_id
+        compiled["openpyxl"] = openpyxl.__version__
+        try:
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+            with open(tmp_file, "wb") as f:
+                pickle.dump(compiled, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file, cache_file)
+        except OSError as e:
+            print(f"Template cache is not written: {e}")
+
+    return compiled
+
+
+CENTERED = Alignment(horizontal='center')
+LABEL_FONT = Font(bold=True, size=16)
+_color_fills = {} # solid PatternFill by color code, shared by the output workbooks
+
+
+def color_fill(color_code: str) -> PatternFill:
+    """
+    Solid fill of a mapped residue color, one object per color.
+    """
+    fill = _color_fills.get(color_code)
+    if fill is None:
+        fill = _color_fills[color_code] = PatternFill(start_color=color_code, end_color=color_code, fill_type='solid')
+    return fill
 
 
-    input_file_path = os.getenv('input_file_path')
-    output_file_path = os.getenv('output_file_path')
-    node_js_file_path = os.getenv('node_js_file_path')
-    numbering_name = os.getenv('numbering_name')
+def modify_excel_residue_mapping(id_chain_domain: Tuple[str, str, str], map_res: Dict[int, Tuple[str, str]],ref_struct: str, ig_type: str, template: Dict, ws_out: Worksheet, num_columns: int, color_dict: Dict[str, str]) -> Worksheet:
+    """
+    Fill the residues information in the Excel worksheet based on the provided mapping and write the modified values to a new Excel file with shifted columns.
 
-    ##Access the dictionary from the environment variable
-    template_row_col = json.loads(os.environ['template_row_col'])
+    Cells get the fill, font and border objects of the compiled template and one
+    fill object per residue color. These objects are never changed, so they are
+    shared by all cells and workbooks instead of copied for every cell.
 
+    Args:
+    - id_chain_domain (Tuple[str, str, str]): A tuple containing id, chain, and domain information.
+    - map_res (Dict[int, Tuple[str, str]]): residue and loop assignment by igstrand number code without strand.
+    - ref_struct (str): reference structure mapping name.
+    - ig_type (str): The type of Ig.
+    - template (Dict): compiled template from load_compiled_template.
+    - ws_out: Worksheet: destination worksheet to write.
+    - num_columns (int): The number of columns to shift.
+    - color_dict (Dict[str, str]): strand colors by first digit of the number, and "loop".
 
-    input_file_data  = read_input_file(args.file)
-    output_save_name = args.file.split(".")[0]
-    #input_file_data  = read_input_file("test.txt")
-    #input_file_data  = read_input_file("input_IgC2_template.txt")
+    Returns:
+    - Worksheet
+    """
+    cells = template["cells"]
+    styles = template["styles"]
+    cell_styles = template["cell_styles"]
+
+    # static layer: every cell with the template value and style
+    for (row, col, *_), static_value, style_index in zip(cells, template["static_values"], cell_styles):
+        destination_cell = ws_out.cell(row=row, column=col + num_columns)
+        destination_cell.value = static_value
+        destination_cell.fill, destination_cell.font, destination_cell.border = styles[style_index]
+        destination_cell.alignment = CENTERED
+
+    # residues: only the cells of mapped igstrand numbers
+    number_cells = template["number_cells"]
+    for ig_code, (res_id, loop_assign) in map_res.items():
+        if not res_id:
+            continue
+        for cell_index in number_cells.get(ig_code, ()):
+            row, col = cells[cell_index][:2]
+            ig_number = igstrand_fields(ig_code)[0]
+            if loop_assign:
+                color_code = color_dict["loop"]
+            elif ig_number % 100 == 50:
+                color_code= "FFFF00"
+            else: #number exits but not anchor
+                color_code = color_dict[str(ig_number)[0]] # based on first digit #you can copy color also from template. 
+            destination_cell = ws_out.cell(row=row, column=col + num_columns)
+            destination_cell.value = res_id
+            destination_cell.fill = color_fill(color_code)
+
+    # Ig type label and the reference structure three columns further
+    for cell_index in template["text_cells"].get(ig_type, ()):
+        row, col = cells[cell_index][:2]
+        ws_out.cell(row=row, column=col + num_columns).value = ig_type +"_" +"_".join([str(elem) for elem in id_chain_domain])
+        destination_cell_next = ws_out.cell(row=row, column=col + num_columns + 3) # write in next 6th column
+        destination_cell_next.value = ref_struct
+        destination_cell_next.font = LABEL_FONT
 
-    print(f"Starting 2D alignment..")
+    return ws_out
 
 
-    color_dict = {"1": "9400D3",  "2": "ba55d3", "3": "0000FF", "4": "6495ED",
-                  "5": "006400", "6": "00FF00", "7": "FFD700", "8": "FF8C00", "9": "FF0000",
-                  "loop": "CCCCCC"}
+def get_template_type(map_igstrand_info: Dict) -> Tuple[str, str]:
+    """
+    Return the Ig type of the domain and the name of the template to use.
+    IgV domains have separate templates depending on the A and A' strands.
+    """
+    map_res_ig = map_igstrand_info.get("igstrand_data")
+    ig_match_type = map_igstrand_info.get("Igtype")
+    ig_match_type_template = ig_match_type
+    # check if IgV type
+    if ig_match_type == "IgV":
+        map_res_strand_letter = set(strand_name(encode_igstrand_number(x)) for x in map_res_ig)
+        if "A" in map_res_strand_letter and "A'" in map_res_strand_letter:
+            ig_match_type_template = "IgV_A_Adash"
+        elif "A'" in map_res_strand_letter:
+            ig_match_type_template = "IgV_Adash"
+        elif "A" in map_res_strand_letter:
+            ig_match_type_template = "IgV_A"
+    return ig_match_type, ig_match_type_template
+
+
+def write_2d_alignment(resolved_domains: List[Tuple[Tuple[str, str, str], Optional[Dict]]], template_path: str, output_file: str,
+                       numbering_name: str, template_row_col: Dict[str, int], checkpoint_every: int = 0,
+                       checkpoint_seconds: float = 0) -> Tuple[int, int]:
+    """
+    Place the filled template of every domain next to each other in one sheet.
+    The workbook is saved once at the end; long runs can also save checkpoints.
 
+    Args:
+    - resolved_domains: [(pdb_chain_domain, domain record or None), ...] from resolve_input_domains.
+    - template_path (str): folder of the {numbering_name}_template_{type}.xlsx files.
+    - output_file (str): xlsx file name.
+    - numbering_name (str): The numbering name.
+    - template_row_col (Dict[str, int]): template sizes, see template_row_col_default.
+    - checkpoint_every (int): also save after every N written domains (0: never).
+    - checkpoint_seconds (float): also save when T seconds passed since the last save (0: never).
 
+    Returns:
+    - Tuple[int, int]: number of domains written, total bytes written (checkpoints included).
+    """
     # Create a new workbook for output
     wb_out = Workbook()
     ws_out= wb_out.active
 
-    num_input = len(input_file_data)
-    
     columns_to_shift = 0 # start from first column
+    num_written = 0
+    bytes_written = 0
+    saved_at = 0 # num_written at the last save
+    last_save = time.monotonic()
 
     # put template in one 
 
-    for pdb_chain_domain in input_file_data:
-        # check if file exits otherwise call node js to download.
-        if get_igstrand_reference(pdb_chain_domain[0], input_file_path +"number_mapping_files/"): #
-
-            map_igstrand_info = get_igmap_domain(pdb_chain_domain, "igstrand", input_file_path+"number_mapping_files/")
-
-            if map_igstrand_info is not None:
-                map_res_ig = map_igstrand_info.get("igstrand_data")
-                #map_res id has strand ids aslo so remove the
-                map_res_nostrand_letter = {split_string(x)[1]:y for x,y in map_res_ig.items()}
-                ig_match_type = map_igstrand_info.get("Igtype")
-                # check if IgV type
-                if ig_match_type == "IgV":
-                    map_res_strand_letter = set(split_string(x)[0] for x in map_res_ig)
-                    if "A" in map_res_strand_letter and "A'" in map_res_strand_letter:
-                        ig_match_type_template = "IgV_A_Adash"
-                    elif "A'" in map_res_strand_letter:
-                        ig_match_type_template = "IgV_Adash"
-                    elif "A" in map_res_strand_letter:
-                        ig_match_type_template = "IgV_A"
-                else:
-                    ig_match_type_template = ig_match_type
-
-                map_ref_pdb = map_igstrand_info.get('refpdbname')
-                # here for template not found
-                try:
-                    ws, wb = open_template_file(ig_match_type_template, numbering_name, input_file_path+"/igstrand_template/") # open template
-                except FileNotFoundError as e:
-                    print(f"Skipping {pdb_chain_domain}:{e}")
-                    print()
-                    continue
+    for pdb_chain_domain, map_igstrand_info in resolved_domains:
+        if map_igstrand_info is None:
+            print(f"Ig domain is not found in  {pdb_chain_domain}. 2D figure is not created.")
+            print()
+            continue
+
+        map_res_ig = map_igstrand_info.get("igstrand_data")
+        #map_res id has strand ids aslo so remove the
+        map_res_nostrand_letter = {encode_igstrand_number(x) & POSITION_MASK:y for x,y in map_res_ig.items()}
+        ig_match_type, ig_match_type_template = get_template_type(map_igstrand_info)
+
+        map_ref_pdb = map_igstrand_info.get('refpdbname')
+
+        # if given select from template_row_col else use  V_row_range and V_column_range
+
+        template_row_col_length =  (template_row_col.get(f"{ig_match_type}_row_range", 
+            template_row_col["V_row_range"]), template_row_col.get(f"{ig_match_type}_column_range", template_row_col["V_column_range"]))
+
+        # here for template not found
+        try:
+            template = load_compiled_template(ig_match_type_template, numbering_name, template_path, template_row_col_length) # open template
+        except FileNotFoundError as e:
+            print(f"Skipping {pdb_chain_domain}:{e}")
+            print()
+            continue
+
 
+        with profile_stage("cell_filling_2d", items=1):
+            ws_out = modify_excel_residue_mapping(pdb_chain_domain, map_res_nostrand_letter, map_ref_pdb, ig_match_type, template, ws_out, columns_to_shift, color_dict)
 
-                # if given select from template_row_col else use  V_row_range and V_column_range
+        # assume column length of each template is
 
+        columns_to_shift += template_row_col_length[1]  # width of template column
+        num_written += 1
+        if (checkpoint_every and num_written % checkpoint_every == 0) or \
+                (checkpoint_seconds and time.monotonic() - last_save >= checkpoint_seconds):
+            with profile_stage("save_2d", items=1):
+                wb_out.save(output_file)
+            bytes_written += os.path.getsize(output_file)
+            saved_at = num_written
+            last_save = time.monotonic()
 
+    if num_written != saved_at: # not saved yet when the last domain made a checkpoint
+        with profile_stage("save_2d", items=1):
+            wb_out.save(output_file)
+        bytes_written += os.path.getsize(output_file)
+    profile_count("bytes_written_2d", bytes_written)
 
-                template_row_col_length =  (template_row_col.get(f"{ig_match_type}_row_range", 
-                    template_row_col["V_row_range"]), template_row_col.get(f"{ig_match_type}_column_range", template_row_col["V_column_range"]))
+    return num_written, bytes_written
 
 
-                ws_out = modify_excel_residue_mapping(pdb_chain_domain, map_res_nostrand_letter, map_ref_pdb, ig_match_type, ws, ws_out, template_row_col_length, columns_to_shift, color_dict)
+def run_2d_alignment(resolved_domains, input_file_path, output_file_path, output_save_name, numbering_name, template_row_col,
+                     checkpoint_every=0, checkpoint_seconds=0):
+    """
+    Write the 2D figures of resolved domains (see resolve_input_domains).
+    """
+    print(f"Starting 2D alignment..")
+    num_written, bytes_written = write_2d_alignment(resolved_domains, input_file_path + "/igstrand_template/",
+                                                    f"{output_file_path}2D_mapping_{numbering_name.lower()}.xlsx", numbering_name,
+                                                    template_row_col, checkpoint_every, checkpoint_seconds)
+    print(f"2D figures are created in {output_file_path}2D_mapping_{output_save_name}{numbering_name.lower()}.xlsx.")
+    print(f"{num_written} domains, {bytes_written} bytes written.")
+    print()
 
-                # assume column length of each template is
 
+if __name__== "__main__":
+    parser = argparse.ArgumentParser(description='Process input file')
+    parser.add_argument('-f', '--file', help='Input file name, - reads stdin', required=True)
+    parser.add_argument('--dedupe', help='Skip repeated pdbid chain domain lines', action='store_true')
+    parser.add_argument('--sort-by-pdb', help='Group the input lines by pdb id', action='store_true')
+    parser.add_argument('-j', '--jobs', help='Parallel node processes creating missing mapping files', type=int, default=4)
+    parser.add_argument('--timeout', help='Seconds allowed to create one mapping file', type=float, default=600)
+    parser.add_argument('--worker', help='Keep node worker processes running instead of one node run per pdb', action='store_true')
+    parser.add_argument('--node-script', help='refnum.js creating the missing mapping files (e.g. refnum_worker_stub.js for offline tests)', default="./refnum.js")
+    parser.add_argument('--checkpoint-every', help='Also save the 2D file after every N domains', type=int, default=0)
+    parser.add_argument('--checkpoint-seconds', help='Also save the 2D file every T seconds', type=float, default=0)
+    args = parser.parse_args()
+
+    input_file_path = os.getenv('input_file_path', "../input/")
+    output_file_path = os.getenv('output_file_path', "../output/")
+    node_js_file_path = os.getenv('node_js_file_path', "node_js_script/")
+    numbering_name = os.getenv('numbering_name', "igstrand")
+
+    ##Access the dictionary from the environment variable
+    template_row_col = json.loads(os.environ['template_row_col']) if 'template_row_col' in os.environ else template_row_col_default
 
-                columns_to_shift += template_row_col_length[1]  # width of template column
-                wb_out.save(f"{output_file_path}2D_mapping_{numbering_name.lower()}.xlsx")
-                
-               
-            else:
-                print(f"Ig domain is not found in  {pdb_chain_domain}. 2D figure is not created.")
-                print()
-             
-        
-print(f"2D figures are created in {output_file_path}2D_mapping_{output_save_name}{numbering_name.lower()}.xlsx.")
-print()    
 
-   
-    
-    
-    
+    input_file_data  = read_input_file(args.file, args.dedupe, args.sort_by_pdb)
+    output_save_name = input_save_name(args.file)
 
+    resolved_domains = resolve_input_domains(input_file_data, input_file_path, numbering_name, args.jobs, args.timeout,
+                                             use_worker=args.worker, node_script=args.node_script)
+    run_2d_alignment(resolved_domains, input_file_path, output_file_path, output_save_name, numbering_name, template_row_col,
+                     args.checkpoint_every, args.checkpoint_seconds)
@@ -0,0 +1,140 @@
+#!/usr/bin/python3
+"""
+Dense domain x igstrand position representation of a 1D alignment.
+The 1D writers and statistics read this instead of the nested domain records.
+"""
+import numpy as np
+
+from igstrand_number import (COLUMN_MASK, encode_igstrand_number, encode_igstrand_numbers, decode_igstrand_number,
+                             igstrand_fields, is_anchor, strand_names)
+
+LOOP_FLAG = 1 # bit set in AlignmentMatrix.loop for residues with a loop assignment
+
+# domain record fields kept per row; igstrand_data goes into the matrix
+row_info_fields = ['3Ddomain_order', 'refpdbname', 'Igtype', 'igD_res_range', '3dD_res_range', 'tmscore',
+                   'seqid', 'nresAlign', 'undefined_info']
+
+
+def sort_dict_by_key(dictionary):
+    """
+    Sort a dictionary by its igstrand number keys ("1550", "1550a", "A'1846"):
+    by the number, then the insertion letter, then the strand.
+    """
+    sorted_keys = sorted(dictionary.keys(), key=encode_igstrand_number)
+
+    return {k: dictionary[k] for k in sorted_keys}
+
+
+def get_all_igrefnum_keys(all_ig_data):
+    """
+    This will create all possible keys for given domain to create a
+    alignment. Insertion letters are dropped and each number gets one column.
+    """
+    all_keys = (key for i in all_ig_data for x in i for key in i[x]['igstrand_data'])
+    return {column: [] for column in merge_column_keys(all_keys)}
+
+
+def merge_column_keys(*igstrand_key_lists):
+    """
+    Column keys of the given igstrand keys, in alignment order. Insertion letters
+    are dropped and each number gets one column, the first strand by code.
+    """
+    column_codes = {encode_igstrand_number(key) & COLUMN_MASK for igstrand_keys in igstrand_key_lists for key in igstrand_keys}
+
+    # sorted codes keep the sequence
+    number_columns = {}
+    for code in sorted(column_codes):
+        number_columns.setdefault(igstrand_fields(code)[0], code)
+
+    return [decode_igstrand_number(code) for code in number_columns.values()]
+
+
+class AlignmentMatrix:
+    """
+    row_keys: structure names, "5ESV_A_1"
+    row_info: per row dict of the row_info_fields
+    columns: igstrand keys in alignment order, "C'4548"
+    column_codes: int32 codes of the columns, see igstrand_number
+    column_strand / column_number / column_anchor: strand ("C'"), number (4548) and
+        x50 anchor flag of every column
+    residues: uint8 (rows x columns) residue letter code, 0 where no residue
+    loop: uint8 (rows x columns) flags, LOOP_FLAG for loop residues
+    present: bool (rows x columns) residue exists
+    """
+
+    def __init__(self, row_keys, row_info, columns, residues, loop):
+        self.row_keys = row_keys
+        self.row_info = row_info
+        self.columns = columns
+        self.column_codes = encode_igstrand_numbers(columns)
+        self.column_strand = strand_names(self.column_codes)
+        self.column_number = igstrand_fields(self.column_codes)[0]
+        self.column_anchor = is_anchor(self.column_codes)
+        self.residues = residues
+        self.loop = loop
+        self.present = residues != 0
+
+    @property
+    def shape(self):
+        return self.residues.shape
+
+    def row_letters(self, row, gap="-"):
+        """
+        Aligned sequence of one row, gap for positions without residue.
+        """
+        codes = np.where(self.present[row], self.residues[row], ord(gap))
+        return codes.tobytes().decode("ascii")
+
+
+def build_alignment_matrix(all_file_info, columns=None):
+    """
+    all_file_info: [{"5ESV_A_1": domain record}, ...] as made by make_igmap_info
+    columns: column keys to use; default get_all_igrefnum_keys(all_file_info)
+    Residues whose igstrand key is not a column (insertion numbers) are left out,
+    as in the spreadsheet output.
+    """
+    if columns is None:
+        columns = list(get_all_igrefnum_keys(all_file_info))
+    column_index = {column: i for i, column in enumerate(columns)}
+
+    row_keys = []
+    row_info = []
+    row_ids, col_ids, codes, loop_flags = [], [], [], []
+    for file in all_file_info:
+        for stru, domain_data in file.items():
+            row = len(row_keys)
+            row_keys.append(stru)
+            row_info.append({field: domain_data.get(field, "") for field in row_info_fields})
+            for igstrand_num, (res_id, loop_assign) in domain_data["igstrand_data"].items():
+                col = column_index.get(igstrand_num)
+                if col is not None and res_id:
+                    row_ids.append(row)
+                    col_ids.append(col)
+                    codes.append(ord(res_id[0]))
+                    loop_flags.append(LOOP_FLAG if loop_assign else 0)
+
+    residues = np.zeros((len(row_keys), len(columns)), dtype=np.uint8)
+    loop = np.zeros((len(row_keys), len(columns)), dtype=np.uint8)
+    residues[row_ids, col_ids] = codes
+    loop[row_ids, col_ids] = loop_flags
+
+    return AlignmentMatrix(row_keys, row_info, columns, residues, loop)
+
+
+def reindex_columns(matrix, columns):
+    """
+    The rows of matrix on another column list, usually a superset. Residues of
+    columns that are not in columns are dropped.
+    """
+    column_index = {column: i for i, column in enumerate(columns)}
+    old_cols, new_cols = [], []
+    for old_col, column in enumerate(matrix.columns):
+        if column in column_index:
+            old_cols.append(old_col)
+            new_cols.append(column_index[column])
+
+    residues = np.zeros((len(matrix.row_keys), len(columns)), dtype=np.uint8)
+    loop = np.zeros((len(matrix.row_keys), len(columns)), dtype=np.uint8)
+    residues[:, new_cols] = matrix.residues[:, old_cols]
+    loop[:, new_cols] = matrix.loop[:, old_cols]
+    return AlignmentMatrix(list(matrix.row_keys), list(matrix.row_info), list(columns), residues, loop)
@@ -0,0 +1,317 @@
+#!/usr/bin/python3
+"""
+Local alignment service. One long running process keeps the parsed refnum files
+(the refnum cache of igstrand_domain_mapping) and the compiled 2D templates in
+memory, so a request only pays for its own domains, not for the interpreter start,
+the imports, the json parsing and the template loading of a CLI run.
+
+usage: python alignment_server.py [--port 8765] [--unix-socket PATH] [--warm input.txt]
+
+Requests are batches of domains, either "pdbid chain domain" lines as in an input
+file or JSON {"domains": [["5ESV", "A", "1"], ...]}:
+
+    POST /1d?format=json    1D rows: {"columns": [...], "rows": [{"structure": ..., "aligned": ...}]}
+    POST /1d?format=tsv     the 1D file in any format of alignment_1D_export (xlsx, tsv, parquet, fasta, stockholm)
+    POST /2d                the 2D xlsx workbook
+    POST /domains           the domain records as JSON
+    GET  /stats             requests, errors and p50/p99 latency per endpoint, cache sizes
+    GET  /health
+
+e.g. curl --data-binary @input.txt 'http://127.0.0.1:8765/1d?format=tsv'
+Requests are handled in threads; missing mapping files are created as in the CLI.
+"""
+import os
+import io
+import json
+import math
+import time
+import logging
+import argparse
+import tempfile
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+from urllib.parse import urlsplit, parse_qs
+
+from alignment_1D_igstrand import make_igmap_info, write_1d_matrix, headers
+from alignment_1D_export import export_extensions, matrix_records
+from alignment_2D_igstrand import write_2d_alignment, template_row_col_default, template_cache_info
+from alignment_matrix import build_alignment_matrix
+from domain_resolver import resolve_input_domains
+from input_reader import read_input_file, parse_input_lines
+from igstrand_domain_mapping import refnum_cache_info, json_loader_stats
+
+MAX_REQUEST_DOMAINS = 10000 # larger batches should use the CLI (--two-pass)
+REQUEST_QUEUE_SIZE = 128 # connections waiting to be accepted; socketserver's default of 5 drops bursts
+LATENCY_WINDOW = 10000 # latest requests per endpoint kept for the percentiles
+
+content_types = {"json": "application/json", "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                 "tsv": "text/tab-separated-values", "parquet": "application/vnd.apache.parquet",
+                 "fasta": "text/plain", "stockholm": "text/plain"}
+
+
+class RequestError(Exception):
+    """
+    A request that can not be served; status is the HTTP status code of the answer.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def percentile(sorted_values, percent):
+    """
+    Nearest rank percentile of sorted values.
+    """
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(percent / 100 * len(sorted_values)) - 1)]
+
+
+class LatencyStats:
+    """
+    Request count, error count and the latest LATENCY_WINDOW latencies per endpoint.
+    """
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self.endpoints = {}
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+
+    def add(self, endpoint, seconds, error=False):
+        with self.lock:
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = {"requests": 0, "errors": 0, "latencies": deque(maxlen=self.window)}
+            stats["requests"] += 1
+            stats["errors"] += error
+            stats["latencies"].append(seconds)
+
+    def summary(self):
+        """
+        {endpoint: {"requests", "errors", "p50_ms", "p99_ms", "max_ms"}}, the percentiles
+        over the latest requests.
+        """
+        with self.lock:
+            endpoints = {endpoint: (stats["requests"], stats["errors"], sorted(stats["latencies"]))
+                         for endpoint, stats in self.endpoints.items()}
+        summary = {}
+        for endpoint, (requests, errors, latencies) in sorted(endpoints.items()):
+            summary[endpoint] = {"requests": requests, "errors": errors,
+                                 "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+                                 "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+                                 "max_ms": round(latencies[-1] * 1000, 3)}
+        return summary
+
+
+class AlignmentService:
+    """
+    What the request handlers share: the input folder, the resolve options and the
+    latency statistics. The warm data lives in the module caches of the pipeline.
+    """
+
+    def __init__(self, input_file_path="../input/", numbering_name="igstrand", template_row_col=None,
+                 max_domains=MAX_REQUEST_DOMAINS, **resolve_options):
+        self.input_file_path = input_file_path
+        self.numbering_name = numbering_name
+        self.template_row_col = dict(template_row_col or template_row_col_default)
+        self.max_domains = max_domains
+        self.resolve_options = resolve_options
+        self.stats = LatencyStats()
+
+    def resolve(self, input_file_data):
+        if not input_file_data:
+            raise RequestError(400, "The request has no pdbid chain domain lines")
+        if len(input_file_data) > self.max_domains:
+            raise RequestError(413, f"{len(input_file_data)} domains, at most {self.max_domains} are served per request")
+        return resolve_input_domains(input_file_data, self.input_file_path, self.numbering_name, quiet=True,
+                                     **self.resolve_options)
+
+    def alignment_1d(self, input_file_data, fmt="json"):
+        """
+        return: (content type, body bytes)
+        """
+        if fmt != "json" and fmt not in export_extensions:
+            raise RequestError(400, f"Unknown 1D format {fmt}. Supported formats are json, {', '.join(export_extensions)}.")
+        resolved_domains = self.resolve(input_file_data)
+        matrix = build_alignment_matrix([make_igmap_info(*resolved) for resolved in resolved_domains])
+        if fmt == "json":
+            body = json.dumps({"columns": list(matrix.columns), "rows": matrix_records(matrix, headers)})
+            return content_types["json"], body.encode()
+        with tempfile.TemporaryDirectory(prefix="alignment_server_") as tmp_dir:
+            output_file, = write_1d_matrix(matrix, os.path.join(tmp_dir, "1D_mapping"), [fmt])
+            with open(output_file, "rb") as f:
+                return content_types[fmt], f.read()
+
+    def alignment_2d(self, input_file_data):
+        resolved_domains = self.resolve(input_file_data)
+        with tempfile.TemporaryDirectory(prefix="alignment_server_") as tmp_dir:
+            output_file = os.path.join(tmp_dir, "2D_mapping.xlsx")
+            num_written, _ = write_2d_alignment(resolved_domains, self.input_file_path + "/igstrand_template/", output_file,
+                                                self.numbering_name, self.template_row_col)
+            if not num_written:
+                raise RequestError(422, "No 2D figure could be made for the requested domains")
+            with open(output_file, "rb") as f:
+                return content_types["xlsx"], f.read()
+
+    def domains(self, input_file_data):
+        resolved_domains = self.resolve(input_file_data)
+        records = [{"input": list(pdb_chain_domain), "record": None if map_igstrand_info is None else dict(map_igstrand_info)}
+                   for pdb_chain_domain, map_igstrand_info in resolved_domains]
+        return content_types["json"], json.dumps(records).encode()
+
+    def status(self):
+        return {"uptime_s": round(time.monotonic() - self.stats.started, 1), "endpoints": self.stats.summary(),
+                "caches": {"refnum_cache": refnum_cache_info(), "json_loader": dict(json_loader_stats),
+                           "compiled_templates": template_cache_info()}}
+
+    def warm(self, input_file):
+        """
+        Parse the refnum files and compile the 2D templates of the domains of an input file.
+        """
+        input_file_data = read_input_file(input_file)
+        resolved_domains = resolve_input_domains(input_file_data, self.input_file_path, self.numbering_name, **self.resolve_options)
+        with tempfile.TemporaryDirectory(prefix="alignment_server_") as tmp_dir:
+            write_2d_alignment(resolved_domains, self.input_file_path + "/igstrand_template/",
+                               os.path.join(tmp_dir, "2D_mapping.xlsx"), self.numbering_name, self.template_row_col)
+        return len(resolved_domains)
+
+
+def parse_request_domains(body, content_type=""):
+    """
+    [("5ESV", "A", "1"), ...] of a request body: JSON {"domains": [[pdb, chain, domain], ...]}
+    or "pdbid chain domain" lines.
+    """
+    text = body.decode(errors="replace")
+    if content_type.startswith("application/json") or text.lstrip().startswith("{"):
+        try:
+            domains = json.loads(text)["domains"]
+            return [(str(pdb).upper(), str(chain), str(domain)) for pdb, chain, domain in domains]
+        except (ValueError, KeyError, TypeError) as e:
+            raise RequestError(400, f'Expected {{"domains": [[pdbid, chain, domain], ...]}}: {e}')
+    return list(parse_input_lines(io.StringIO(text)))
+
+
+class AlignmentRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "IgStrandAlignment/1"
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == "/health":
+            self._answer(path, 200, content_types["json"], b'{"status": "ok"}')
+        elif path == "/stats":
+            self._answer(path, 200, content_types["json"], json.dumps(self.server.service.status()).encode())
+        else:
+            self._answer_error(path, RequestError(404, f"Unknown path {path}"))
+
+    def do_POST(self):
+        started = time.monotonic()
+        url = urlsplit(self.path)
+        service = self.server.service
+        try:
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            input_file_data = parse_request_domains(body, self.headers.get("Content-Type", ""))
+            if url.path == "/1d":
+                fmt = parse_qs(url.query).get("format", ["json"])[0].lower()
+                content_type, answer = service.alignment_1d(input_file_data, fmt)
+            elif url.path == "/2d":
+                content_type, answer = service.alignment_2d(input_file_data)
+            elif url.path == "/domains":
+                content_type, answer = service.domains(input_file_data)
+            else:
+                raise RequestError(404, f"Unknown path {url.path}")
+        except RequestError as e:
+            self._answer_error(url.path, e, started)
+            return
+        except Exception as e:
+            logging.exception(f"{url.path} request failed")
+            self._answer_error(url.path, RequestError(500, str(e)), started)
+            return
+        self._answer(url.path, 200, content_type, answer, started)
+
+    def _answer(self, path, status, content_type, answer, started=None):
+        # counted before answering, so a client that got its answer finds it in /stats
+        if started is not None:
+            self.server.service.stats.add(path, time.monotonic() - started, error=status >= 400)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(answer)))
+        self.end_headers()
+        self.wfile.write(answer)
+
+    def _answer_error(self, path, error, started=None):
+        self._answer(path, error.status, content_types["json"], json.dumps({"error": str(error)}).encode(), started)
+
+    def address_string(self):
+        # unix socket clients have no address
+        return self.client_address[0] if self.client_address else "local"
+
+    def log_message(self, format, *args):
+        logging.info(f"{self.address_string()} {format % args}")
+
+
+class ThreadingUnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(service, host="127.0.0.1", port=8765, unix_socket=None, queue_size=REQUEST_QUEUE_SIZE):
+    """
+    HTTP server for service, on a TCP port or a unix socket.
+    queue_size: connections the listening socket holds until a thread accepts them
+    """
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        server = ThreadingUnixHTTPServer(unix_socket, AlignmentRequestHandler, bind_and_activate=False)
+    else:
+        server = ThreadingHTTPServer((host, port), AlignmentRequestHandler, bind_and_activate=False)
+    # listen() takes the queue size when the server is activated
+    server.request_queue_size = queue_size
+    try:
+        server.server_bind()
+        server.server_activate()
+    except OSError:
+        server.server_close()
+        raise
+    server.service = service
+    return server
+
+
+if __name__ == "__main__":
+    input_file_path = os.getenv('input_file_path', "../input/")
+    numbering_name = os.getenv('numbering_name', "igstrand")
+
+    parser = argparse.ArgumentParser(description='Serve 1D and 2D alignments with warm caches')
+    parser.add_argument('--host', help='Address to listen on', default="127.0.0.1")
+    parser.add_argument('--port', help='TCP port', type=int, default=8765)
+    parser.add_argument('--unix-socket', help='Listen on this unix socket instead of a TCP port')
+    parser.add_argument('--warm', help='Input file whose refnum files and 2D templates are loaded at start')
+    parser.add_argument('--max-domains', help='Most domains served per request', type=int, default=MAX_REQUEST_DOMAINS)
+    parser.add_argument('--queue-size', help='Connections waiting to be accepted', type=int, default=REQUEST_QUEUE_SIZE)
+    parser.add_argument('-j', '--jobs', help='Parallel node processes creating missing mapping files', type=int, default=4)
+    parser.add_argument('--timeout', help='Seconds allowed to create one mapping file', type=float, default=600)
+    parser.add_argument('--worker', help='Keep node worker processes running instead of one node run per pdb', action='store_true')
+    parser.add_argument('--node-script', help='refnum.js creating the missing mapping files (e.g. refnum_worker_stub.js for offline tests)', default="./refnum.js")
+    args = parser.parse_args()
+
+    template_row_col = json.loads(os.environ['template_row_col']) if 'template_row_col' in os.environ else template_row_col_default
+    service = AlignmentService(input_file_path, numbering_name, template_row_col, args.max_domains,
+                               jobs=args.jobs, timeout=args.timeout, use_worker=args.worker,
+                               node_script=args.node_script)
+    if args.warm:
+        print(f"{service.warm(args.warm)} domains are loaded from {args.warm}.")
+
+    server = make_server(service, args.host, args.port, args.unix_socket, args.queue_size)
+    print(f"Serving alignments on {args.unix_socket or f'http://{args.host}:{args.port}'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.unix_socket and os.path.exists(args.unix_socket):
+            os.remove(args.unix_socket)
@@ -0,0 +1,154 @@
+#!/usr/bin/python3
+"""
+Resolve the input (pdb, chain, domain) lines to their Ig domain records once, so
+the 1D and 2D writers can share them.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+
+from icn3d_igstrand_refnum import prefetch_igstrand_references
+from igstrand_domain_mapping import expand_igmap_domains, CHAIN_WILDCARD
+import pipeline_profile
+from pipeline_profile import profile_stage, reset_profile, profile_snapshot, merge_profile
+
+RESOLVE_CHUNK_LINES = 10000 # input lines resolved at a time by iter_resolved_domains
+PACK_SEP = "\x1f"
+
+
+def group_by_pdb(input_file_data):
+    """
+    Group input lines by PDB in order of first appearance.
+    output: [[(input index, pdb_chain_domain), ...], ...] one list per PDB
+    """
+    pdb_groups = {}
+    for index, pdb_chain_domain in enumerate(input_file_data):
+        pdb_groups.setdefault(pdb_chain_domain[0], []).append((index, pdb_chain_domain))
+    return list(pdb_groups.values())
+
+
+def resolve_pdb_group(pdb_group, mapping_file_path, numbering_name):
+    """
+    Look up the domains of one PDB; runs in the worker processes of resolve_input_domains.
+    The refnum file is parsed once per group and every chain is delineated once.
+    output: [(input index, [(pdb_chain_domain, domain record or None), ...]), ...]
+    """
+    indexes = [index for index, _ in pdb_group]
+    expanded = expand_igmap_domains([pdb_chain_domain for _, pdb_chain_domain in pdb_group], numbering_name, mapping_file_path)
+    return list(zip(indexes, expanded))
+
+
+def pack_domain_record(record):
+    """
+    Compact picklable form of a domain record, sent back by the worker processes:
+    the igstrand numbers, residue letters and loop assignments are three joined
+    strings instead of one tuple per residue.
+    output: (other fields as (key, value) pairs, numbers, letters, loops) or None
+    """
+    if record is None:
+        return None
+    igstrand_data = record["igstrand_data"]
+    fields = tuple((key, value) for key, value in record.items() if key != "igstrand_data")
+    return (fields, PACK_SEP.join(igstrand_data), PACK_SEP.join(letter for letter, _ in igstrand_data.values()),
+            PACK_SEP.join(loop_assign for _, loop_assign in igstrand_data.values()))
+
+
+def unpack_domain_record(packed):
+    """
+    Domain record of pack_domain_record.
+    """
+    if packed is None:
+        return None
+    fields, numbers, letters, loops = packed
+    record = dict(fields)
+    record["igstrand_data"] = dict(zip(numbers.split(PACK_SEP), zip(letters.split(PACK_SEP), loops.split(PACK_SEP)))) if numbers else {}
+    return record
+
+
+def resolve_pdb_group_packed(pdb_group, mapping_file_path, numbering_name):
+    """
+    resolve_pdb_group in a worker process, the records packed by pack_domain_record.
+    """
+    return [(index, [(pdb_chain_domain, pack_domain_record(record)) for pdb_chain_domain, record in resolved_line])
+            for index, resolved_line in resolve_pdb_group(pdb_group, mapping_file_path, numbering_name)]
+
+
+def resolve_pdb_group_profiled(pdb_group, mapping_file_path, numbering_name):
+    """
+    resolve_pdb_group_packed in a worker process with --profile: also return the
+    profile of the group, the parent adds it to its own.
+    """
+    reset_profile()
+    return resolve_pdb_group_packed(pdb_group, mapping_file_path, numbering_name), profile_snapshot()
+
+
+def resolve_input_domains(input_file_data, input_file_path, numbering_name="igstrand", jobs=4, timeout=600,
+                          use_worker=False, workers=0, node_script="./refnum.js", quiet=False):
+    """
+    Create the missing mapping files and look up every input domain.
+    input: input_file_data: [("5ESV", "A", "1"), ...]
+           input_file_path: input folder with number_mapping_files/ inside
+           workers: processes parsing the mapping files, grouped by PDB (0 or 1: in this process)
+           node_script: refnum.js creating the missing mapping files
+           quiet: do not print the mapping file counts
+    output: [(pdb_chain_domain, domain record or None), ...] in input order; a "pdb chain *"
+            line is replaced by every Ig domain of the chain
+    """
+    mapping_file_path = input_file_path + "number_mapping_files/"
+    with profile_stage("prefetch", items=len(input_file_data)):
+        prefetch_summary = prefetch_igstrand_references([pdb_chain_domain[0] for pdb_chain_domain in input_file_data],
+                                                        mapping_file_path, jobs, timeout, node_script, use_worker=use_worker,
+                                                        quiet=quiet)
+    with profile_stage("resolve", items=len(input_file_data)):
+        return _resolve_domains(input_file_data, mapping_file_path, numbering_name, prefetch_summary, workers)
+
+
+def _resolve_domains(input_file_data, mapping_file_path, numbering_name, prefetch_summary, workers):
+    # PDBs whose mapping file was found or created by the prefetch
+    available_pdbs = set(prefetch_summary["existing"]) | set(prefetch_summary["created"])
+    pdb_groups = [pdb_group for pdb_group in group_by_pdb(input_file_data) if pdb_group[0][1][0].upper() in available_pdbs]
+
+    # lines of PDBs without a mapping file keep an empty record, "*" lines have no domains to list
+    resolved_lines = [[] if pdb_chain_domain[2] == CHAIN_WILDCARD else [(pdb_chain_domain, None)]
+                      for pdb_chain_domain in input_file_data]
+    if workers > 1 and len(pdb_groups) > 1:
+        workers = min(workers, len(pdb_groups))
+        # a few chunks per worker keep the processes busy without one task per PDB
+        chunksize = max(1, len(pdb_groups) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            if pipeline_profile.profile_enabled:
+                group_results = []
+                profile_group = partial(resolve_pdb_group_profiled, mapping_file_path=mapping_file_path, numbering_name=numbering_name)
+                for group_result, snapshot in executor.map(profile_group, pdb_groups, chunksize=chunksize):
+                    group_results.append(group_result)
+                    merge_profile(snapshot)
+            else:
+                packed_group = partial(resolve_pdb_group_packed, mapping_file_path=mapping_file_path, numbering_name=numbering_name)
+                group_results = list(executor.map(packed_group, pdb_groups, chunksize=chunksize))
+        group_results = [[(index, [(pdb_chain_domain, unpack_domain_record(packed)) for pdb_chain_domain, packed in resolved_line])
+                          for index, resolved_line in group_result] for group_result in group_results]
+    else:
+        group_results = [resolve_pdb_group(pdb_group, mapping_file_path, numbering_name) for pdb_group in pdb_groups]
+
+    for group_result in group_results:
+        for index, resolved_line in group_result:
+            resolved_lines[index] = resolved_line
+
+    return [resolved for resolved_line in resolved_lines for resolved in resolved_line]
+
+
+def iter_resolved_domains(input_lines, input_file_path, numbering_name="igstrand", chunk_lines=RESOLVE_CHUNK_LINES,
+                          **resolve_options):
+    """
+    resolve_input_domains over a stream of input lines, chunk_lines at a time, so only
+    the domain records of one chunk are in memory. Lines sorted by PDB (--sort-by-pdb)
+    keep the lines of a PDB in few chunks.
+    resolve_options: jobs, timeout, use_worker, workers, node_script as in resolve_input_domains
+    yield: (pdb_chain_domain, domain record or None) in input order
+    """
+    input_lines = iter(input_lines)
+    while True:
+        chunk = list(islice(input_lines, chunk_lines))
+        if not chunk:
+            return
+        yield from resolve_input_domains(chunk, input_file_path, numbering_name, **resolve_options)
@@ -1,8 +1,15 @@
 #!/usr/bin/python3
 import os, sys
+import logging
 import requests
 import re
 import subprocess
+import threading
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+from pipeline_profile import profile_stage, profile_count
+from mapping_files import find_mapping_file, mapping_file_target, write_mapping_bytes
 
 
 def check_filename_exist(file_name_tocheck, input_file_path):
@@ -15,7 +22,189 @@ def check_filename_exist(file_name_tocheck, input_file_path):
         return False
 
 
-def get_igstrand_reference(pdb_name, mapping_file_path):
+def run_refnum_script(pdb_name, mapping_file_path, node_script="./refnum.js", timeout=None):
+    """
+    Run the node script for one pdb and write its mapping file.
+    input: pdb_name: 5esv
+           mapping_file_path: folder of the mapping files
+           node_script: refnum.js path
+           timeout: seconds before the node process is killed (None: no limit)
+    output: (True, "") if the file is created, else (False, reason)
+    """
+    command = ["node", node_script, pdb_name.upper()]
+    try:
+        with profile_stage("node_generation", items=1):
+            result = subprocess.run(command, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return False, f"timed out after {timeout} s"
+    except OSError as e:
+        return False, str(e)
+
+    if len(result.stdout) > 3:
+        write_mapping_file(result.stdout, pdb_name, mapping_file_path)
+        return True, ""
+
+    error_lines = result.stderr.strip().splitlines()
+    return False, error_lines[-1] if error_lines else f"no output (exit code {result.returncode})"
+
+
+def write_mapping_file(refnum_text, pdb_name, mapping_file_path):
+    """
+    Write the node output where the folder layout puts it (see mapping_files); a
+    temporary name is used first so parallel runs never see half written files.
+    """
+    bytes_written = write_mapping_bytes(refnum_text.encode(), mapping_file_target(pdb_name, mapping_file_path))
+    profile_count("mapping_bytes_written", bytes_written)
+
+
+class RefnumWorker:
+    """
+    One long running "node refnum.js --worker" process. PDB ids are written to its
+    stdin one per line; each answer is a "#refnum ok|error <nbytes>" line followed by
+    nbytes of refnum text. The process is restarted when it crashes or times out.
+    """
+
+    def __init__(self, node_script="./refnum.js", worker_args=(), start_timeout=600):
+        self.command = ["node", node_script, "--worker", *worker_args]
+        self.start_timeout = start_timeout
+        self.process = None
+        self.frames = None
+
+    def start(self):
+        self.close()
+        self.process = subprocess.Popen(self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=subprocess.DEVNULL)
+        self.frames = queue.Queue()
+        threading.Thread(target=self._read_frames, args=(self.process.stdout, self.frames), daemon=True).start()
+        try:
+            frame = self.frames.get(timeout=self.start_timeout)
+        except queue.Empty:
+            frame = None
+        if frame != ("ready", b""):
+            self.close()
+            raise RuntimeError(f"refnum worker did not start: {' '.join(self.command)}")
+
+    @staticmethod
+    def _read_frames(stdout, frames):
+        """
+        Reader thread: turn the worker output into (status, payload) frames, None at exit.
+        A broken frame header also ends the frames, the worker is then restarted.
+        """
+        try:
+            for line in iter(stdout.readline, b""):
+                if line.startswith(b"#ready"):
+                    frames.put(("ready", b""))
+                elif line.startswith(b"#refnum "):
+                    _, status, nbytes = line.split()
+                    frames.put((status.decode(), stdout.read(int(nbytes))))
+                # anything else is stray log output of the worker
+        except ValueError:
+            pass # a header that is not "#refnum status nbytes", or stdout closed by close()
+        finally:
+            frames.put(None)
+
+    def request(self, pdb_name, timeout=None):
+        """
+        Return the refnum text of pdb_name. Raises TimeoutError or RuntimeError;
+        the worker is restarted on the next request in both cases.
+        """
+        if self.process is None or self.process.poll() is not None:
+            self.start()
+        try:
+            self.process.stdin.write(pdb_name.upper().encode() + b"\n")
+            self.process.stdin.flush()
+            frame = self.frames.get(timeout=timeout)
+        except queue.Empty:
+            self.close()
+            raise TimeoutError(f"timed out after {timeout} s")
+        except OSError:
+            frame = None
+        if frame is None:
+            self.close()
+            raise RuntimeError("refnum worker exited")
+
+        status, payload = frame
+        if status != "ok":
+            raise RuntimeError(payload.decode(errors="replace").strip())
+        return payload.decode()
+
+    def close(self):
+        if self.process is not None:
+            if self.process.poll() is None:
+                self.process.kill()
+            self.process.wait()
+            self.process.stdin.close()
+            self.process.stdout.close()
+            self.process = None
+
+
+class RefnumWorkerPool:
+    """
+    A fixed number of RefnumWorker processes shared by threads.
+    Use as a context manager so the node processes are stopped at the end.
+    """
+
+    def __init__(self, size=1, node_script="./refnum.js", worker_args=(), timeout=600):
+        self.timeout = timeout
+        self.idle_workers = queue.Queue()
+        self.workers = [RefnumWorker(node_script, worker_args, start_timeout=timeout) for _ in range(max(1, size))]
+        for worker in self.workers:
+            self.idle_workers.put(worker)
+
+    def start(self):
+        """
+        Start all worker processes at once. Workers that do not start are left out of
+        the pool; raises RuntimeError when none of them starts.
+        """
+        def start_worker(worker):
+            try:
+                worker.start()
+            except (RuntimeError, OSError) as e:
+                return e
+            return None
+
+        with ThreadPoolExecutor(max_workers=len(self.workers)) as executor:
+            errors = list(executor.map(start_worker, self.workers))
+        for error in errors:
+            if error is not None:
+                logging.warning(f"Refnum worker is not used: {error}")
+        self.workers = [worker for worker, error in zip(self.workers, errors) if error is None]
+        if not self.workers:
+            raise RuntimeError(f"no refnum worker started: {errors[0]}")
+        self.idle_workers = queue.Queue()
+        for worker in self.workers:
+            self.idle_workers.put(worker)
+
+    def create_mapping_file(self, pdb_name, mapping_file_path):
+        """
+        Same result as run_refnum_script: (True, "") or (False, reason).
+        """
+        worker = self.idle_workers.get()
+        try:
+            with profile_stage("node_generation", items=1):
+                refnum_text = worker.request(pdb_name, self.timeout)
+        except (TimeoutError, RuntimeError, OSError) as e:
+            return False, str(e)
+        finally:
+            self.idle_workers.put(worker)
+
+        if len(refnum_text) > 3:
+            write_mapping_file(refnum_text, pdb_name, mapping_file_path)
+            return True, ""
+        return False, "no output"
+
+    def close(self):
+        for worker in self.workers:
+            worker.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def get_igstrand_reference(pdb_name, mapping_file_path, node_script="./refnum.js", timeout=None):
     """
     This will create the mapping  numbering file for given pdb.
     input: pdb_name: 5esv
@@ -25,20 +214,17 @@ def get_igstrand_reference(pdb_name, mapping_file_path):
     """
 
     mapping_file_name = f"{pdb_name.upper()}_refnum_igstrand.json"
-    if not check_filename_exist(mapping_file_name, mapping_file_path):
+    if find_mapping_file(pdb_name, mapping_file_path) is None:
             # if mapping file not found then call node script
             print(f"{mapping_file_name} is not found in {mapping_file_path} . Creating {mapping_file_name}.")
-      
-            command = ["node", "./refnum.js", pdb_name.upper()]
-            result = subprocess.run(command, capture_output=True, text=True)
-            if len(result.stdout) > 3:
-                with open(mapping_file_path+mapping_file_name, 'w') as f:
-                    f.write(result.stdout) 
-                    print(f"{mapping_file_name} is created.")
+
+            created, reason = run_refnum_script(pdb_name, mapping_file_path, node_script, timeout)
+            if created:
+                print(f"{mapping_file_name} is created.")
                 return True
 
             else:
-                print(f"mapping_file_name is not created")
+                print(f"mapping_file_name is not created: {reason}")
                 print(f"Check if refnum.js file in ./node_js_script/")
                 return False
 
@@ -47,7 +233,69 @@ def get_igstrand_reference(pdb_name, mapping_file_path):
         return True
 
 
-            
+def prefetch_igstrand_references(pdb_names, mapping_file_path, jobs=4, timeout=600, node_script="./refnum.js",
+                                 use_worker=False, worker_args=(), quiet=False):
+    """
+    Create the missing mapping files of all pdbs before the alignment starts.
+    Each pdb is generated once, at most jobs node processes run at the same time.
+    input: pdb_names: iterable of pdb ids, duplicates are allowed
+           mapping_file_path: folder of the mapping files
+           jobs: number of parallel node processes
+           timeout: seconds allowed for one pdb
+           use_worker: keep jobs "node_script --worker" processes running instead of
+                       starting node per pdb; falls back to one-shot runs if they fail to start
+           quiet: log the counts at debug level instead of printing them (alignment server)
+    output: summary {"existing": [...], "created": [...], "failed": {pdb: reason}}
+    """
+    unique_pdbs = list(dict.fromkeys(pdb_name.upper() for pdb_name in pdb_names))
+    summary = {"existing": [], "created": [], "failed": {}}
+    missing_pdbs = []
+    for pdb_name in unique_pdbs:
+        if find_mapping_file(pdb_name, mapping_file_path) is not None:
+            summary["existing"].append(pdb_name)
+        else:
+            missing_pdbs.append(pdb_name)
+
+    worker_pool = None
+    if missing_pdbs and use_worker:
+        worker_pool = RefnumWorkerPool(min(jobs, len(missing_pdbs)), node_script, worker_args, timeout)
+        try:
+            worker_pool.start()
+        except RuntimeError as e:
+            logging.warning(f"Refnum worker is not used: {e}")
+            worker_pool.close()
+            worker_pool = None
+
+    def create_mapping_file(pdb_name):
+        if worker_pool is not None:
+            return worker_pool.create_mapping_file(pdb_name, mapping_file_path)
+        return run_refnum_script(pdb_name, mapping_file_path, node_script, timeout)
+
+    if missing_pdbs:
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+                for pdb_name, (created, reason) in zip(missing_pdbs, executor.map(create_mapping_file, missing_pdbs)):
+                    if created:
+                        summary["created"].append(pdb_name)
+                    else:
+                        summary["failed"][pdb_name] = reason
+        finally:
+            if worker_pool is not None:
+                worker_pool.close()
+
+    message = (f"Mapping files: {len(summary['existing'])} found, {len(summary['created'])} created, "
+               f"{len(summary['failed'])} failed.")
+    if quiet:
+        logging.debug(message)
+    else:
+        print(message)
+    profile_count("mapping_files_found", len(summary["existing"]))
+    profile_count("mapping_files_created", len(summary["created"]))
+    profile_count("mapping_files_failed", len(summary["failed"]))
+    for pdb_name, reason in summary["failed"].items():
+        logging.warning(f"{pdb_name}_refnum_igstrand.json is not created: {reason}")
+
+    return summary
 
 
 if __name__ == "__main__":
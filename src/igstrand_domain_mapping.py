@@ -2,6 +2,12 @@
 import os
 import re
 import json, json5
+import threading
+from collections import OrderedDict
+
+import pipeline_profile
+from pipeline_profile import profile_stage, profile_count
+from mapping_files import find_mapping_file, read_mapping_text
 
 ref2igtype = {'ASF1A_2iijA_human': 'IgE',
 'B2Microglobulin_7phrL_human_C1': 'IgC1',
@@ -67,29 +73,262 @@ def split_string(s):
     """
     match = re.search(r'^([^0-9]*)([0-9].*)$', s)
     return match.groups() if match else None
-   
+
+
+# String literals are matched (and kept) so that commas inside them are never touched;
+# any other comma followed only by whitespace and a closing bracket is dropped.
+_NODE_JSON_TRAILING_COMMA = re.compile(r'("(?:[^"\\]|\\.)*")|,\s*(?=[\]}])')
+
+# Which parser load_json_file used: "fast" (json) or "json5" (fallback).
+json_loader_stats = {"fast": 0, "json5": 0}
+_json_loader_lock = threading.Lock()
+
+
+def repair_node_json(json_text):
+    """
+    Fix the quirks of the node refnum.js output so the standard json parser
+    can read it: trailing commas after the last element of an array/object and
+    the missing closing "]" of the outer array.
+    """
+    json_text = json_text.rstrip()
+    if not json_text.endswith(']'):
+        # If not, append a closing bracket
+        json_text += ']'
+    return _NODE_JSON_TRAILING_COMMA.sub(r'\1', json_text)
+
+
+def load_json_text(json_text):
+    """
+    Parse the refnum text with the C json parser after repair_node_json and
+    fall back to json5 if that fails.
+    return: parsed data, "fast" or "json5"
+    """
+    try:
+        json_data = json.loads(repair_node_json(json_text))
+        with _json_loader_lock:
+            json_loader_stats["fast"] += 1
+        return json_data, "fast"
+    except ValueError:
+        pass
+
+    json_text = json_text.rstrip()
+    if not json_text.endswith(']'):
+        json_text += ']'
+    json_data = json5.loads(json_text)
+    with _json_loader_lock:
+        json_loader_stats["json5"] += 1
+    return json_data, "json5"
+
+
 def load_json_file(file_path):
     """
     The file is downloaded using the node js and it has extra comma (",")
+    Compressed files (.gz, .zst) are read too, see mapping_files.
     """
     try:
-        with open(file_path, 'r') as file:
-            json_data = file.read().rstrip('\n')
+        with profile_stage("json_parse", items=1):
+            json_data = read_mapping_text(file_path).rstrip('\n')
+            if pipeline_profile.profile_enabled:
+                # bytes of the file as stored, compressed files count their compressed size
+                profile_count("json_bytes_read", os.path.getsize(file_path))
             if not json_data:
                 return None
-
-            if not json_data.endswith(']'):
-                # If not, append a closing bracket
-                json_data += ']'
             # Load the JSON
-            json_data = json5.loads(json_data)
+            json_data, _ = load_json_text(json_data)
         return json_data
-    except json.JSONDecodeError as e:
+    except ValueError as e:
         print("JSON decode error:", e)
         return None
     except FileNotFoundError:
         print(f"File not found:{file_path}.")
         return None
+    except ImportError as e:
+        # a .zst file without the zstandard package, skipped like a missing file
+        pdb_id = os.path.basename(file_path).split("_refnum_")[0]
+        print(f"Mapping file of {pdb_id} can not be read: {e}.")
+        return None
+
+# Parsed refnum documents are kept between calls of get_igmap_domain, since input
+# files usually list several chains/domains of the same PDB. Entries are keyed by
+# PDB id and checked against the file mtime, and evicted least recently used once
+# either the entry count or the summed size of the source files is exceeded.
+# Set the environment variable refnum_cache=0 to switch it off.
+REFNUM_CACHE_MAX_ENTRIES = 256
+REFNUM_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+_refnum_cache = OrderedDict()
+_refnum_cache_lock = threading.Lock()
+refnum_cache_config = {"enabled": os.getenv("refnum_cache", "1") != "0",
+                       "max_entries": REFNUM_CACHE_MAX_ENTRIES,
+                       "max_bytes": REFNUM_CACHE_MAX_BYTES}
+refnum_cache_stats = {"hits": 0, "misses": 0, "evictions": 0, "bytes": 0}
+
+
+def configure_refnum_cache(enabled=None, max_entries=None, max_bytes=None):
+    """
+    Change the refnum cache settings. Arguments left as None are unchanged.
+    Shrinking the limits evicts entries straight away.
+    """
+    with _refnum_cache_lock:
+        if enabled is not None:
+            refnum_cache_config["enabled"] = bool(enabled)
+        if max_entries is not None:
+            refnum_cache_config["max_entries"] = int(max_entries)
+        if max_bytes is not None:
+            refnum_cache_config["max_bytes"] = int(max_bytes)
+        if not refnum_cache_config["enabled"]:
+            _refnum_cache.clear()
+            refnum_cache_stats["bytes"] = 0
+        _evict_refnum_cache()
+
+
+def clear_refnum_cache():
+    """
+    Drop all cached refnum documents and reset the counters.
+    """
+    with _refnum_cache_lock:
+        _refnum_cache.clear()
+        refnum_cache_stats.update({"hits": 0, "misses": 0, "evictions": 0, "bytes": 0})
+
+
+def refnum_cache_info():
+    """
+    Return the cache counters together with the current number of entries.
+    """
+    with _refnum_cache_lock:
+        return dict(refnum_cache_stats, entries=len(_refnum_cache), **refnum_cache_config)
+
+
+def _evict_refnum_cache():
+    """
+    Remove least recently used entries until the cache is within its limits.
+    Caller must hold _refnum_cache_lock.
+    """
+    while _refnum_cache and (len(_refnum_cache) > refnum_cache_config["max_entries"]
+                             or refnum_cache_stats["bytes"] > refnum_cache_config["max_bytes"]):
+        _, (_, file_size, _) = _refnum_cache.popitem(last=False)
+        refnum_cache_stats["bytes"] -= file_size
+        refnum_cache_stats["evictions"] += 1
+
+
+def get_refnum_data(pdb_id, numbering_name, input_path, use_cache=True):
+    """
+    Return the parsed {PDB}_refnum_{numbering_name}.json document.
+    input: pdb_id: 1cd8
+           numbering_name: igstrand
+           input_path: where file located.
+           use_cache: set False to always read the file again.
+    The returned document is shared between callers and must not be modified.
+    """
+    file_path = (find_mapping_file(pdb_id, input_path, numbering_name)
+                 or os.path.join(input_path, f"{pdb_id.upper()}_refnum_{numbering_name}.json"))
+    if not (use_cache and refnum_cache_config["enabled"]):
+        return load_json_file(file_path)
+
+    try:
+        file_stat = os.stat(file_path)
+    except OSError:
+        return load_json_file(file_path) # reports the missing file
+
+    cache_key = (pdb_id.upper(), numbering_name, os.path.abspath(input_path))
+    with _refnum_cache_lock:
+        cached = _refnum_cache.get(cache_key)
+        if cached is not None and cached[0] == file_stat.st_mtime_ns:
+            _refnum_cache.move_to_end(cache_key)
+            refnum_cache_stats["hits"] += 1
+            return cached[2]
+        refnum_cache_stats["misses"] += 1
+
+    json_data = load_json_file(file_path)
+
+    with _refnum_cache_lock:
+        previous = _refnum_cache.pop(cache_key, None)
+        if previous is not None:
+            refnum_cache_stats["bytes"] -= previous[1]
+        _refnum_cache[cache_key] = (file_stat.st_mtime_ns, file_stat.st_size, json_data)
+        refnum_cache_stats["bytes"] += file_stat.st_size
+        _evict_refnum_cache()
+
+    return json_data
+
+
+# Compiled refnum stores (refnum_store.py) per input folder. A store named
+# refnum_{numbering_name}.igstore inside the input folder is used automatically;
+# the environment variable refnum_store can point to another file, or be 0 to
+# never use one.
+_refnum_stores = {}
+_refnum_stores_lock = threading.Lock()
+
+
+def get_refnum_store(input_path, numbering_name):
+    """
+    Return the opened RefnumStore for input_path or None if there is no store.
+    """
+    store_key = (os.path.abspath(input_path), numbering_name)
+    refnum_store = _refnum_stores.get(store_key, False) # None: the folder has no store
+    if refnum_store is not False:
+        return refnum_store
+    with _refnum_stores_lock:
+        refnum_store = _refnum_stores.get(store_key, False)
+        if refnum_store is not False:
+            return refnum_store
+        store_path = os.getenv("refnum_store") or os.path.join(input_path, f"refnum_{numbering_name}.igstore")
+        refnum_store = None
+        if store_path != "0" and os.path.isfile(store_path):
+            from refnum_store import RefnumStore
+            try:
+                refnum_store = RefnumStore(store_path)
+            except ValueError as e:
+                print(f"{e}, compile it again. The json files are read instead.")
+            if refnum_store is not None and refnum_store.numbering_name != numbering_name:
+                refnum_store.close()
+                refnum_store = None
+        _refnum_stores[store_key] = refnum_store
+        return refnum_store
+
+
+def close_refnum_stores():
+    """
+    Close the opened stores, e.g. after compiling a new one.
+    """
+    with _refnum_stores_lock:
+        for refnum_store in _refnum_stores.values():
+            if refnum_store is not None:
+                refnum_store.close()
+        _refnum_stores.clear()
+
+
+def _get_current_store(pdb_id, numbering_name, input_path):
+    """
+    Return the compiled store when it has the PDB and is not older than its json
+    file, otherwise None.
+    """
+    refnum_store = get_refnum_store(input_path, numbering_name)
+    if refnum_store is None:
+        return None
+    stored_mtime = refnum_store.pdb_mtime(pdb_id)
+    if stored_mtime is None:
+        return None
+    file_path = find_mapping_file(pdb_id, input_path, numbering_name)
+    try:
+        if file_path is not None and os.stat(file_path).st_mtime_ns != stored_mtime:
+            return None
+    except OSError:
+        pass # only the store is there
+    return refnum_store
+
+
+def _get_stored_domain(pdb_chain_domain, numbering_name, input_path):
+    """
+    Look the domain up in the compiled store.
+    return: (True, domain or None) when the store has the PDB and is not older
+            than its json file, otherwise (False, None).
+    """
+    refnum_store = _get_current_store(pdb_chain_domain[0], numbering_name, input_path)
+    if refnum_store is None:
+        return False, None
+    return True, refnum_store.get_domain(*pdb_chain_domain)
+
 
 def parse_igmapinfo(igstrand_data):
     """
@@ -99,8 +338,6 @@ def parse_igmapinfo(igstrand_data):
     """
     ig_map_residue = {}
     undefined_res = []
-    ig_domain_start = str(igstrand_data[0].keys()).split("_")[-2]
-    ig_domain_end = str(igstrand_data[-1].keys()).split("_")[-2]
     for ig_num_info in igstrand_data:
         residue_identity, strand_number = next(iter(ig_num_info.items()))
         pdb_resid_info = residue_identity.split("_")
@@ -122,7 +359,114 @@ def parse_igmapinfo(igstrand_data):
         else:
             undefined_res.append(residue_number)
             print(f"undefined residues exits in {pdb_resid_info}")
-    return ig_map_residue, f"{ig_domain_start}:{ig_domain_end}", undefined_res
+    return ig_map_residue, igdomain_res_range(igstrand_data), undefined_res
+
+def igdomain_res_range(igstrand_data):
+    """
+    Residue range "start:end" of the refnum data of a domain, as parse_igmapinfo
+    returns it, from its first and last entries only.
+    """
+    ig_domain_start = str(igstrand_data[0].keys()).split("_")[-2]
+    ig_domain_end = str(igstrand_data[-1].keys()).split("_")[-2]
+    return f"{ig_domain_start}:{ig_domain_end}"
+
+
+class DomainRecord(dict):
+    """
+    Domain record of igdomain_delineate whose igstrand_data and undefined_info are
+    parsed from the refnum data on first access. Reading or changing it in any way
+    (record[key], get, items, setdefault, update, copying, pickling to worker
+    processes) gives the same values as the plain dict; the copies are plain dicts.
+    """
+    __slots__ = ("_refnum_data",)
+    lazy_keys = ("igstrand_data", "undefined_info")
+
+    def __init__(self, fields, refnum_data):
+        super().__init__(fields, undefined_info=None, igstrand_data=None)
+        self._refnum_data = refnum_data
+
+    def _parse(self):
+        if self._refnum_data is not None:
+            igstrand_data, _, undefined_info = parse_igmapinfo(self._refnum_data)
+            self._refnum_data = None
+            dict.__setitem__(self, "igstrand_data", igstrand_data)
+            dict.__setitem__(self, "undefined_info", undefined_info)
+
+    def __getitem__(self, key):
+        if key in self.lazy_keys:
+            self._parse()
+        return dict.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        if key in self.lazy_keys:
+            self._parse()
+        return dict.get(self, key, default)
+
+    def __setitem__(self, key, value):
+        if key in self.lazy_keys:
+            self._parse()
+        dict.__setitem__(self, key, value)
+
+    def __iter__(self):
+        # defining __iter__ makes dict(record) and {**record} read values through __getitem__
+        return dict.__iter__(self)
+
+    def items(self):
+        self._parse()
+        return dict.items(self)
+
+    def values(self):
+        self._parse()
+        return dict.values(self)
+
+    def pop(self, key, *default):
+        self._parse()
+        return dict.pop(self, key, *default)
+
+    def popitem(self):
+        self._parse()
+        return dict.popitem(self)
+
+    def setdefault(self, key, default=None):
+        self._parse()
+        return dict.setdefault(self, key, default)
+
+    def update(self, *other, **fields):
+        # parsing after the update would overwrite the new igstrand_data or undefined_info
+        self._parse()
+        dict.update(self, *other, **fields)
+
+    def __ior__(self, other):
+        self._parse()
+        return dict.__ior__(self, other)
+
+    def __delitem__(self, key):
+        self._parse()
+        dict.__delitem__(self, key)
+
+    def clear(self):
+        self._refnum_data = None
+        dict.clear(self)
+
+    def copy(self):
+        self._parse()
+        return dict(dict.items(self))
+
+    def __eq__(self, other):
+        self._parse()
+        if isinstance(other, DomainRecord):
+            other._parse()
+        return dict.__eq__(self, other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        self._parse()
+        return dict.__repr__(self)
+
+    def __reduce__(self):
+        return (dict, (self.copy(),))
+
 
 def sort_residue_range(item_dict, residue_range):
     """
@@ -150,6 +494,11 @@ def igdomain_delineate(ig_chain_data, pdbid_chain):
     with residues id as key and mapping as value.
     pdbid_chain: {"6xc2_A"}
     """
+    with profile_stage("delineation", items=len(ig_chain_data)):
+        return _igdomain_delineate(ig_chain_data, pdbid_chain)
+
+
+def _igdomain_delineate(ig_chain_data, pdbid_chain):
     parse_domain_data = []
     #
     for id_chain_3d, ref_ig_data in ig_chain_data.items():
@@ -159,12 +508,14 @@ def igdomain_delineate(ig_chain_data, pdbid_chain):
 
         domain3d_res_range = (":".join(domain_residues_info[1].split(":")[0:2]))
 
+        # only the residue range is needed to order the domains, the residues are
+        # parsed when a record is read
         igstrand_data = ref_ig_data['data']
-        igstrand_data, igD_res_range, undefined_info = parse_igmapinfo(igstrand_data)
+        igD_res_range = igdomain_res_range(igstrand_data)
 
 
-        parse_domain_ref = {"3Ddomain_order": domain3d_order, "refpdbname": ref_ig_data['refpdbname'], "Igtype": ref2igtype[ref_ig_data['refpdbname']], "igD_res_range":igD_res_range, 
-        "3dD_res_range":domain3d_res_range, "tmscore":ref_ig_data['score'], "seqid":ref_ig_data["seqid"], "nresAlign": ref_ig_data["nresAlign"], "undefined_info": undefined_info,  "igstrand_data":igstrand_data}
+        parse_domain_ref = DomainRecord({"3Ddomain_order": domain3d_order, "refpdbname": ref_ig_data['refpdbname'], "Igtype": ref2igtype[ref_ig_data['refpdbname']], "igD_res_range":igD_res_range, 
+        "3dD_res_range":domain3d_res_range, "tmscore":ref_ig_data['score'], "seqid":ref_ig_data["seqid"], "nresAlign": ref_ig_data["nresAlign"]}, igstrand_data)
         parse_domain_data.append(parse_domain_ref)
 
     #  3d domain order  from numbering is not accurate sometimes.  Make domain order based on 
@@ -178,39 +529,116 @@ def igdomain_delineate(ig_chain_data, pdbid_chain):
 
 
 
-def get_igmap_domain(pdb_chain_domain, numbering_name, input_path):
+# input domain that stands for every Ig domain of the chain: "5ESV H *"
+CHAIN_WILDCARD = "*"
+
+
+def find_chain_data(json_data, pdb_id, pdb_chain):
+    """
+    Return the refnum data of pdb_chain ("5ESV_H") from a parsed refnum file, or None.
+    The first Ig parse listing the chain is used.
+    """
+    for files_ig in json_data:
+        if pdb_id in files_ig: # filter pdb id
+            # # check if ig or not.
+            if files_ig[pdb_id]['Ig domain']== 1: # this means it has ig
+                for ig_parse in files_ig[pdb_id]['igs']:
+                    if pdb_chain in ig_parse:
+                        return ig_parse.get(pdb_chain)
+    return None
+
+
+def get_igmap_chain_domains(pdb_id, chain, numbering_name, input_path, use_cache=True):
+    """
+    Return every Ig domain of one chain, delineated once.
+    output: {"1": domain record, "2": ...} in domain order, empty when the chain has no Ig domain.
+    """
+    refnum_store = _get_current_store(pdb_id, numbering_name, input_path)
+    if refnum_store is not None:
+        profile_count("refnum_store_hits")
+        chain_domains = {}
+        # domains of a chain are numbered 1, 2, ... without gaps
+        while True:
+            domain = str(len(chain_domains) + 1)
+            stored_domain = refnum_store.get_domain(pdb_id, chain, domain)
+            if stored_domain is None:
+                return chain_domains
+            chain_domains[domain] = stored_domain
+
+    json_data = get_refnum_data(pdb_id, numbering_name, input_path, use_cache)
+    pdb_chain = pdb_id.upper() + "_" + chain
+    chain_data = find_chain_data(json_data, pdb_id.upper(), pdb_chain) if json_data else None
+    if not chain_data:
+        return {}
+    return {key[len(pdb_chain) + 1:]: domain for key, domain in igdomain_delineate(chain_data, pdb_chain).items()}
+
+
+def expand_igmap_domains(pdb_chain_domains, numbering_name, input_path, use_cache=True):
+    """
+    Look many (pdb, chain, domain) lines up at once. The lines are grouped by PDB and
+    chain so each chain is delineated once; the domain CHAIN_WILDCARD ("*") stands for
+    every Ig domain of its chain.
+    output: one list per input line: [(pdb_chain_domain, domain record or None)] and for a
+            "*" line one entry per Ig domain of the chain (an empty list when it has none).
+    """
+    chains = {}
+    expanded = []
+    for pdb_chain_domain in pdb_chain_domains:
+        if len(pdb_chain_domain) != 3:
+            raise ValueError("pdb_chain_domain length must be 3")
+        pdb_id, chain, domain = pdb_chain_domain
+        if domain != CHAIN_WILDCARD:
+            # compiled store answers single domains without delineating the chain
+            found_in_store, stored_domain = _get_stored_domain(pdb_chain_domain, numbering_name, input_path)
+            if found_in_store:
+                profile_count("refnum_store_hits")
+                expanded.append([(pdb_chain_domain, stored_domain)])
+                continue
+
+        chain_key = (pdb_id.upper(), chain)
+        if chain_key not in chains:
+            chains[chain_key] = get_igmap_chain_domains(pdb_id, chain, numbering_name, input_path, use_cache)
+        chain_domains = chains[chain_key]
+        if domain == CHAIN_WILDCARD:
+            if not chain_domains:
+                print(f"No Ig domain is found in {pdb_id} chain {chain}")
+            expanded.append([((pdb_id, chain, order), chain_domain) for order, chain_domain in chain_domains.items()])
+        else:
+            expanded.append([(pdb_chain_domain, chain_domains.get(str(domain)))])
+    return expanded
+
+
+def get_igmap_domains(pdb_chain_domains, numbering_name, input_path, use_cache=True):
+    """
+    Batch version of get_igmap_domain, see expand_igmap_domains.
+    output: [(pdb_chain_domain, domain record or None), ...] in input order, "*" lines
+            replaced by the domains of their chain.
+    """
+    return [resolved for resolved_line in expand_igmap_domains(pdb_chain_domains, numbering_name, input_path, use_cache)
+            for resolved in resolved_line]
+
+
+def get_igmap_domain(pdb_chain_domain, numbering_name, input_path, use_cache=True):
     """
     input: pdb_id: pdbid (1cd8)
            first_sel: ("A", "1") # chain, ig domainn # 1 based
            second_sel: ("B, "1")# chain, ig domain # 1 based
            input_path: where file located.
+           use_cache: reuse the parsed refnum file from earlier calls.
     ouput: list of dictionary of mapping information of that chain.
 
     """
     if len(pdb_chain_domain) != 3:
          raise ValueError("pdb_chain_domain length must be 3")
 
-    pdb_chain = pdb_chain_domain[0].upper() + "_" + pdb_chain_domain[1]
-    domain = pdb_chain_domain[2]
-    
-
-    refnum_file = f"{pdb_chain_domain[0].upper()}_refnum_{numbering_name}.json"
-    json_data = load_json_file(os.path.join(input_path, refnum_file))
-
-    if json_data:
-        for files_ig in json_data:
-            if pdb_chain_domain[0].upper() in files_ig: # filter pdb id
-                # # check if ig or not.
-                if files_ig[pdb_chain_domain[0].upper()]['Ig domain']== 1: # this means it has ig
-                    for ig_parse in files_ig[pdb_chain_domain[0].upper()]['igs']:
-                        # we have two ids.
-                        # check if id_chain exits#
-                        if pdb_chain in ig_parse: # check first chain
-                            ig_prase_filter_data = ig_parse.get(pdb_chain)
-
-                            return igdomain_delineate(ig_prase_filter_data, pdb_chain).get(pdb_chain + "_" + str(domain))             
-                            
-    return 
+    # compiled store answers without parsing the json file
+    found_in_store, stored_domain = _get_stored_domain(pdb_chain_domain, numbering_name, input_path)
+    if found_in_store:
+        profile_count("refnum_store_hits")
+        return stored_domain
+
+    chain_domains = get_igmap_chain_domains(pdb_chain_domain[0], pdb_chain_domain[1], numbering_name, input_path, use_cache)
+    return chain_domains.get(str(pdb_chain_domain[2]))
 
 
 if __name__ == "__main__":
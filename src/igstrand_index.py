@@ -0,0 +1,254 @@
+#!/usr/bin/python3
+"""
+Inverted index of the corpus: IgStrand position and residue -> domains.
+
+build reads every *_refnum_igstrand.json of a folder once and keeps, for every
+(position, residue letter) seen, the sorted array of the ids of the domains with that
+residue there; positions, strands and Ig types get such arrays too. A query intersects the arrays
+of its terms, so it never touches the refnum files.
+
+usage: python igstrand_index.py build [-i ../input/number_mapping_files] [-o INDEX]
+       python igstrand_index.py query 2550=C 3550=W [-x INDEX] [--count]
+
+Query terms (all must hold; "!" in front negates a term):
+    2550=C      residue C at position 2550 (the strand may be given: B2550=C)
+    2550=CS     C or S at 2550
+    2550        any residue at 2550
+    strand=C''  at least one residue on strand C''
+    igtype=IgV  Ig type of the domain
+e.g. all IgV domains without a C'' strand:  query igtype=IgV "!strand=C''"
+
+Positions are the IgStrand number with its insertion letter, without the strand, as
+in the 2D templates (POSITION_MASK of igstrand_number).
+"""
+import os
+import argparse
+import numpy as np
+
+from igstrand_domain_mapping import load_json_file
+from igstrand_number import POSITION_MASK, encode_igstrand_number, parse_igstrand_number
+from refnum_store import iter_refnum_domains
+from mapping_files import iter_mapping_files
+
+INDEX_VERSION = 1
+RESIDUE_BITS = 8 # residue letter in the low byte of an index key
+
+
+def residue_key(position_code, residue_letter):
+    return (position_code << RESIDUE_BITS) | ord(residue_letter)
+
+
+def position_code(position):
+    """
+    "B2550", "2550a" or 2550 -> position code; raises ValueError otherwise.
+    """
+    return encode_igstrand_number(str(position)) & POSITION_MASK
+
+
+def _postings(keys, domain_ids):
+    """
+    Group domain ids by key.
+    return: sorted unique keys, offsets into the postings (len(keys) + 1) and the
+            postings, domain ids sorted within each key
+    """
+    order = np.lexsort((domain_ids, keys))
+    keys, domain_ids = keys[order], domain_ids[order]
+    unique_keys, starts = np.unique(keys, return_index=True)
+    offsets = np.append(starts, len(keys)).astype(np.int64)
+    return unique_keys, offsets, domain_ids.astype(np.int32)
+
+
+class IgstrandIndex:
+    """
+    Domain names and Ig types, plus posting arrays of residues (keyed by residue_key),
+    of positions (keyed by position code) and of strands (keyed by strand name index).
+    """
+
+    def __init__(self, domain_names, igtypes, igtype_names, residue_keys, residue_offsets, residue_postings,
+                 position_keys, position_offsets, position_postings, strand_names, strand_keys, strand_offsets,
+                 strand_postings):
+        self.domain_names = domain_names
+        self.igtypes = igtypes
+        self.igtype_names = list(igtype_names)
+        self.residue_keys = residue_keys
+        self.residue_offsets = residue_offsets
+        self.residue_postings = residue_postings
+        self.position_keys = position_keys
+        self.position_offsets = position_offsets
+        self.position_postings = position_postings
+        self.strand_names = list(strand_names)
+        self.strand_keys = strand_keys
+        self.strand_offsets = strand_offsets
+        self.strand_postings = strand_postings
+
+    def __len__(self):
+        return len(self.domain_names)
+
+    def save(self, index_path):
+        """
+        Write the index as one uncompressed .npz file (np.savez adds the extension).
+        """
+        np.savez(index_path, version=INDEX_VERSION, domain_names=self.domain_names, igtypes=self.igtypes,
+                 igtype_names=np.array(self.igtype_names), residue_keys=self.residue_keys,
+                 residue_offsets=self.residue_offsets, residue_postings=self.residue_postings,
+                 position_keys=self.position_keys, position_offsets=self.position_offsets,
+                 position_postings=self.position_postings, strand_names=np.array(self.strand_names), strand_keys=self.strand_keys,
+                 strand_offsets=self.strand_offsets, strand_postings=self.strand_postings)
+
+    @classmethod
+    def load(cls, index_path):
+        with np.load(index_path) as index_file:
+            if int(index_file["version"]) != INDEX_VERSION:
+                raise ValueError(f"{index_path} is not an igstrand index (version {INDEX_VERSION})")
+            return cls(index_file["domain_names"], index_file["igtypes"], index_file["igtype_names"].tolist(),
+                       index_file["residue_keys"], index_file["residue_offsets"], index_file["residue_postings"],
+                       index_file["position_keys"], index_file["position_offsets"], index_file["position_postings"],
+                       index_file["strand_names"].tolist(), index_file["strand_keys"],
+                       index_file["strand_offsets"], index_file["strand_postings"])
+
+    @staticmethod
+    def _posting(keys, offsets, postings, key):
+        """
+        Sorted domain ids of key, empty when the key is not indexed.
+        """
+        start = np.searchsorted(keys, key)
+        if start == len(keys) or keys[start] != key:
+            return postings[:0]
+        return postings[offsets[start]:offsets[start + 1]]
+
+    def residue_domains(self, position, residues=None):
+        """
+        Domains with one of the residue letters (any residue when None) at position.
+        """
+        code = position_code(position)
+        if residues is None:
+            return self._posting(self.position_keys, self.position_offsets, self.position_postings, code)
+        found = [self._posting(self.residue_keys, self.residue_offsets, self.residue_postings, residue_key(code, letter))
+                 for letter in residues]
+        return found[0] if len(found) == 1 else np.unique(np.concatenate(found))
+
+    def strand_domains(self, strand):
+        """
+        Domains with at least one residue on strand.
+        """
+        if strand not in self.strand_names:
+            return np.empty(0, dtype=np.int32)
+        strand_id = self.strand_names.index(strand)
+        return self._posting(self.strand_keys, self.strand_offsets, self.strand_postings, strand_id)
+
+    def igtype_domains(self, igtype):
+        if igtype not in self.igtype_names:
+            return np.empty(0, dtype=np.int32)
+        return np.flatnonzero(self.igtypes == self.igtype_names.index(igtype)).astype(np.int32)
+
+    def term_domains(self, term):
+        """
+        Domains matching one query term (without its "!"), see the module docstring.
+        """
+        field, has_value, value = term.partition("=")
+        if has_value and not value:
+            raise ValueError(f"Query term {term} has nothing after '='")
+        if field == "strand":
+            return self.strand_domains(value)
+        if field == "igtype":
+            return self.igtype_domains(value)
+        return self.residue_domains(field, value if has_value else None)
+
+    def query(self, terms):
+        """
+        Ids of the domains matching every term, sorted; "!term" excludes the matches of term.
+        Raises ValueError for a term that is not understood.
+        """
+        included, excluded = [], []
+        for term in terms:
+            if term.startswith("!"):
+                excluded.append(self.term_domains(term[1:]))
+            else:
+                included.append(self.term_domains(term))
+
+        if included:
+            # smallest first keeps every intersection small
+            included.sort(key=len)
+            domain_ids = included[0]
+            for other in included[1:]:
+                domain_ids = np.intersect1d(domain_ids, other, assume_unique=True)
+        else:
+            domain_ids = np.arange(len(self), dtype=np.int32)
+        for other in excluded:
+            domain_ids = np.setdiff1d(domain_ids, other, assume_unique=True)
+        return domain_ids
+
+    def query_names(self, terms):
+        """
+        Names ("5ESV_A_1") of the domains matching every term.
+        """
+        return self.domain_names[self.query(terms)].tolist()
+
+
+def build_igstrand_index(input_path, numbering_name="igstrand"):
+    """
+    Index every Ig domain of the {PDB}_refnum_{numbering_name}.json files of input_path.
+    return: IgstrandIndex
+    """
+    domain_names, igtypes = [], []
+    igtype_ids, strand_ids = {}, {}
+    residue_keys, residue_domains, position_keys, position_domains, strand_keys, strand_domains = [], [], [], [], [], []
+    for pdb_id, file_path in iter_mapping_files(input_path, numbering_name):
+        for key, domain_data in iter_refnum_domains(load_json_file(file_path), pdb_id):
+            domain_id = len(domain_names)
+            domain_names.append(key)
+            igtypes.append(igtype_ids.setdefault(domain_data["Igtype"], len(igtype_ids)))
+
+            domain_keys, domain_strands = [], set()
+            for igstrand_num, (residue_letter, _) in domain_data["igstrand_data"].items():
+                parsed = parse_igstrand_number(igstrand_num)
+                if parsed is None or len(residue_letter) != 1:
+                    continue
+                domain_keys.append(residue_key(encode_igstrand_number(igstrand_num) & POSITION_MASK, residue_letter))
+                domain_strands.add(strand_ids.setdefault(parsed[0], len(strand_ids)))
+            residue_keys.append(np.unique(np.array(domain_keys, dtype=np.int64)))
+            residue_domains.append(np.full(len(residue_keys[-1]), domain_id, dtype=np.int32))
+            position_keys.append(np.unique(residue_keys[-1] >> RESIDUE_BITS))
+            position_domains.append(np.full(len(position_keys[-1]), domain_id, dtype=np.int32))
+            strand_keys.append(np.array(sorted(domain_strands), dtype=np.int64))
+            strand_domains.append(np.full(len(domain_strands), domain_id, dtype=np.int32))
+
+    def joined(arrays, dtype):
+        return np.concatenate(arrays) if arrays else np.empty(0, dtype=dtype)
+
+    residue_postings = _postings(joined(residue_keys, np.int64), joined(residue_domains, np.int32))
+    position_postings = _postings(joined(position_keys, np.int64), joined(position_domains, np.int32))
+    strand_postings = _postings(joined(strand_keys, np.int64), joined(strand_domains, np.int32))
+    return IgstrandIndex(np.array(domain_names), np.array(igtypes, dtype=np.int16),
+                         sorted(igtype_ids, key=igtype_ids.get), *residue_postings, *position_postings,
+                         sorted(strand_ids, key=strand_ids.get), *strand_postings)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build or query the igstrand position index')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser('build', help='Index every domain of a number_mapping_files folder')
+    build_parser.add_argument('-i', '--input', help='Folder with refnum json files', default="../input/number_mapping_files")
+    build_parser.add_argument('-o', '--output', help='Index file (default: INPUT/refnum_NUMBERING.igindex.npz)')
+    build_parser.add_argument('-n', '--numbering', help='Numbering name', default="igstrand")
+    query_parser = subparsers.add_parser('query', help='Print the domains matching every term')
+    query_parser.add_argument('terms', nargs='+', help="2550=C, 2550, strand=C'', igtype=IgV; ! negates")
+    query_parser.add_argument('-x', '--index', help='Index file', default="../input/number_mapping_files/refnum_igstrand.igindex.npz")
+    query_parser.add_argument('--count', help='Only print the number of matching domains', action='store_true')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        index_path = args.output or os.path.join(args.input, f"refnum_{args.numbering}.igindex.npz")
+        igstrand_index = build_igstrand_index(args.input, args.numbering)
+        igstrand_index.save(index_path)
+        print(f"{len(igstrand_index)} Ig domains, {len(igstrand_index.residue_keys)} position residues are indexed in {index_path}")
+    else:
+        igstrand_index = IgstrandIndex.load(args.index)
+        try:
+            domain_names = igstrand_index.query_names(args.terms)
+        except ValueError as e:
+            parser.error(str(e))
+        if args.count:
+            print(len(domain_names))
+        else:
+            print("\n".join(domain_names))
@@ -0,0 +1,131 @@
+#!/usr/bin/python3
+"""
+Compact integer form of IgStrand numbers. Strings such as "C'4548", "A'1846a" and
+"B2550_loop" are parsed once into strand, number, insertion letter and loop flag and
+packed into one int, so ordering alignment columns, finding x50 anchors and looking
+numbers up are integer operations.
+
+Bits, low to high: loop flag (1), strand id (5), insertion (5; 0 none, 1..26 a..z),
+number (20). Codes therefore sort by number, then insertion, then strand.
+"""
+import threading
+from functools import lru_cache
+import numpy as np
+
+LOOP_MASK = 0x1
+STRAND_SHIFT = 1
+STRAND_MASK = 0x1F << STRAND_SHIFT
+INSERTION_SHIFT = 6
+INSERTION_MASK = 0x1F << INSERTION_SHIFT
+NUMBER_SHIFT = 11
+MAX_NUMBER = (1 << 20) - 1
+
+# code without loop flag and insertion: the 1D column of a residue
+COLUMN_MASK = ~(LOOP_MASK | INSERTION_MASK)
+# code without loop flag and strand: the number as written in the 2D templates
+POSITION_MASK = ~(LOOP_MASK | STRAND_MASK)
+
+# strand ids; "" is a bare number (2D template cells). Strands not listed here get
+# the next free id when first seen, so their ids are only valid inside one process.
+STRANDS = ["", "A", "A'", "A+", "A-", "A--", "A---", "B", "C", "C'", "C''", "D", "E", "E+", "F", "G", "G+"]
+strand_ids = {strand: strand_id for strand_id, strand in enumerate(STRANDS)}
+_strand_lock = threading.Lock()
+
+
+def parse_igstrand_number(number_string):
+    """
+    This will split an igstrand number into its parts
+    input: "A'1846a_loop"
+    output: ("A'", 1846, "a", True); None if it is not an igstrand number
+    """
+    start = 0
+    while start < len(number_string) and not number_string[start].isdigit():
+        start += 1
+    end = start
+    while end < len(number_string) and number_string[end].isdigit():
+        end += 1
+    if start == end:
+        return None
+    insertion, _, loop_text = number_string[end:].partition("_")
+    if len(insertion) > 1 or (insertion and not "a" <= insertion <= "z"):
+        return None
+    return number_string[:start], int(number_string[start:end]), insertion, bool(loop_text)
+
+
+def get_strand_id(strand):
+    """
+    Id of a strand name, registering strands that are not in STRANDS yet.
+    """
+    strand_id = strand_ids.get(strand)
+    if strand_id is None:
+        # threads of the alignment server can see a new strand at the same time
+        with _strand_lock:
+            strand_id = strand_ids.get(strand)
+            if strand_id is None:
+                strand_id = len(STRANDS)
+                if strand_id > STRAND_MASK >> STRAND_SHIFT:
+                    raise ValueError(f"Too many strand names to encode, {strand} can not be added")
+                STRANDS.append(strand)
+                strand_ids[strand] = strand_id
+    return strand_id
+
+
+@lru_cache(maxsize=65536)
+def encode_igstrand_number(number_string):
+    """
+    "C'4548" -> int code; raises ValueError if it is not an igstrand number.
+    """
+    parsed = parse_igstrand_number(str(number_string))
+    if parsed is None or parsed[1] > MAX_NUMBER:
+        raise ValueError(f"Not an igstrand number: {number_string}")
+    strand, number, insertion, loop = parsed
+    insertion_id = ord(insertion) - ord("a") + 1 if insertion else 0
+    return (number << NUMBER_SHIFT) | (insertion_id << INSERTION_SHIFT) | (get_strand_id(strand) << STRAND_SHIFT) | int(loop)
+
+
+def igstrand_fields(codes):
+    """
+    Split codes (int or numpy array) into number, insertion id, strand id and loop flag.
+    """
+    return codes >> NUMBER_SHIFT, (codes & INSERTION_MASK) >> INSERTION_SHIFT, (codes & STRAND_MASK) >> STRAND_SHIFT, codes & LOOP_MASK
+
+
+def is_anchor(codes):
+    """
+    True for x50 numbers, the most conserved residue of a strand (int or numpy array).
+    """
+    return (codes >> NUMBER_SHIFT) % 100 == 50
+
+
+def strand_name(code):
+    return STRANDS[(code & STRAND_MASK) >> STRAND_SHIFT]
+
+
+def decode_igstrand_number(code):
+    """
+    int code -> "C'4548"; loop numbers get the "_loop" suffix.
+    """
+    number, insertion_id, strand_id, loop = igstrand_fields(int(code))
+    insertion = chr(ord("a") + insertion_id - 1) if insertion_id else ""
+    return f"{STRANDS[strand_id]}{number}{insertion}{'_loop' if loop else ''}"
+
+
+def encode_igstrand_numbers(number_strings):
+    """
+    Vectorized encode_igstrand_number: iterable of strings -> int32 array.
+    """
+    return np.fromiter((encode_igstrand_number(number_string) for number_string in number_strings), dtype=np.int32)
+
+
+def decode_igstrand_numbers(codes):
+    """
+    Vectorized decode_igstrand_number: array of codes -> list of strings.
+    """
+    return [decode_igstrand_number(code) for code in np.asarray(codes).tolist()]
+
+
+def strand_names(codes):
+    """
+    Strand name of every code of an array, as an object array.
+    """
+    return np.array(STRANDS, dtype=object)[(np.asarray(codes) & STRAND_MASK) >> STRAND_SHIFT]
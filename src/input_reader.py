@@ -0,0 +1,140 @@
+#!/usr/bin/python3
+"""
+Reader of the "pdbid chain domain" input files shared by the 1D, 2D and main scripts.
+Lines are streamed from a file or stdin ("-"); fields may be separated by any
+whitespace and "#" starts a comment. Large inputs can be deduplicated and sorted by
+PDB id, so one PDB's lines follow each other and its mapping file is parsed once.
+"""
+import os
+import sys
+import heapq
+import tempfile
+from collections import OrderedDict
+
+DEDUPE_WINDOW = 1000000 # (pdb, chain, domain) triples remembered by dedupe_input_lines
+SORT_CHUNK_LINES = 1000000 # lines sorted in memory before they go to a temporary file
+
+
+def iter_input_lines(file_path):
+    """
+    Yield (PDB, chain, domain) of every input line; "-" reads stdin.
+    Blank lines and comments are skipped, lines without three fields are reported.
+    """
+    input_file = sys.stdin if file_path == "-" else open(file_path)
+    try:
+        yield from parse_input_lines(input_file)
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+
+
+def parse_input_lines(text_lines):
+    """
+    Yield (PDB, chain, domain) of "pdbid chain domain" text lines, as iter_input_lines.
+    """
+    for text_line in text_lines:
+        field = text_line.split("#", 1)[0].split()
+        if not field:
+            continue
+        if len(field) == 3:
+            yield (field[0].upper(), field[1], field[2])
+        else:
+            print(f"Make sure {field} has three value: pdbid chain domain")
+
+
+def dedupe_input_lines(input_lines, window=DEDUPE_WINDOW):
+    """
+    Drop repeated (pdb, chain, domain) triples. Memory is bounded by window: only the
+    last window distinct triples are remembered, so repeats further apart than that
+    are kept (never a line that was not seen before is dropped).
+    """
+    seen = OrderedDict()
+    for input_line in input_lines:
+        if input_line in seen:
+            seen.move_to_end(input_line)
+            continue
+        seen[input_line] = None
+        if len(seen) > window:
+            seen.popitem(last=False)
+        yield input_line
+
+
+def _write_sorted_chunk(chunk, tmp_dir):
+    """
+    Sort (pdb, input index, chain, domain) rows and write them to a temporary file.
+    """
+    chunk.sort()
+    chunk_file = tempfile.NamedTemporaryFile("w", dir=tmp_dir, prefix="input_sort_", suffix=".tsv", delete=False)
+    with chunk_file:
+        for pdb, index, chain, domain in chunk:
+            chunk_file.write(f"{pdb}\t{index}\t{chain}\t{domain}\n")
+    return chunk_file.name
+
+
+def _read_sorted_chunk(chunk_file_name):
+    with open(chunk_file_name) as chunk_file:
+        for chunk_line in chunk_file:
+            pdb, index, chain, domain = chunk_line.rstrip("\n").split("\t")
+            yield pdb, int(index), chain, domain
+
+
+def sort_input_lines(input_lines, chunk_lines=SORT_CHUNK_LINES, tmp_dir=None):
+    """
+    Yield the input lines sorted by PDB id; lines of one PDB keep their input order.
+    Inputs longer than chunk_lines are sorted in chunks on disk and merged.
+    """
+    chunk, chunk_files = [], []
+    try:
+        for index, (pdb, chain, domain) in enumerate(input_lines):
+            chunk.append((pdb, index, chain, domain))
+            if len(chunk) >= chunk_lines:
+                chunk_files.append(_write_sorted_chunk(chunk, tmp_dir))
+                chunk = []
+        chunk.sort()
+        sorted_rows = heapq.merge(iter(chunk), *[_read_sorted_chunk(chunk_file) for chunk_file in chunk_files])
+        for pdb, _, chain, domain in sorted_rows:
+            yield (pdb, chain, domain)
+    finally:
+        for chunk_file in chunk_files:
+            os.remove(chunk_file)
+
+
+def dedupe_sorted_input_lines(sorted_lines):
+    """
+    Exact deduplication of lines sorted by PDB: only the current PDB's triples are kept.
+    """
+    current_pdb, seen = None, set()
+    for input_line in sorted_lines:
+        if input_line[0] != current_pdb:
+            current_pdb, seen = input_line[0], set()
+        if input_line not in seen:
+            seen.add(input_line)
+            yield input_line
+
+
+def stream_input_file(file_path, dedupe=False, sort_by_pdb=False):
+    """
+    Generator of the (PDB, chain, domain) lines of file_path ("-": stdin).
+    dedupe: drop repeated lines (exact when sorted, else see dedupe_input_lines)
+    sort_by_pdb: group the lines by PDB id, see sort_input_lines
+    """
+    input_lines = iter_input_lines(file_path)
+    if sort_by_pdb:
+        input_lines = sort_input_lines(input_lines)
+        return dedupe_sorted_input_lines(input_lines) if dedupe else input_lines
+    return dedupe_input_lines(input_lines) if dedupe else input_lines
+
+
+def read_input_file(file_path, dedupe=False, sort_by_pdb=False):
+    """
+    Read input file.
+    return: [("5ESV", "A", "1"), ...], see stream_input_file
+    """
+    return list(stream_input_file(file_path, dedupe, sort_by_pdb))
+
+
+def input_save_name(file_path):
+    """
+    Name used for the output files of an input file; "stdin" for "-".
+    """
+    return "stdin" if file_path == "-" else file_path.split(".")[0]
@@ -1,44 +1,103 @@
 import argparse
-import subprocess
-import os, json
+import os
+
+from alignment_1D_igstrand import run_1d_alignment, run_1d_append, run_1d_two_pass
+from alignment_1D_export import export_extensions, parse_formats
+from alignment_2D_igstrand import run_2d_alignment, template_row_col_default
+from domain_resolver import resolve_input_domains
+from input_reader import read_input_file, stream_input_file, input_save_name
+from igstrand_domain_mapping import refnum_cache_info, json_loader_stats
+from igstrand_number import encode_igstrand_number
+from residue_profile import group_by_fields, ALL_DOMAINS
+from pipeline_profile import enable_profile, profile_stage, profile_report, write_profile_report, format_profile_summary
 
 def main():
     # Define the argument parser
     parser = argparse.ArgumentParser(description='Process input file for 1D or 2D aligment.')
-    parser.add_argument('-f', '--file', help='Input file must have pdbid chain Domain', required=True)
+    parser.add_argument('-f', '--file', help='Input file must have pdbid chain Domain, - reads stdin', required=True)
+    parser.add_argument('--dedupe', help='Skip repeated pdbid chain domain lines', action='store_true')
+    parser.add_argument('--sort-by-pdb', help='Group the input lines by pdb id', action='store_true')
     parser.add_argument('-d', '--dimension', help='Processing dimension (1D, 2D, or 1D,2D)', required=True)
+    parser.add_argument('-j', '--jobs', help='Parallel node processes creating missing mapping files', type=int, default=4)
+    parser.add_argument('--timeout', help='Seconds allowed to create one mapping file', type=float, default=600)
+    parser.add_argument('--worker', help='Keep node worker processes running instead of one node run per pdb', action='store_true')
+    parser.add_argument('--node-script', help='refnum.js creating the missing mapping files (e.g. refnum_worker_stub.js for offline tests)', default="./refnum.js")
+    parser.add_argument('--workers', help='Processes parsing the mapping files, input grouped by pdb (0: no extra processes)', type=int, default=0)
+    parser.add_argument('--checkpoint-every', help='Also save the 2D file after every N domains', type=int, default=0)
+    parser.add_argument('--checkpoint-seconds', help='Also save the 2D file every T seconds', type=float, default=0)
+    parser.add_argument('--format', help=f"1D output formats, comma separated: {', '.join(export_extensions)}", default="xlsx")
+    parser.add_argument('--append', help='Only add the lines that are not in the existing 1D output of this input file', action='store_true')
+    parser.add_argument('--residue-stats', help='Also write 1D residue statistics per position, for all domains or per group',
+                        nargs='?', const=ALL_DOMAINS, choices=(ALL_DOMAINS,) + group_by_fields)
+    parser.add_argument('--two-pass', help='Stream the 1D domains twice instead of holding them all in memory (no --append)', action='store_true')
+    parser.add_argument('--profile', help='Time every stage and write profile_<input name>igstrand.json to the output folder', action='store_true')
     args = parser.parse_args()
+    try:
+        formats = parse_formats(args.format)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.two_pass and args.append:
+        parser.error("--two-pass can not be combined with --append")
 
-    template_row_col = {
-        "V_column_range": 21,
-        "V_row_range" : 47}
-
+    template_row_col = dict(template_row_col_default)
 
-    # Set environment variables
-    os.environ['input_file_path'] = "../input/"
-    os.environ['output_file_path'] = "../output/"
-    os.environ['node_js_file_path'] = "node_js_script/"
-    os.environ['numbering_name'] = "igstrand"
-    # dictionary can not be set as environment variable. so
-    # Serialize the dictionary to a JSON string
-    template_row_col_json = json.dumps(template_row_col)
+    input_file_path = "../input/"
+    output_file_path = "../output/"
+    numbering_name = "igstrand"
 
-    # Set the JSON string in the environment variable
-    os.environ['template_row_col'] = template_row_col_json
+    dimensions = args.dimension.split(',')
+    for dim in dimensions:
+        if dim not in ('1D', '2D'):
+            print(f"Invalid dimension specified: {dim}. Supported dimensions are 1D, 2D, or 1D,2D.")
+    dimensions = [dim for dim in dimensions if dim in ('1D', '2D')]
+    if not dimensions:
+        return
 
+    if args.profile:
+        enable_profile()
+        with profile_stage("total"):
+            run_dimensions(args, dimensions, formats, template_row_col, input_file_path, output_file_path, numbering_name)
+        report = profile_report(caches={"refnum_cache": refnum_cache_info(), "json_loader": dict(json_loader_stats),
+                                        "igstrand_codes": encode_igstrand_number.cache_info()._asdict()})
+        report_file = f"{output_file_path}profile_{input_save_name(args.file)}{numbering_name}.json"
+        write_profile_report(report, report_file)
+        print(format_profile_summary(report))
+        print(f"Profile saved as {report_file}")
+    else:
+        run_dimensions(args, dimensions, formats, template_row_col, input_file_path, output_file_path, numbering_name)
 
 
-    dimensions = args.dimension.split(',')
+def run_dimensions(args, dimensions, formats, template_row_col, input_file_path, output_file_path, numbering_name):
+    # read the input and resolve every domain once; 1D and 2D share the records.
+    # An --append 1D run resolves only the lines missing from its saved state, a
+    # --two-pass 1D run streams the input itself when there is no 2D.
+    output_save_name = input_save_name(args.file)
+    resolve_options = {"jobs": args.jobs, "timeout": args.timeout, "use_worker": args.worker, "workers": args.workers,
+                       "node_script": args.node_script}
+    input_file_data = resolved_domains = None
+    if '2D' in dimensions or not args.two_pass:
+        with profile_stage("read_input") as stage:
+            input_file_data = read_input_file(args.file, args.dedupe, args.sort_by_pdb)
+            stage.items = len(input_file_data)
+    if '2D' in dimensions or not (args.append or args.two_pass):
+        resolved_domains = resolve_input_domains(input_file_data, input_file_path, numbering_name, **resolve_options)
 
     for dim in dimensions:
-        if dim == '1D':
-            # Call the alignment_1D_igstrand.py script
-            subprocess.run(['python', 'alignment_1D_igstrand.py', '-f', args.file])
+        if dim == '1D' and args.two_pass:
+            input_lines = input_file_data if input_file_data is not None else stream_input_file(args.file, args.dedupe, args.sort_by_pdb)
+            run_1d_two_pass(input_lines, input_file_path, output_file_path, output_save_name, numbering_name, formats,
+                            args.residue_stats, **resolve_options)
+        elif dim == '1D' and args.append:
+            if args.residue_stats:
+                print("Residue statistics are not written by --append runs, see residue_profile.py compute.")
+            run_1d_append(input_file_data, input_file_path, output_file_path, output_save_name, numbering_name, formats,
+                          **resolve_options)
+        elif dim == '1D':
+            run_1d_alignment(resolved_domains, output_file_path, output_save_name, numbering_name, formats,
+                             residue_stats=args.residue_stats)
         elif dim == '2D':
-            # Call the alignment_2D_igstrand.py script
-            subprocess.run(['python', 'alignment_2D_igstrand.py', '-f', args.file])
-        else:
-            print(f"Invalid dimension specified: {dim}. Supported dimensions are 1D, 2D, or 1D,2D.")
+            run_2d_alignment(resolved_domains, input_file_path, output_file_path, output_save_name, numbering_name, template_row_col,
+                             args.checkpoint_every, args.checkpoint_seconds)
 
 if __name__ == '__main__':
     main()
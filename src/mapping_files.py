@@ -0,0 +1,212 @@
+#!/usr/bin/python3
+"""
+Layout of a number_mapping_files folder. A {PDB}_refnum_igstrand.json file can be
+
+  flat        number_mapping_files/1ABC_refnum_igstrand.json (as node writes it)
+  sharded     number_mapping_files/ab/1ABC_refnum_igstrand.json, the folder named by the
+              2nd and 3rd character of the PDB id (the wwPDB scheme)
+
+and plain, gzip (.json.gz) or zstd (.json.zst) compressed. A mapping_layout.json in the
+folder, written by migrate, says where new files go and which place is tried first;
+the other places are still looked at, so a folder can be migrated while in use.
+
+usage: python mapping_files.py migrate [-i ../input/number_mapping_files] [--shard] [--compression zst]
+       python mapping_files.py layout [-i ../input/number_mapping_files]
+"""
+import os
+import gzip
+import json
+import argparse
+import threading
+
+try:
+    import zstandard
+except ImportError: # only needed for .zst files
+    zstandard = None
+
+LAYOUT_FILE_NAME = "mapping_layout.json"
+compression_suffixes = {"none": "", "gz": ".gz", "zst": ".zst"}
+ZSTD_LEVEL = 10 # refnum text compresses about 10x; decompression speed hardly depends on the level
+GZIP_LEVEL = 6
+
+_layouts = {}
+
+
+def mapping_layout(mapping_file_path):
+    """
+    {"sharded": bool, "compression": "none" | "gz" | "zst"} of a mapping folder; flat
+    plain files when it has no mapping_layout.json. Read once per folder.
+    """
+    layout_key = os.path.abspath(mapping_file_path)
+    if layout_key not in _layouts:
+        layout = {"sharded": False, "compression": "none"}
+        try:
+            with open(os.path.join(mapping_file_path, LAYOUT_FILE_NAME)) as layout_file:
+                layout.update(json.load(layout_file))
+        except FileNotFoundError:
+            pass
+        _layouts[layout_key] = layout
+    return _layouts[layout_key]
+
+
+def mapping_shard(pdb_name):
+    return pdb_name[1:3].lower()
+
+
+def mapping_file_candidates(pdb_name, mapping_file_path, numbering_name="igstrand"):
+    """
+    Every path the mapping file of pdb_name can have, the one of the folder layout first.
+    """
+    layout = mapping_layout(mapping_file_path)
+    file_name = f"{pdb_name.upper()}_refnum_{numbering_name}.json"
+    folders = [mapping_file_path, os.path.join(mapping_file_path, mapping_shard(pdb_name))]
+    suffixes = list(compression_suffixes.values())
+    if layout["sharded"]:
+        folders.reverse()
+    suffixes.remove(compression_suffixes[layout["compression"]])
+    suffixes.insert(0, compression_suffixes[layout["compression"]])
+    return [os.path.join(folder, file_name + suffix) for folder in folders for suffix in suffixes]
+
+
+def find_mapping_file(pdb_name, mapping_file_path, numbering_name="igstrand"):
+    """
+    Path of the existing mapping file of pdb_name or None.
+    """
+    for file_path in mapping_file_candidates(pdb_name, mapping_file_path, numbering_name):
+        if os.path.isfile(file_path):
+            return file_path
+    return None
+
+
+def mapping_file_target(pdb_name, mapping_file_path, numbering_name="igstrand"):
+    """
+    Path a new mapping file of pdb_name is written to, following the folder layout.
+    """
+    return mapping_file_candidates(pdb_name, mapping_file_path, numbering_name)[0]
+
+
+def read_mapping_bytes(file_path):
+    """
+    Content of a mapping file, decompressed by its suffix. The compressed file is
+    read in one call, which is what makes compression pay off on network file systems.
+    """
+    with open(file_path, "rb") as mapping_file:
+        data = mapping_file.read()
+    if file_path.endswith(".gz"):
+        return gzip.decompress(data)
+    if file_path.endswith(".zst"):
+        if zstandard is None:
+            raise ImportError(f"Reading {file_path} needs the zstandard package")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    return data
+
+
+def read_mapping_text(file_path):
+    return read_mapping_bytes(file_path).decode()
+
+
+def compress_mapping_bytes(data, file_path):
+    if file_path.endswith(".gz"):
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    if file_path.endswith(".zst"):
+        if zstandard is None:
+            raise ImportError(f"Writing {file_path} needs the zstandard package")
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return data
+
+
+def write_mapping_bytes(data, file_path):
+    """
+    Write (and compress by suffix) a mapping file; a temporary name is used first so
+    parallel runs never see half written files.
+    return: bytes written
+    """
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    data = compress_mapping_bytes(data, file_path)
+    tmp_file_name = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_file_name, "wb") as f:
+        f.write(data)
+    os.replace(tmp_file_name, file_path)
+    return len(data)
+
+
+def iter_mapping_files(mapping_file_path, numbering_name="igstrand"):
+    """
+    Yield (PDB id, file path) of every mapping file of the folder and its shard
+    folders, sorted by PDB id. A PDB found in several places is listed once, at the
+    place find_mapping_file would use.
+    """
+    suffix = f"_refnum_{numbering_name}.json"
+    found = {}
+    folders = [mapping_file_path]
+    with os.scandir(mapping_file_path) as entries:
+        folders += sorted(entry.path for entry in entries if entry.is_dir() and len(entry.name) == 2)
+    for folder in folders:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                name = entry.name
+                for compression_suffix in compression_suffixes.values():
+                    if name.endswith(suffix + compression_suffix) and entry.is_file():
+                        found.setdefault(name[:-len(suffix + compression_suffix)].upper(), []).append(entry.path)
+    for pdb_name in sorted(found):
+        file_paths = found[pdb_name]
+        if len(file_paths) > 1:
+            candidates = mapping_file_candidates(pdb_name, mapping_file_path, numbering_name)
+            file_paths = sorted(file_paths, key=lambda file_path: candidates.index(file_path)
+                                if file_path in candidates else len(candidates))
+        yield pdb_name, file_paths[0]
+
+
+def migrate_mapping_files(mapping_file_path, sharded=True, compression="zst", numbering_name="igstrand"):
+    """
+    Move every mapping file of the folder to the given layout and record it in
+    mapping_layout.json. Each file is written (keeping its mtime) before the old
+    one is removed, so an interrupted migration can simply be run again; once the
+    new file of a PDB exists, its files at any other place are removed.
+    return: number of files moved
+    """
+    if compression not in compression_suffixes:
+        raise ValueError(f"Unknown compression {compression}, use one of {', '.join(compression_suffixes)}")
+    layout = {"sharded": sharded, "compression": compression}
+    with open(os.path.join(mapping_file_path, LAYOUT_FILE_NAME), "w") as layout_file:
+        json.dump(layout, layout_file)
+    _layouts[os.path.abspath(mapping_file_path)] = layout
+    # listed by the new layout, so files already moved by an interrupted run are taken as they are
+    old_files = list(iter_mapping_files(mapping_file_path, numbering_name))
+
+    moved = 0
+    for pdb_name, old_path in old_files:
+        candidates = mapping_file_candidates(pdb_name, mapping_file_path, numbering_name)
+        new_path = candidates[0]
+        if os.path.abspath(new_path) != os.path.abspath(old_path):
+            old_stat = os.stat(old_path)
+            write_mapping_bytes(read_mapping_bytes(old_path), new_path)
+            os.utime(new_path, ns=(old_stat.st_atime_ns, old_stat.st_mtime_ns))
+            moved += 1
+        # old files left by an interrupted migration would be read by an older layout
+        for file_path in candidates[1:]:
+            if os.path.isfile(file_path):
+                os.remove(file_path)
+    return moved
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Show or change the layout of a mapping file folder')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    migrate_parser = subparsers.add_parser('migrate', help='Move every mapping file to a new layout')
+    migrate_parser.add_argument('-i', '--input', help='Mapping file folder', default="../input/number_mapping_files")
+    migrate_parser.add_argument('--shard', help='Put the files in shard folders named by the PDB id', action='store_true')
+    migrate_parser.add_argument('--compression', help='Compression of the files', choices=list(compression_suffixes), default="zst")
+    migrate_parser.add_argument('-n', '--numbering', help='Numbering name', default="igstrand")
+    layout_parser = subparsers.add_parser('layout', help='Print the layout and the number of mapping files')
+    layout_parser.add_argument('-i', '--input', help='Mapping file folder', default="../input/number_mapping_files")
+    layout_parser.add_argument('-n', '--numbering', help='Numbering name', default="igstrand")
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        moved = migrate_mapping_files(args.input, args.shard, args.compression, args.numbering)
+        print(f"{moved} mapping files are moved to the {'sharded' if args.shard else 'flat'} layout, compression {args.compression}")
+    else:
+        layout = mapping_layout(args.input)
+        n_files = sum(1 for _ in iter_mapping_files(args.input, args.numbering))
+        print(f"{args.input}: {'sharded' if layout['sharded'] else 'flat'}, compression {layout['compression']}, {n_files} mapping files")
@@ -0,0 +1,147 @@
+#!/usr/bin/python3
+"""
+Per stage timing and counters of a run, switched on with --profile.
+
+    with profile_stage("json_parse", items=1):
+        ...
+    profile_count("bytes_written", n)
+
+Stages record calls, wall and CPU seconds and items; stages can nest (json_parse runs
+inside resolve), so their times are not meant to add up. CPU time is the CPU time of
+this process, node runs are separate processes. When profiling is off profile_stage
+returns one shared no-op object and profile_count returns at once.
+"""
+import json
+import time
+import threading
+
+profile_enabled = False
+_profile_lock = threading.Lock()
+_stages = {} # stage name -> {"calls", "wall", "cpu", "items"}
+_counters = {}
+_started = None
+
+
+class _ProfileStage:
+    __slots__ = ("name", "items", "wall_start", "cpu_start")
+
+    def __init__(self, name, items):
+        self.name = name
+        self.items = items
+
+    def __enter__(self):
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        return self
+
+    def __exit__(self, *exc_info):
+        wall = time.perf_counter() - self.wall_start
+        cpu = time.process_time() - self.cpu_start
+        with _profile_lock:
+            stage = _stages.setdefault(self.name, {"calls": 0, "wall": 0.0, "cpu": 0.0, "items": 0})
+            stage["calls"] += 1
+            stage["wall"] += wall
+            stage["cpu"] += cpu
+            stage["items"] += self.items
+        return False
+
+
+class _NoProfileStage:
+    __slots__ = ("items",)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_no_profile_stage = _NoProfileStage()
+
+
+def enable_profile(enabled=True):
+    """
+    Switch profiling on (and start the run clock) or off.
+    """
+    global profile_enabled
+    profile_enabled = enabled
+    if enabled:
+        reset_profile()
+
+
+def reset_profile():
+    global _started
+    with _profile_lock:
+        _stages.clear()
+        _counters.clear()
+    _started = (time.perf_counter(), time.process_time())
+
+
+def profile_stage(name, items=0):
+    """
+    Context manager timing one stage; set .items inside the block when the count
+    is only known afterwards.
+    """
+    if not profile_enabled:
+        return _no_profile_stage
+    return _ProfileStage(name, items)
+
+
+def profile_count(name, n=1):
+    if not profile_enabled:
+        return
+    with _profile_lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def profile_snapshot():
+    """
+    Copy of the stages and counters, to send from worker processes to the parent.
+    """
+    with _profile_lock:
+        return {"stages": {name: dict(stage) for name, stage in _stages.items()}, "counters": dict(_counters)}
+
+
+def merge_profile(snapshot):
+    """
+    Add a profile_snapshot of another process.
+    """
+    with _profile_lock:
+        for name, other in snapshot["stages"].items():
+            stage = _stages.setdefault(name, {"calls": 0, "wall": 0.0, "cpu": 0.0, "items": 0})
+            for field in stage:
+                stage[field] += other[field]
+        for name, n in snapshot["counters"].items():
+            _counters[name] = _counters.get(name, 0) + n
+
+
+def profile_report(caches=None):
+    """
+    The report as a dict: run wall/CPU seconds, stages, counters and the given cache
+    statistics ({"refnum_cache": {...}, ...}).
+    """
+    wall = time.perf_counter() - _started[0] if _started else 0.0
+    cpu = time.process_time() - _started[1] if _started else 0.0
+    snapshot = profile_snapshot()
+    return {"wall": wall, "cpu": cpu, "stages": snapshot["stages"], "counters": snapshot["counters"], "caches": caches or {}}
+
+
+def write_profile_report(report, report_file):
+    with open(report_file, "w") as f:
+        json.dump(report, f, indent=1)
+
+
+def format_profile_summary(report):
+    """
+    One screen text summary of profile_report, stages by wall time.
+    """
+    lines = [f"Profile: {report['wall']:.2f} s wall, {report['cpu']:.2f} s CPU",
+             f"{'stage':22s} {'calls':>7s} {'items':>8s} {'wall s':>9s} {'cpu s':>9s} {'% wall':>7s}"]
+    for name, stage in sorted(report["stages"].items(), key=lambda item: -item[1]["wall"]):
+        share = 100 * stage["wall"] / report["wall"] if report["wall"] else 0.0
+        lines.append(f"{name:22s} {stage['calls']:7d} {stage['items']:8d} {stage['wall']:9.3f} {stage['cpu']:9.3f} {share:6.1f}%")
+    if report["counters"]:
+        lines.append("counters: " + ", ".join(f"{name}={value}" for name, value in sorted(report["counters"].items())))
+    for cache_name, cache_stats in report["caches"].items():
+        lines.append(f"{cache_name}: " + ", ".join(f"{name}={value}" for name, value in cache_stats.items()))
+    return "\n".join(lines)
@@ -13,6 +13,10 @@ const { exec } = require('child_process');
 
 let fs = require('fs/promises');
 
+let readline = require('readline');
+
+let util = require('util');
+
 let myArgs = process.argv.slice(2);
 if(myArgs.length != 1 && myArgs.length != 2) {
     //type: igstrand, kabat, or imgt
@@ -21,6 +25,7 @@ if(myArgs.length != 1 && myArgs.length != 2) {
     return;
 }
 
+let bWorker = (myArgs[0] == '--worker');
 let idArray = myArgs[0].split(',');
 let type = 'igstrand'; //myArgs[1];
 
@@ -46,47 +51,53 @@ async function getPdbArray(refpdbArray) {
     return pdbDataArray;
 }
 
-async function getRefnum(template) {
-  try {
-    // max ajax calls to get templates
-    me.cfg.maxajax = 4;
-
+async function getReferences() {
     // get template PDBs
     // await ic.refnumCls.showIgRefNum();
     ic.refnumCls.setRefPdbs();
-    let ref2igtype = ic.ref2igtype;
-    let refpdbArray = ic.refpdbArray;
-    let refpdbHash = ic.refpdbHash;
+    let refs = {'ref2igtype': ic.ref2igtype, 'refpdbArray': ic.refpdbArray, 'refpdbHash': ic.refpdbHash};
 
     // let pdbAjaxArray = ic.refnumCls.getPdbAjaxArray();
     // let pdbDataArray = await ic.refnumCls.promiseWithFixedJobs(pdbAjaxArray);
-    let pdbDataArray = await getPdbArray(ic.refpdbArray);
+    refs.pdbDataArray = await getPdbArray(ic.refpdbArray);
 
-    // loop through each PDB/UniProt ID
-    console.log('[');
-    for(let m = 0, ml = idArray.length; m < ml; ++m) {
-        let inputid = idArray[m];
+    return refs;
+}
 
-        let AFUniprotVersion = 'v4';
+async function processId(inputid, template, refs) {
+    let AFUniprotVersion = 'v4';
 
-        let url = (inputid.length == 4) ? "https://www.ncbi.nlm.nih.gov/Structure/mmdb/mmdb_strview.cgi?v=2&program=icn3d&b=1&s=1&ft=1&bu=0&complexity=2&uid=" + inputid
-            : "https://alphafold.ebi.ac.uk/files/AF-" + inputid + "-F1-model_" + AFUniprotVersion + ".pdb";
+    let url = (inputid.length == 4) ? "https://www.ncbi.nlm.nih.gov/Structure/mmdb/mmdb_strview.cgi?v=2&program=icn3d&b=1&s=1&ft=1&bu=0&complexity=2&uid=" + inputid
+        : "https://alphafold.ebi.ac.uk/files/AF-" + inputid + "-F1-model_" + AFUniprotVersion + ".pdb";
 
-        // initialize for each ID
-        me = new icn3d.iCn3DUI({});
-        me.setIcn3d();
-        ic = me.icn3d;
-        ic.bRender = false;
-        
-        ic.ref2igtype = ref2igtype;
-        ic.refpdbArray = refpdbArray;
-        ic.refpdbHash = refpdbHash;
-        ic.pdbDataArray = pdbDataArray;
+    // initialize for each ID
+    me = new icn3d.iCn3DUI({});
+    me.setIcn3d();
+    ic = me.icn3d;
+    ic.bRender = false;
+    
+    ic.ref2igtype = refs.ref2igtype;
+    ic.refpdbArray = refs.refpdbArray;
+    ic.refpdbHash = refs.refpdbHash;
+    ic.pdbDataArray = refs.pdbDataArray;
 
-        await getIdProcessPromise(inputid, url, template);
+    await getIdProcessPromise(inputid, url, template);
 
-        ic = null;
-        me = null;
+    ic = null;
+    me = null;
+}
+
+async function getRefnum(template) {
+  try {
+    // max ajax calls to get templates
+    me.cfg.maxajax = 4;
+
+    let refs = await getReferences();
+
+    // loop through each PDB/UniProt ID
+    console.log('[');
+    for(let m = 0, ml = idArray.length; m < ml; ++m) {
+        await processId(idArray[m], template, refs);
     }
 
     console.log(']');
@@ -95,6 +106,43 @@ async function getRefnum(template) {
   }
 }
 
+// Worker mode: node refnum.js --worker [template]
+// The reference PDBs are read once, then one PDB/UniProt ID per stdin line is processed.
+// Each answer is framed as "#refnum ok|error <byte length>\n" followed by that many bytes
+// (the same text a one-shot run prints). "#ready\n" is written once the worker accepts requests.
+async function runWorker(template) {
+    let writeFrame = process.stdout.write.bind(process.stdout);
+    let consoleLog = console.log;
+
+    me.cfg.maxajax = 4;
+    let refs = await getReferences();
+
+    let lines = readline.createInterface({input: process.stdin});
+    writeFrame('#ready\n');
+    for await (const line of lines) {
+        let inputid = line.trim();
+        if(!inputid) continue;
+
+        // collect everything processId prints as the answer of this request
+        let output = [];
+        console.log = function() { output.push(util.format.apply(null, arguments) + '\n'); };
+        let status = 'ok';
+        try {
+            output.push('[\n');
+            await processId(inputid, template, refs);
+            output.push(']\n');
+        } catch (err) {
+            status = 'error';
+            output = [String(err) + '\n'];
+        }
+        console.log = consoleLog;
+
+        let payload = Buffer.from(output.join(''), 'utf8');
+        writeFrame('#refnum ' + status + ' ' + payload.length + '\n');
+        writeFrame(payload);
+    }
+}
+
 function getIdProcessPromise(inputid, url, template) {
     return new Promise(function(resolve, reject) {
         https.get(url, function(res1) {
@@ -379,4 +427,9 @@ async function parseAlignData(dataArray, domainidpairArray, bRound1) {
     return bNoMoreIg;
 }
 
-getRefnum(template);
+if(bWorker) {
+    runWorker(template);
+}
+else {
+    getRefnum(template);
+}
@@ -0,0 +1,316 @@
+#!/usr/bin/python3
+"""
+Compiled, memory-mapped store of the *_refnum_igstrand.json files.
+
+compile turns a number_mapping_files folder into one binary file holding every
+delineated Ig domain, so a (pdb, chain, domain) lookup is a hash probe into the
+mapped file instead of reading and parsing json.
+
+usage: python refnum_store.py compile [-i ../input/number_mapping_files] [-o STORE]
+       python refnum_store.py lookup 5ESV A 1 [-s STORE]
+
+Layout (little endian):
+    header   magic, version, number of hash slots, slot table offset, names offset
+    records  one per domain, plus one marker record per compiled PDB
+    names    numbering name and loop assignment names
+    slots    open addressing table of (key hash, record offset + 1)
+
+Domain record: fixed part (RECORD), key, text fields joined by \\x1f, then the
+columnar residue payload: residue letters (1 byte each, 0 for no residue),
+loop codes (uint16 each, index into the loop names), igstrand number end
+offsets (uint32 each) and the igstrand number bytes.
+"""
+import os
+import mmap
+import struct
+import hashlib
+import argparse
+
+from igstrand_domain_mapping import load_json_file, igdomain_delineate, ref2igtype
+from mapping_files import iter_mapping_files
+
+STORE_MAGIC = b"IGSTORE1"
+STORE_VERSION = 2
+HEADER = struct.Struct("<8sIIQQHH4x")  # magic, version, n_slots, slots_offset, names_offset, len(numbering), len(loop names)
+SLOT = struct.Struct("<QQ")  # key hash, record offset + 1 (0: empty slot)
+# kind, flags, key length, 3D domain order, residues, score, seqid, source mtime_ns, nresAlign, text length
+RECORD = struct.Struct("<BBHIIddqII")
+FIELD_SEP = "\x1f"
+MAX_LOOP_NAMES = 1 << 16
+
+KIND_PDB = 0
+KIND_DOMAIN = 1
+FLAG_SCORE_INT = 1
+FLAG_SEQID_INT = 2
+
+
+def store_key_hash(key):
+    """
+    Stable 64 bit hash of a store key (never 0, which marks an empty slot).
+    """
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+
+
+def domain_key(pdb_id, chain, domain):
+    """
+    Store key of a domain, same as the keys returned by igdomain_delineate: 5ESV_A_1
+    """
+    return f"{pdb_id.upper()}_{chain}_{domain}"
+
+
+def _pad8(buffer):
+    buffer.extend(b"\0" * (-len(buffer) % 8))
+
+
+def _encode_domain(key, domain_data, mtime_ns, loop_codes):
+    """
+    Serialize one record returned by igdomain_delineate.
+    """
+    flags = 0
+    if isinstance(domain_data["tmscore"], int):
+        flags |= FLAG_SCORE_INT
+    if isinstance(domain_data["seqid"], int):
+        flags |= FLAG_SEQID_INT
+
+    text = FIELD_SEP.join([domain_data["refpdbname"], domain_data["igD_res_range"], domain_data["3dD_res_range"],
+                           ",".join(domain_data["undefined_info"])]).encode()
+    key_bytes = key.encode()
+
+    igstrand_data = domain_data["igstrand_data"]
+    letters = bytearray()
+    loops = []
+    number_ends = []
+    numbers = bytearray()
+    for igstrand_num, (residue_letter, loop_assign) in igstrand_data.items():
+        letter_bytes = residue_letter.encode()
+        if len(letter_bytes) > 1 or letter_bytes == b"\0":
+            raise ValueError(f"Residue {residue_letter!r} of {key} {igstrand_num} is not one letter")
+        letters += letter_bytes or b"\0"
+        if loop_assign not in loop_codes:
+            if len(loop_codes) == MAX_LOOP_NAMES:
+                raise ValueError(f"More than {MAX_LOOP_NAMES} loop assignment names")
+            loop_codes[loop_assign] = len(loop_codes)
+        loops.append(loop_codes[loop_assign])
+        numbers += igstrand_num.encode()
+        number_ends.append(len(numbers))
+
+    record = bytearray(RECORD.pack(KIND_DOMAIN, flags, len(key_bytes), domain_data["3Ddomain_order"], len(igstrand_data),
+                                   domain_data["tmscore"], domain_data["seqid"], mtime_ns, domain_data["nresAlign"], len(text)))
+    record += key_bytes
+    record += text
+    _pad8(record)
+    record += letters
+    _pad8(record)
+    record += struct.pack(f"<{len(loops)}H", *loops)
+    _pad8(record)
+    record += struct.pack(f"<{len(number_ends)}I", *number_ends)
+    record += numbers
+    _pad8(record)
+    return record
+
+
+def _encode_pdb_marker(pdb_id, mtime_ns):
+    key_bytes = pdb_id.encode()
+    record = bytearray(RECORD.pack(KIND_PDB, 0, len(key_bytes), 0, 0, 0.0, 0.0, mtime_ns, 0, 0))
+    record += key_bytes
+    _pad8(record)
+    return record
+
+
+def iter_refnum_domains(json_data, pdb_id):
+    """
+    Yield (key, domain record) for every Ig domain of a parsed refnum file,
+    following the same selection as get_igmap_domain (first entry of a chain wins).
+    """
+    seen_chains = set()
+    for files_ig in json_data or []:
+        if pdb_id not in files_ig or files_ig[pdb_id]['Ig domain'] != 1:
+            continue
+        for ig_parse in files_ig[pdb_id]['igs']:
+            for pdb_chain, ig_chain_data in ig_parse.items():
+                if pdb_chain in seen_chains:
+                    continue
+                seen_chains.add(pdb_chain)
+                yield from igdomain_delineate(ig_chain_data, pdb_chain).items()
+
+
+def compile_refnum_store(input_path, store_path, numbering_name="igstrand"):
+    """
+    Compile every {PDB}_refnum_{numbering_name}.json of input_path into store_path.
+    return: number of PDB files, number of domains
+    """
+    loop_codes = {"": 0}
+    body = bytearray()
+    index = []  # (key, record offset)
+    n_files = 0
+
+    for pdb_id, file_path in iter_mapping_files(input_path, numbering_name):
+        n_files += 1
+        mtime_ns = os.stat(file_path).st_mtime_ns
+        json_data = load_json_file(file_path)
+
+        index.append((pdb_id, HEADER.size + len(body)))
+        body += _encode_pdb_marker(pdb_id, mtime_ns)
+        for key, domain_data in iter_refnum_domains(json_data, pdb_id):
+            index.append((key, HEADER.size + len(body)))
+            body += _encode_domain(key, domain_data, mtime_ns, loop_codes)
+
+    n_slots = 8
+    while n_slots < 2 * len(index):
+        n_slots *= 2
+    slots = [(0, 0)] * n_slots
+    for key, offset in index:
+        key_hash = store_key_hash(key)
+        slot = key_hash & (n_slots - 1)
+        while slots[slot][0]:
+            slot = (slot + 1) & (n_slots - 1)
+        slots[slot] = (key_hash, offset + 1)
+
+    numbering_bytes = numbering_name.encode()
+    loop_names = FIELD_SEP.join(sorted(loop_codes, key=loop_codes.get)).encode()
+    names = numbering_bytes + loop_names
+    # names follow the records so record offsets stay independent of them
+    names_offset = HEADER.size + len(body)
+    slots_offset = names_offset + len(names)
+    slots_offset += -slots_offset % 8
+
+    tmp_path = store_path + ".tmp"
+    with open(tmp_path, "wb") as store_file:
+        store_file.write(HEADER.pack(STORE_MAGIC, STORE_VERSION, n_slots, slots_offset, names_offset,
+                                     len(numbering_bytes), len(loop_names)))
+        store_file.write(body)
+        store_file.write(names)
+        store_file.write(b"\0" * (slots_offset - names_offset - len(names)))
+        store_file.write(b"".join(SLOT.pack(*slot) for slot in slots))
+    os.replace(tmp_path, store_path)
+
+    return n_files, len(index) - n_files
+
+
+class RefnumStore:
+    """
+    Read only view of a compiled store. Lookups probe the slot table in the
+    mapped file and decode only the requested record.
+    """
+
+    def __init__(self, store_path):
+        self.store_path = store_path
+        with open(store_path, "rb") as store_file:
+            self._mmap = mmap.mmap(store_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        magic, version, self.n_slots, self.slots_offset, names_offset, numbering_len, loops_len = HEADER.unpack_from(self._mmap, 0)
+        if magic != STORE_MAGIC or version != STORE_VERSION:
+            self.close()
+            raise ValueError(f"{store_path} is not a refnum store (version {STORE_VERSION})")
+        names = bytes(self._view[names_offset:names_offset + numbering_len + loops_len]).decode()
+        self.numbering_name = names[:numbering_len]
+        self.loop_names = names[numbering_len:].split(FIELD_SEP)
+
+    def close(self):
+        self._view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _find(self, key):
+        """
+        Return the record offset of key or None.
+        """
+        key_hash = store_key_hash(key)
+        key_bytes = key.encode()
+        mask = self.n_slots - 1
+        slot = key_hash & mask
+        while True:
+            slot_hash, offset = SLOT.unpack_from(self._mmap, self.slots_offset + slot * SLOT.size)
+            if not slot_hash:
+                return None
+            if slot_hash == key_hash:
+                offset -= 1
+                key_len = RECORD.unpack_from(self._mmap, offset)[2]
+                start = offset + RECORD.size
+                if self._view[start:start + key_len] == key_bytes:
+                    return offset
+            slot = (slot + 1) & mask
+
+    def pdb_mtime(self, pdb_id):
+        """
+        Source file mtime_ns of a compiled PDB or None when the PDB is not in the store.
+        """
+        offset = self._find(pdb_id.upper())
+        return None if offset is None else RECORD.unpack_from(self._mmap, offset)[7]
+
+    def get_columns(self, pdb_id, chain, domain):
+        """
+        Zero copy access to a domain record.
+        return: (header tuple, text fields, letters, loop codes, number end offsets, number bytes)
+                as memoryviews into the store, or None.
+        """
+        offset = self._find(domain_key(pdb_id, chain, domain))
+        if offset is None:
+            return None
+        header = RECORD.unpack_from(self._mmap, offset)
+        key_len, n_res, text_len = header[2], header[4], header[9]
+        position = offset + RECORD.size + key_len
+        text = self._view[position:position + text_len]
+        position += text_len
+        position += -position % 8
+        letters = self._view[position:position + n_res]
+        position += n_res
+        position += -position % 8
+        loops = self._view[position:position + 2 * n_res].cast("H")
+        position += 2 * n_res
+        position += -position % 8
+        number_ends = self._view[position:position + 4 * n_res].cast("I")
+        position += 4 * n_res
+        numbers = self._view[position:position + (number_ends[-1] if n_res else 0)]
+        return header, text, letters, loops, number_ends, numbers
+
+    def get_domain(self, pdb_id, chain, domain):
+        """
+        Same record as get_igmap_domain returns, or None when the domain is not in the store.
+        """
+        columns = self.get_columns(pdb_id, chain, domain)
+        if columns is None:
+            return None
+        header, text, letters, loops, number_ends, numbers = columns
+        kind, flags, _, domain_order, n_res, score, seqid, _, nres_align, _ = header
+        refpdbname, igd_res_range, domain3d_res_range, undefined_info = bytes(text).decode().split(FIELD_SEP)
+
+        letters = bytes(letters).decode()
+        numbers = bytes(numbers).decode()
+        igstrand_data = {}
+        start = 0
+        for i in range(n_res):
+            igstrand_data[numbers[start:number_ends[i]]] = (letters[i].strip("\0"), self.loop_names[loops[i]])
+            start = number_ends[i]
+
+        return {"3Ddomain_order": domain_order, "refpdbname": refpdbname, "Igtype": ref2igtype.get(refpdbname, ""),
+                "igD_res_range": igd_res_range, "3dD_res_range": domain3d_res_range,
+                "tmscore": int(score) if flags & FLAG_SCORE_INT else score,
+                "seqid": int(seqid) if flags & FLAG_SEQID_INT else seqid, "nresAlign": nres_align,
+                "undefined_info": undefined_info.split(",") if undefined_info else [], "igstrand_data": igstrand_data}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compile or query a refnum store')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    compile_parser = subparsers.add_parser('compile', help='Compile number_mapping_files into one store')
+    compile_parser.add_argument('-i', '--input', help='Folder with refnum json files', default="../input/number_mapping_files")
+    compile_parser.add_argument('-o', '--output', help='Store file (default: INPUT/refnum_NUMBERING.igstore)')
+    compile_parser.add_argument('-n', '--numbering', help='Numbering name', default="igstrand")
+    lookup_parser = subparsers.add_parser('lookup', help='Print one domain record from a store')
+    lookup_parser.add_argument('pdb_chain_domain', nargs=3, help='pdbid chain domain')
+    lookup_parser.add_argument('-s', '--store', help='Store file', default="../input/number_mapping_files/refnum_igstrand.igstore")
+    args = parser.parse_args()
+
+    if args.command == 'compile':
+        store_path = args.output or os.path.join(args.input, f"refnum_{args.numbering}.igstore")
+        n_files, n_domains = compile_refnum_store(args.input, store_path, args.numbering)
+        print(f"{n_domains} Ig domains from {n_files} refnum files are compiled into {store_path}")
+    else:
+        with RefnumStore(args.store) as refnum_store:
+            print(refnum_store.get_domain(*args.pdb_chain_domain))
@@ -0,0 +1,58 @@
+// Stand-in for refnum.js that needs neither icn3d nor network access.
+// usage: node refnum_worker_stub.js --worker [mapping file folder]
+//        node refnum_worker_stub.js PDBID [mapping file folder]
+//
+// With --worker it speaks the worker protocol of refnum.js: "#ready" once, then for
+// every PDB id read from stdin one "#refnum ok|error <byte length>" line followed by
+// the payload. Given a PDB id it prints the payload once, as "node refnum.js PDBID" does.
+// The payload is the existing {ID}_refnum_igstrand.json of the folder (default
+// ../input/number_mapping_files) or an empty Ig domain entry. The ids CRASH and HANG
+// make the stub exit or stop answering, to exercise restarts and timeouts.
+
+let fs = require('fs');
+let path = require('path');
+let readline = require('readline');
+
+let myArgs = process.argv.slice(2);
+let mappingFolder = (myArgs.length == 2) ? myArgs[1] : path.join(__dirname, '..', 'input', 'number_mapping_files');
+
+function writeFrame(status, text) {
+    let payload = Buffer.from(text, 'utf8');
+    process.stdout.write('#refnum ' + status + ' ' + payload.length + '\n');
+    process.stdout.write(payload);
+}
+
+function refnumText(inputid) {
+    let mappingFile = path.join(mappingFolder, inputid + '_refnum_igstrand.json');
+    if(fs.existsSync(mappingFile)) {
+        return fs.readFileSync(mappingFile, 'utf8');
+    }
+    return '[\n{"' + inputid + '": {"Ig domain" : 0, "igs": [\n]}},\n]\n';
+}
+
+if(myArgs[0] != '--worker') {
+    let inputid = myArgs[0].trim().toUpperCase();
+    if(inputid == 'CRASH') {
+        process.stderr.write('refnum stub crashed on purpose\n');
+        process.exit(1);
+    }
+    if(inputid == 'HANG') {
+        setInterval(function() {}, 1000);
+    }
+    else {
+        process.stdout.write(refnumText(inputid));
+    }
+}
+else {
+    let lines = readline.createInterface({input: process.stdin});
+    process.stdout.write('#ready\n');
+    lines.on('line', function(line) {
+        let inputid = line.trim().toUpperCase();
+        if(!inputid) return;
+
+        if(inputid == 'CRASH') process.exit(1);
+        if(inputid == 'HANG') return;
+
+        writeFrame('ok', refnumText(inputid));
+    });
+}
@@ -0,0 +1,187 @@
+#!/usr/bin/python3
+"""
+Residue profile of every IgStrand position: residue frequencies, occupancy, loop
+fraction, Shannon entropy and consensus residue, for all domains or per Igtype or
+refpdbname.
+
+The counts are collected in one pass over the domain records and can be merged, so
+the input never has to fit in memory as an alignment and shards computed separately
+(in parallel or on other machines) give the same result once merged:
+
+usage: python residue_profile.py compute -f input.txt [--group-by Igtype] [-o OUTPUT_BASE]
+       python residue_profile.py merge shard1.residue_stats.json shard2.residue_stats.json -o OUTPUT_BASE
+
+Every run writes OUTPUT_BASE.residue_stats.tsv and OUTPUT_BASE.residue_stats.json;
+the json holds the counts too, which is what merge reads.
+"""
+import math
+import json
+import argparse
+
+from igstrand_number import encode_igstrand_number
+
+RESIDUE_STATS_VERSION = 1
+group_by_fields = ("Igtype", "refpdbname")
+ALL_DOMAINS = "all"
+
+residue_stats_headers = ["group", "position", "domains", "residues", "occupancy", "loop_fraction", "entropy",
+                         "consensus", "consensus_fraction", "frequencies"]
+
+
+def _position_order(position):
+    try:
+        return 0, encode_igstrand_number(position)
+    except ValueError:
+        return 1, position
+
+
+class ResidueProfile:
+    """
+    Mergeable residue counts per group and IgStrand position.
+    counts: {group: {"domains": n, "positions": {"B2550": {"residues": {"C": n, ...}, "loop": n}}}}
+    """
+
+    def __init__(self, group_by=None):
+        if group_by is not None and group_by not in group_by_fields:
+            raise ValueError(f"Unknown group {group_by}, use one of {', '.join(group_by_fields)}")
+        self.group_by = group_by
+        self.counts = {}
+
+    def add_domain(self, map_igstrand_info):
+        """
+        Count the residues of one domain record; None (no Ig mapping) is skipped.
+        """
+        if not map_igstrand_info:
+            return
+        group = str(map_igstrand_info.get(self.group_by, "")) if self.group_by else ALL_DOMAINS
+        group_counts = self.counts.get(group)
+        if group_counts is None:
+            group_counts = self.counts[group] = {"domains": 0, "positions": {}}
+        group_counts["domains"] += 1
+        positions = group_counts["positions"]
+        for igstrand_num, (res_id, loop_assign) in map_igstrand_info["igstrand_data"].items():
+            if not res_id:
+                continue
+            position = positions.get(igstrand_num)
+            if position is None:
+                position = positions[igstrand_num] = {"residues": {}, "loop": 0}
+            residues = position["residues"]
+            residues[res_id[0]] = residues.get(res_id[0], 0) + 1
+            if loop_assign:
+                position["loop"] += 1
+
+    def add_domains(self, resolved_domains):
+        """
+        resolved_domains: iterable of (pdb_chain_domain, domain record or None)
+        """
+        for _, map_igstrand_info in resolved_domains:
+            self.add_domain(map_igstrand_info)
+        return self
+
+    def merge(self, other):
+        """
+        Add the counts of another profile with the same grouping.
+        """
+        if other.group_by != self.group_by:
+            raise ValueError(f"Can not merge residue profiles grouped by {self.group_by} and {other.group_by}")
+        for group, other_counts in other.counts.items():
+            group_counts = self.counts.setdefault(group, {"domains": 0, "positions": {}})
+            group_counts["domains"] += other_counts["domains"]
+            for igstrand_num, other_position in other_counts["positions"].items():
+                position = group_counts["positions"].setdefault(igstrand_num, {"residues": {}, "loop": 0})
+                for letter, n in other_position["residues"].items():
+                    position["residues"][letter] = position["residues"].get(letter, 0) + n
+                position["loop"] += other_position["loop"]
+        return self
+
+    def statistics(self):
+        """
+        One row dict (residue_stats_headers) per group and position, in alignment order.
+        occupancy: domains with a residue at the position / domains of the group
+        entropy: Shannon entropy in bits of the residue frequencies
+        """
+        rows = []
+        for group in sorted(self.counts):
+            group_counts = self.counts[group]
+            for igstrand_num in sorted(group_counts["positions"], key=_position_order):
+                position = group_counts["positions"][igstrand_num]
+                residues = sorted(position["residues"].items(), key=lambda item: (-item[1], item[0]))
+                n_residues = sum(n for _, n in residues)
+                entropy = 0.0 - sum(n / n_residues * math.log2(n / n_residues) for _, n in residues)
+                rows.append({"group": group, "position": igstrand_num, "domains": group_counts["domains"],
+                             "residues": n_residues, "occupancy": n_residues / group_counts["domains"],
+                             "loop_fraction": position["loop"] / n_residues, "entropy": entropy,
+                             "consensus": residues[0][0], "consensus_fraction": residues[0][1] / n_residues,
+                             "frequencies": {letter: n / n_residues for letter, n in residues}})
+        return rows
+
+    @classmethod
+    def from_json(cls, residue_stats):
+        if residue_stats.get("version") != RESIDUE_STATS_VERSION:
+            raise ValueError(f"Residue statistics version {residue_stats.get('version')} can not be read")
+        profile = cls(residue_stats["group_by"])
+        profile.counts = residue_stats["counts"]
+        return profile
+
+
+def write_residue_stats(profile, output_file_base):
+    """
+    Write output_file_base.residue_stats.tsv and .json.
+    return: the written file names
+    """
+    rows = profile.statistics()
+    tsv_file = f"{output_file_base}.residue_stats.tsv"
+    with open(tsv_file, "w") as f:
+        f.write("\t".join(residue_stats_headers) + "\n")
+        for row in rows:
+            frequencies = ",".join(f"{letter}:{fraction:.4f}" for letter, fraction in row["frequencies"].items())
+            f.write(f"{row['group']}\t{row['position']}\t{row['domains']}\t{row['residues']}\t{row['occupancy']:.4f}\t"
+                    f"{row['loop_fraction']:.4f}\t{row['entropy']:.4f}\t{row['consensus']}\t"
+                    f"{row['consensus_fraction']:.4f}\t{frequencies}\n")
+
+    json_file = f"{output_file_base}.residue_stats.json"
+    with open(json_file, "w") as f:
+        json.dump({"version": RESIDUE_STATS_VERSION, "group_by": profile.group_by, "counts": profile.counts,
+                   "statistics": rows}, f)
+    return [tsv_file, json_file]
+
+
+def load_residue_stats(json_file):
+    with open(json_file) as f:
+        return ResidueProfile.from_json(json.load(f))
+
+
+if __name__ == "__main__":
+    from domain_resolver import iter_resolved_domains
+    from input_reader import stream_input_file, input_save_name
+
+    parser = argparse.ArgumentParser(description='Per IgStrand position residue statistics')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    compute_parser = subparsers.add_parser('compute', help='Count the residues of the domains of an input file')
+    compute_parser.add_argument('-f', '--file', help='Input file, pdbid chain domain per line; - reads stdin', required=True)
+    compute_parser.add_argument('--group-by', help=f"Statistics per {' or '.join(group_by_fields)}", choices=group_by_fields)
+    compute_parser.add_argument('--sort-by-pdb', help='Group the input lines by pdb id', action='store_true')
+    compute_parser.add_argument('-i', '--input', help='Input folder with number_mapping_files/', default="../input/")
+    compute_parser.add_argument('-o', '--output', help='Output file base (default: ../output/1D_mapping_<input name>igstrand)')
+    compute_parser.add_argument('-j', '--jobs', help='Parallel node processes creating missing mapping files', type=int, default=4)
+    merge_parser = subparsers.add_parser('merge', help='Merge the .residue_stats.json files of shards')
+    merge_parser.add_argument('json_files', nargs='+')
+    merge_parser.add_argument('-o', '--output', help='Output file base', required=True)
+    args = parser.parse_args()
+
+    if args.command == 'compute':
+        profile = ResidueProfile(args.group_by)
+        input_lines = stream_input_file(args.file, sort_by_pdb=args.sort_by_pdb)
+        profile.add_domains(iter_resolved_domains(input_lines, args.input, "igstrand", jobs=args.jobs))
+        output_file_base = args.output or f"../output/1D_mapping_{input_save_name(args.file)}igstrand"
+    else:
+        profile = load_residue_stats(args.json_files[0])
+        for json_file in args.json_files[1:]:
+            try:
+                profile.merge(load_residue_stats(json_file))
+            except ValueError as e:
+                parser.error(f"{json_file}: {e}")
+        output_file_base = args.output
+
+    for output_file in write_residue_stats(profile, output_file_base):
+        print(f"Residue statistics are written to {output_file}")
@@ -0,0 +1,96 @@
+"""
+Shared fixtures. The modules of src/ import each other by their flat names, so
+src/ goes on sys.path; the repository root too, for the benchmarks package.
+"""
+import os
+import sys
+import shutil
+import zipfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+SRC = ROOT / "src"
+sys.path[:0] = [str(SRC), str(ROOT)]
+
+MAPPING_FILES = ROOT / "input" / "number_mapping_files"
+TEMPLATES = ROOT / "input" / "igstrand_template"
+WORKER_STUB = SRC / "refnum_worker_stub.js"
+
+# the lines of the small sample input used across the tests
+SAMPLE_LINES = [("1RHH", "B", "1"), ("5ESV", "D", "1"), ("5ESV", "A", "1"), ("5ESV", "A", "2"),
+                ("7TZG", "D", "2"), ("1CD8", "A", "1")]
+SAMPLE_PDBS = sorted({pdb for pdb, _, _ in SAMPLE_LINES})
+
+needs_node = pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+
+
+@pytest.fixture(autouse=True)
+def reset_caches():
+    """
+    Every test starts without cached refnum documents, stores, layouts, templates and profile data.
+    """
+    import mapping_files
+    import igstrand_domain_mapping
+    import pipeline_profile
+    import alignment_2D_igstrand
+    igstrand_domain_mapping.clear_refnum_cache()
+    alignment_2D_igstrand._compiled_templates.clear()
+    igstrand_domain_mapping.close_refnum_stores()
+    mapping_files._layouts.clear()
+    pipeline_profile.enable_profile(False)
+    pipeline_profile.reset_profile()
+    yield
+    igstrand_domain_mapping.close_refnum_stores()
+    mapping_files._layouts.clear()
+    pipeline_profile.enable_profile(False)
+
+
+@pytest.fixture
+def input_folder(tmp_path):
+    """
+    Input folder as the pipeline expects it ("<folder>/" with number_mapping_files/ and
+    igstrand_template/ inside), holding copies of the sample PDBs and the 2D templates.
+    """
+    mapping_dir = tmp_path / "input" / "number_mapping_files"
+    mapping_dir.mkdir(parents=True)
+    for pdb in SAMPLE_PDBS:
+        shutil.copy(MAPPING_FILES / f"{pdb}_refnum_igstrand.json", mapping_dir)
+    template_dir = tmp_path / "input" / "igstrand_template"
+    template_dir.mkdir()
+    for template_file in TEMPLATES.glob("igstrand_template_*.xlsx"):
+        shutil.copy(template_file, template_dir)
+    return str(tmp_path / "input") + os.sep
+
+
+@pytest.fixture
+def mapping_folder(input_folder):
+    return input_folder + "number_mapping_files/"
+
+
+@pytest.fixture
+def sample_input_file(tmp_path):
+    input_file = tmp_path / "sample.txt"
+    input_file.write_text("".join(" ".join(line) + "\n" for line in SAMPLE_LINES))
+    return str(input_file)
+
+
+@pytest.fixture
+def work_dir(input_folder, tmp_path, monkeypatch):
+    """
+    Run from <tmp>/src like the scripts do, so "../input/" is the input folder and
+    "../output/" an empty output folder.
+    """
+    (tmp_path / "output").mkdir()
+    (tmp_path / "src").mkdir()
+    monkeypatch.chdir(tmp_path / "src")
+    return tmp_path
+
+
+def xlsx_parts(file_path):
+    """
+    The parts of an xlsx file except docProps/core.xml, which holds the save time.
+    """
+    with zipfile.ZipFile(file_path) as xlsx:
+        return {name: xlsx.read(name) for name in xlsx.namelist() if name != "docProps/core.xml"}
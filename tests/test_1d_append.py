@@ -0,0 +1,98 @@
+import os
+import sys
+import shutil
+
+import pytest
+
+import main_script
+
+from alignment_1D_igstrand import run_1d_alignment, run_1d_append
+from conftest import SAMPLE_LINES, xlsx_parts
+from domain_resolver import resolve_input_domains
+from igstrand_domain_mapping import refnum_cache_info, clear_refnum_cache
+
+FORMATS = ["xlsx", "tsv", "fasta", "stockholm"]
+FIRST_LINES = SAMPLE_LINES[:3] # 1RHH and 5ESV; 7TZG and 1CD8 bring new positions
+
+
+@pytest.fixture
+def output_paths(tmp_path):
+    append_path, full_path = tmp_path / "append", tmp_path / "full"
+    append_path.mkdir()
+    full_path.mkdir()
+    return str(append_path) + os.sep, str(full_path) + os.sep
+
+
+def append(input_lines, input_folder, output_path):
+    run_1d_append(input_lines, input_folder, output_path, "sample", "igstrand", FORMATS)
+
+
+def full_run(input_lines, input_folder, output_path):
+    resolved_domains = resolve_input_domains(input_lines, input_folder, "igstrand")
+    run_1d_alignment(resolved_domains, output_path, "sample", "igstrand", FORMATS, input_folder + "number_mapping_files/")
+
+
+def assert_same_outputs(append_path, full_path):
+    for fmt in FORMATS:
+        name = f"1D_mapping_sampleigstrand.{'sto' if fmt == 'stockholm' else fmt}"
+        if fmt == "xlsx":
+            assert xlsx_parts(append_path + name) == xlsx_parts(full_path + name)
+        else:
+            with open(append_path + name, "rb") as appended, open(full_path + name, "rb") as full:
+                assert appended.read() == full.read(), name
+
+
+def test_append_equals_a_full_run(input_folder, output_paths):
+    append_path, full_path = output_paths
+    append(FIRST_LINES, input_folder, append_path)
+    assert os.path.exists(append_path + "1D_mapping_sampleigstrand.manifest.json")
+    assert os.path.exists(append_path + "1D_mapping_sampleigstrand.matrix.npz")
+
+    clear_refnum_cache()
+    append(SAMPLE_LINES, input_folder, append_path)
+    assert refnum_cache_info()["misses"] == 3 # only the PDBs of the new lines, 1RHH is not read
+
+    full_run(SAMPLE_LINES, input_folder, full_path)
+    assert_same_outputs(append_path, full_path)
+
+
+def test_nothing_new_reads_nothing(input_folder, output_paths, capsys):
+    append_path, _ = output_paths
+    append(SAMPLE_LINES, input_folder, append_path)
+    clear_refnum_cache()
+    append(SAMPLE_LINES, input_folder, append_path)
+    assert refnum_cache_info()["misses"] == 0
+    assert "0 new, 0 with a changed mapping file" in capsys.readouterr().out
+
+
+def test_changed_mapping_file_rows_are_read_again(input_folder, output_paths, capsys):
+    append_path, full_path = output_paths
+    # the first run saw another residue at A1550 of 5ESV chain A
+    mapping_file = input_folder + "number_mapping_files/5ESV_refnum_igstrand.json"
+    with open(mapping_file) as f:
+        original = f.read()
+    with open(mapping_file, "w") as f:
+        f.write(original.replace('"5ESV_A_6_E"', '"5ESV_A_6_Q"'))
+    append(FIRST_LINES, input_folder, append_path)
+    with open(mapping_file, "w") as f:
+        f.write(original)
+
+    clear_refnum_cache()
+    append(SAMPLE_LINES, input_folder, append_path)
+    assert refnum_cache_info()["misses"] == 3 # 5ESV for the changed and new rows, 7TZG and 1CD8
+    assert "3 saved rows, 3 new, 2 with a changed mapping file" in capsys.readouterr().out
+    full_run(SAMPLE_LINES, input_folder, full_path)
+    assert_same_outputs(append_path, full_path)
+
+
+def test_only_append_runs_save_the_state(work_dir, sample_input_file, monkeypatch):
+    shutil.copy(sample_input_file, "sample.txt")
+    state_files = [work_dir / "output" / f"1D_mapping_sampleigstrand.{extension}" for extension in ["manifest.json", "matrix.npz"]]
+    monkeypatch.setattr(sys, "argv", ["main_script.py", "-f", "sample.txt", "-d", "1D"])
+    main_script.main()
+    assert (work_dir / "output" / "1D_mapping_sampleigstrand.xlsx").exists()
+    assert not any(state_file.exists() for state_file in state_files)
+
+    monkeypatch.setattr(sys, "argv", ["main_script.py", "-f", "sample.txt", "-d", "1D", "--append"])
+    main_script.main()
+    assert all(state_file.exists() for state_file in state_files)
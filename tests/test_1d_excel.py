@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from openpyxl import load_workbook
+
+from alignment_1D_igstrand import Excel1DWriter, make_igmap_info, headers, color_dict
+from alignment_matrix import build_alignment_matrix, AlignmentMatrix
+from conftest import SAMPLE_LINES, xlsx_parts
+from domain_resolver import resolve_input_domains
+
+
+@pytest.fixture
+def matrix(input_folder):
+    resolved_domains = resolve_input_domains(SAMPLE_LINES, input_folder, "igstrand")
+    return build_alignment_matrix([make_igmap_info(*resolved) for resolved in resolved_domains])
+
+
+def row_slice(matrix, rows):
+    return AlignmentMatrix(matrix.row_keys[rows], matrix.row_info[rows], matrix.columns, matrix.residues[rows], matrix.loop[rows])
+
+
+def write(matrices, output_file):
+    writer = Excel1DWriter(str(output_file), matrices[0].columns)
+    assert writer.wb.write_only
+    for matrix in matrices:
+        writer.write(matrix)
+    writer.close()
+    return output_file
+
+
+def test_cells_and_colors(matrix, tmp_path):
+    ws = load_workbook(write([matrix], tmp_path / "1D.xlsx")).active
+    rows = list(ws.iter_rows())
+    assert [cell.value for cell in rows[0]] == headers + matrix.columns
+    assert {cell.font.sz for cell in rows[0]} == {14}
+    for row, cells in enumerate(rows[1:]):
+        assert cells[0].value == matrix.row_keys[row]
+        residue_cells = cells[len(headers):]
+        for col, column in enumerate(matrix.columns):
+            cell = residue_cells[col] if col < len(residue_cells) else None
+            if not matrix.present[row, col]:
+                assert cell is None or cell.value is None
+                continue
+            assert cell.value == chr(matrix.residues[row, col])
+            strand = column.rstrip("0123456789").strip("+-_")
+            if matrix.column_anchor[col]:
+                color = "FFD700"
+            elif matrix.loop[row, col]:
+                color = color_dict["loop"]
+            else:
+                color = color_dict.get(strand, "FFFFFF")
+            assert (cell.fill.fgColor.rgb, cell.font.sz) == ("00" + color, 12)
+
+
+def test_rows_written_in_chunks_give_the_same_file(matrix, tmp_path):
+    whole = xlsx_parts(write([matrix], tmp_path / "whole.xlsx"))
+    chunks = [row_slice(matrix, slice(start, start + 2)) for start in range(0, len(matrix.row_keys), 2)]
+    assert xlsx_parts(write(chunks, tmp_path / "chunks.xlsx")) == whole
+
+
+def test_output_has_no_custom_named_styles(matrix, tmp_path):
+    assert load_workbook(write([matrix], tmp_path / "1D.xlsx")).named_styles == ["Normal"]
@@ -0,0 +1,95 @@
+import csv
+
+import pytest
+
+from alignment_1D_export import (export_writer_classes, write_matrix_with, parse_formats, stockholm_name_width,
+                                 Stockholm1DWriter)
+from alignment_1D_igstrand import make_igmap_info, headers
+from alignment_matrix import build_alignment_matrix, AlignmentMatrix
+from conftest import SAMPLE_LINES
+from domain_resolver import resolve_input_domains
+
+TEXT_FORMATS = ["tsv", "fasta", "stockholm"]
+
+
+@pytest.fixture
+def matrix(input_folder):
+    resolved_domains = resolve_input_domains(SAMPLE_LINES, input_folder, "igstrand")
+    resolved_domains.append((("9ZZZ", "LONGCHAIN", "12"), None)) # a longer name, no mapping
+    return build_alignment_matrix([make_igmap_info(*resolved) for resolved in resolved_domains])
+
+
+def row_slice(matrix, rows):
+    return AlignmentMatrix(matrix.row_keys[rows], matrix.row_info[rows], matrix.columns, matrix.residues[rows], matrix.loop[rows])
+
+
+def write_in_chunks(fmt, matrix, output_file, chunk_rows):
+    name_width = stockholm_name_width(max(len(key) for key in matrix.row_keys))
+    writer = export_writer_classes[fmt](str(output_file), matrix.columns, headers, name_width)
+    for start in range(0, len(matrix.row_keys), chunk_rows):
+        writer.write(row_slice(matrix, slice(start, start + chunk_rows)))
+    writer.close()
+
+
+def test_stockholm_loop_lines_line_up(matrix, tmp_path):
+    output_file = tmp_path / "1D.sto"
+    write_matrix_with(Stockholm1DWriter, matrix, str(output_file), headers)
+    lines = output_file.read_text().splitlines()
+    assert lines[0] == "# STOCKHOLM 1.0" and lines[-1] == "//"
+    aligned_lines = [line for line in lines if not line.startswith("#") and line != "//"]
+    loop_lines = [line for line in lines if line.startswith("#=GR ")]
+    assert len(aligned_lines) == len(loop_lines) == len(matrix.row_keys)
+    start = len(aligned_lines[0]) - len(matrix.columns)
+    for row, (aligned_line, loop_line) in enumerate(zip(aligned_lines, loop_lines)):
+        name, aligned = aligned_line.split()
+        assert (name, aligned) == (matrix.row_keys[row], matrix.row_letters(row))
+        assert loop_line.startswith(f"#=GR {name} LP ")
+        assert len(loop_line) == len(aligned_line)
+        assert aligned_line[start - 1] == loop_line[start - 1] == " "
+        assert set(loop_line[start:]) <= {"L", "."}
+
+
+def test_tsv_rows(matrix, tmp_path):
+    output_file = tmp_path / "1D.tsv"
+    write_matrix_with(export_writer_classes["tsv"], matrix, str(output_file), headers)
+    with open(output_file, newline="") as f:
+        rows = list(csv.reader(f, delimiter="\t"))
+    assert rows[0] == headers + matrix.columns
+    info_count = len(headers)
+    for row, tsv_row in enumerate(rows[1:]):
+        assert tsv_row[0] == matrix.row_keys[row]
+        assert "".join(letter or "-" for letter in tsv_row[info_count:]) == matrix.row_letters(row)
+
+
+def test_fasta_records(matrix, tmp_path):
+    output_file = tmp_path / "1D.fasta"
+    write_matrix_with(export_writer_classes["fasta"], matrix, str(output_file), headers)
+    lines = output_file.read_text().splitlines()
+    assert [line.split()[0] for line in lines[::2]] == [">" + key for key in matrix.row_keys]
+    assert lines[1::2] == [matrix.row_letters(row) for row in range(len(matrix.row_keys))]
+    assert "Igtype=IgV" in lines[0]
+
+
+def test_parquet_table(matrix, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    output_file = tmp_path / "1D.parquet"
+    write_matrix_with(export_writer_classes["parquet"], matrix, str(output_file), headers)
+    table = pq.read_table(output_file)
+    assert table.column_names == headers + matrix.columns
+    assert table.column("structure").to_pylist() == matrix.row_keys
+    columns = [table.column(column).to_pylist() for column in matrix.columns]
+    for row in range(len(matrix.row_keys)):
+        assert "".join(column[row] if matrix.present[row, col] else "-" for col, column in enumerate(columns)) == matrix.row_letters(row)
+
+
+@pytest.mark.parametrize("fmt", TEXT_FORMATS)
+def test_streamed_chunks_give_the_same_file(matrix, tmp_path, fmt):
+    write_in_chunks(fmt, matrix, tmp_path / "whole", len(matrix.row_keys))
+    write_in_chunks(fmt, matrix, tmp_path / "chunks", 2)
+    assert (tmp_path / "chunks").read_bytes() == (tmp_path / "whole").read_bytes()
+
+
+def test_unknown_format():
+    assert parse_formats("TSV, stockholm,") == ["tsv", "stockholm"]
+    with pytest.raises(ValueError, match="Unknown 1D format csv"):
+        parse_formats("tsv,csv")
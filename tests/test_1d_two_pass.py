@@ -0,0 +1,56 @@
+import pytest
+
+from alignment_1D_export import export_extensions
+from alignment_1D_igstrand import run_1d_alignment, run_1d_two_pass
+from conftest import SAMPLE_LINES, xlsx_parts
+from domain_resolver import resolve_input_domains
+
+INPUT_LINES = SAMPLE_LINES + [("5ESV", "Z", "1"), ("7TZG", "D", "*")] # a chain without Ig domains, a wildcard
+FORMATS = [fmt for fmt in export_extensions if fmt != "parquet"]
+
+
+def output_files(output_folder, formats):
+    return {fmt: output_folder / f"1D_mapping_sampleigstrand.{export_extensions[fmt]}" for fmt in formats}
+
+
+def file_content(fmt, output_file):
+    return xlsx_parts(output_file) if fmt == "xlsx" else output_file.read_bytes()
+
+
+@pytest.fixture
+def write_both(input_folder, tmp_path):
+    """
+    Write the input lines in one pass and in two passes, return both output folders.
+    """
+    def write_both(formats, **two_pass_options):
+        one_pass, two_pass = tmp_path / "one_pass", tmp_path / "two_pass"
+        one_pass.mkdir()
+        two_pass.mkdir()
+        resolved_domains = resolve_input_domains(INPUT_LINES, input_folder, "igstrand")
+        run_1d_alignment(resolved_domains, str(one_pass) + "/", "sample", "igstrand", formats, residue_stats="Igtype")
+        run_1d_two_pass(iter(INPUT_LINES), input_folder, str(two_pass) + "/", "sample", "igstrand", formats,
+                        residue_stats="Igtype", **two_pass_options)
+        return one_pass, two_pass
+    return write_both
+
+
+@pytest.mark.parametrize("chunk_rows", [10000, 3, 1])
+def test_two_pass_files_are_the_one_pass_files(write_both, chunk_rows):
+    one_pass, two_pass = write_both(FORMATS, chunk_rows=chunk_rows)
+    for fmt, one_pass_file in output_files(one_pass, FORMATS).items():
+        assert file_content(fmt, output_files(two_pass, [fmt])[fmt]) == file_content(fmt, one_pass_file), fmt
+    for stats_file in ["1D_mapping_sampleigstrand.residue_stats.tsv", "1D_mapping_sampleigstrand.residue_stats.json"]:
+        assert (two_pass / stats_file).read_bytes() == (one_pass / stats_file).read_bytes()
+
+
+@pytest.mark.parametrize("chunk_rows", [10000, 3])
+def test_two_pass_parquet(write_both, chunk_rows):
+    pq = pytest.importorskip("pyarrow.parquet")
+    one_pass, two_pass = write_both(["parquet"], chunk_rows=chunk_rows)
+    one_pass_file, two_pass_file = output_files(one_pass, ["parquet"])["parquet"], output_files(two_pass, ["parquet"])["parquet"]
+    if chunk_rows >= len(INPUT_LINES) * 2:
+        assert two_pass_file.read_bytes() == one_pass_file.read_bytes()
+    # smaller chunks only split the row groups
+    one_pass_table, two_pass_table = pq.read_table(one_pass_file), pq.read_table(two_pass_file)
+    assert two_pass_table.schema.equals(one_pass_table.schema, check_metadata=True)
+    assert two_pass_table.equals(one_pass_table)
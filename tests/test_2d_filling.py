@@ -0,0 +1,96 @@
+import re
+
+import pytest
+from openpyxl import load_workbook
+
+from alignment_2D_igstrand import (write_2d_alignment, template_row_col_default, get_template_type, open_template_file,
+                                   is_igstrand_number_cell, color_dict)
+from conftest import SAMPLE_LINES, xlsx_parts
+from domain_resolver import resolve_input_domains
+from igstrand_number import encode_igstrand_number, igstrand_fields, POSITION_MASK
+
+TEMPLATE_LENGTH = (template_row_col_default["V_row_range"], template_row_col_default["V_column_range"])
+
+
+@pytest.fixture
+def resolved_domains(input_folder):
+    return resolve_input_domains(SAMPLE_LINES, input_folder, "igstrand")
+
+
+def write(resolved_domains, input_folder, output_file):
+    write_2d_alignment(resolved_domains, input_folder + "igstrand_template/", str(output_file), "igstrand",
+                       template_row_col_default)
+    return output_file
+
+
+def expected_residue_cells(record, template_path):
+    """
+    (row, col) -> (residue, fill color) found by scanning every cell of the template.
+    """
+    map_res = {encode_igstrand_number(key) & POSITION_MASK: value for key, value in record["igstrand_data"].items()}
+    ws, _ = open_template_file(get_template_type(record)[1], "igstrand", template_path)
+    expected = {}
+    for row in range(1, TEMPLATE_LENGTH[0] + 1):
+        for col in range(1, TEMPLATE_LENGTH[1] + 1):
+            cell_value = ws.cell(row=row, column=col).value
+            if not is_igstrand_number_cell(cell_value):
+                continue
+            res_id, loop_assign = map_res.get(encode_igstrand_number(str(cell_value)), ("", ""))
+            if res_id:
+                ig_number = igstrand_fields(encode_igstrand_number(str(cell_value)))[0]
+                color = color_dict["loop"] if loop_assign else "FFFF00" if ig_number % 100 == 50 else color_dict[str(ig_number)[0]]
+                expected[row, col] = (res_id, "00" + color)
+    return expected
+
+
+def test_residues_fill_the_template_number_cells(resolved_domains, input_folder, tmp_path):
+    ws = load_workbook(write(resolved_domains, input_folder, tmp_path / "2D.xlsx")).active
+    for domain_index, (_, record) in enumerate(resolved_domains):
+        shift = domain_index * TEMPLATE_LENGTH[1]
+        expected = expected_residue_cells(record, input_folder + "igstrand_template/")
+        assert expected
+        template_ws, _ = open_template_file(get_template_type(record)[1], "igstrand", input_folder + "igstrand_template/")
+        for row in range(1, TEMPLATE_LENGTH[0] + 1):
+            for col in range(1, TEMPLATE_LENGTH[1] + 1):
+                cell = ws.cell(row=row, column=col + shift)
+                if (row, col) in expected:
+                    assert (cell.value, cell.fill.fgColor.rgb) == expected[row, col]
+                    assert cell.alignment.horizontal == "center"
+                elif is_igstrand_number_cell(template_ws.cell(row=row, column=col).value):
+                    assert cell.value in ("", None)
+
+
+def test_ig_type_label_and_reference(resolved_domains, input_folder, tmp_path):
+    ws = load_workbook(write(resolved_domains, input_folder, tmp_path / "2D.xlsx")).active
+    values = [cell.value for row in ws.iter_rows() for cell in row if isinstance(cell.value, str)]
+    igv_domains = [(pdb_chain_domain, record) for pdb_chain_domain, record in resolved_domains if record["Igtype"] == "IgV"]
+    assert igv_domains # only the IgV templates have an Ig type label cell
+    for (pdb, chain, domain), record in igv_domains:
+        assert f"{record['Igtype']}_{pdb}_{chain}_{domain}" in values
+        assert record["refpdbname"] in values
+
+
+def cell_style(cell):
+    font, border = cell.font, cell.border
+    return (font.name, font.sz, font.b, [getattr(border, side).style for side in ("left", "right", "top", "bottom")])
+
+
+def test_template_styles_are_kept(resolved_domains, input_folder, tmp_path):
+    ws = load_workbook(write(resolved_domains, input_folder, tmp_path / "2D.xlsx")).active
+    _, record = resolved_domains[0]
+    template_ws, _ = open_template_file(get_template_type(record)[1], "igstrand", input_folder + "igstrand_template/")
+    cells = [(row, col) for row in range(1, TEMPLATE_LENGTH[0] + 1) for col in range(1, TEMPLATE_LENGTH[1] + 1)]
+    # the reference structure is written bold three columns after the Ig type label
+    reference_cells = {(row, col + 3) for row, col in cells if template_ws.cell(row=row, column=col).value == record["Igtype"]}
+    for row, col in cells:
+        if (row, col) not in reference_cells:
+            assert cell_style(ws.cell(row=row, column=col)) == cell_style(template_ws.cell(row=row, column=col))
+
+
+def test_output_has_no_custom_named_styles(resolved_domains, input_folder, tmp_path):
+    def cell_formats(output_file):
+        styles_xml = xlsx_parts(output_file)["xl/styles.xml"].decode()
+        return int(re.search(r'<cellXfs count="(\d+)"', styles_xml).group(1))
+    output_file = write(resolved_domains, input_folder, tmp_path / "once.xlsx")
+    assert load_workbook(output_file).named_styles == ["Normal"]
+    assert cell_formats(write(resolved_domains * 2, input_folder, tmp_path / "twice.xlsx")) == cell_formats(output_file)
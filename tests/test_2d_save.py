@@ -0,0 +1,80 @@
+import os
+
+import pytest
+from openpyxl import load_workbook
+
+import alignment_2D_igstrand
+from alignment_2D_igstrand import write_2d_alignment, template_row_col_default
+from conftest import SAMPLE_LINES
+from domain_resolver import resolve_input_domains
+
+
+@pytest.fixture
+def resolved_domains(input_folder):
+    return resolve_input_domains(SAMPLE_LINES, input_folder, "igstrand")
+
+
+@pytest.fixture
+def save_calls(monkeypatch):
+    """
+    Output sizes after every save of the 2D workbook.
+    """
+    sizes = []
+    save = alignment_2D_igstrand.Workbook.save
+
+    def counted_save(workbook, file_name):
+        save(workbook, file_name)
+        sizes.append(os.path.getsize(file_name))
+    monkeypatch.setattr(alignment_2D_igstrand.Workbook, "save", counted_save)
+    return sizes
+
+
+def write(resolved_domains, input_folder, output_file, **checkpoints):
+    return write_2d_alignment(resolved_domains, input_folder + "igstrand_template/", str(output_file), "igstrand",
+                              template_row_col_default, **checkpoints)
+
+
+def test_workbook_is_saved_once(resolved_domains, input_folder, tmp_path, save_calls):
+    output_file = tmp_path / "2D.xlsx"
+    num_written, bytes_written = write(resolved_domains, input_folder, output_file)
+    assert num_written == len(SAMPLE_LINES)
+    assert save_calls == [bytes_written] == [os.path.getsize(output_file)]
+    ws = load_workbook(output_file).active
+    assert ws.max_column == len(SAMPLE_LINES) * template_row_col_default["V_column_range"]
+
+
+def test_checkpoints_every_n_domains(resolved_domains, input_folder, tmp_path, save_calls):
+    output_file = tmp_path / "2D.xlsx"
+    num_written, bytes_written = write(resolved_domains, input_folder, output_file, checkpoint_every=4)
+    assert len(save_calls) == 2 # after 4 domains and at the end
+    assert bytes_written == sum(save_calls)
+    assert save_calls[0] < save_calls[1] == os.path.getsize(output_file)
+
+
+def test_checkpoints_after_seconds(resolved_domains, input_folder, tmp_path, save_calls, monkeypatch):
+    clock = iter(range(0, 1000, 10))
+    monkeypatch.setattr(alignment_2D_igstrand.time, "monotonic", lambda: next(clock))
+    write(resolved_domains, input_folder, tmp_path / "2D.xlsx", checkpoint_seconds=15)
+    assert len(save_calls) == 3 # every other domain, the last one is not saved again at the end
+
+
+def test_last_checkpoint_is_not_saved_again(resolved_domains, input_folder, tmp_path, save_calls):
+    output_file = tmp_path / "2D.xlsx"
+    num_written, bytes_written = write(resolved_domains, input_folder, output_file, checkpoint_every=3)
+    assert num_written == 6
+    assert len(save_calls) == 2 # after 3 and 6 domains
+    assert bytes_written == sum(save_calls)
+    assert save_calls[-1] == os.path.getsize(output_file)
+
+
+def test_checkpoints_do_not_change_the_file(resolved_domains, input_folder, tmp_path):
+    write(resolved_domains, input_folder, tmp_path / "once.xlsx")
+    write(resolved_domains, input_folder, tmp_path / "checkpoints.xlsx", checkpoint_every=1)
+    once, checkpoints = load_workbook(tmp_path / "once.xlsx").active, load_workbook(tmp_path / "checkpoints.xlsx").active
+    assert [[cell.value for cell in row] for row in once.iter_rows()] == [[cell.value for cell in row] for row in checkpoints.iter_rows()]
+
+
+def test_nothing_is_saved_without_domains(input_folder, tmp_path, save_calls):
+    assert write([(("9ZZZ", "A", "1"), None)], input_folder, tmp_path / "2D.xlsx") == (0, 0)
+    assert save_calls == []
+    assert not (tmp_path / "2D.xlsx").exists()
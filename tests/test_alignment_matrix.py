@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from alignment_1D_igstrand import make_igmap_info
+from alignment_matrix import build_alignment_matrix, reindex_columns, merge_column_keys, LOOP_FLAG
+from conftest import SAMPLE_LINES
+from domain_resolver import resolve_input_domains
+
+
+def record(igstrand_data, **fields):
+    return dict({"refpdbname": "REF", "Igtype": "IgV", "undefined_info": []}, igstrand_data=igstrand_data, **fields)
+
+
+@pytest.fixture
+def small_matrix():
+    return build_alignment_matrix([
+        {"1AAA_A_1": record({"A1550": ("V", ""), "B2550": ("C", ""), "B2551a": ("K", ""), "C3540": ("L", "1")})},
+        {"2BBB_B_1": record({"B2549": ("S", ""), "B2550": ("W", "")}, Igtype="IgC1")},
+    ])
+
+
+def test_columns_metadata(small_matrix):
+    # the insertion B2551a gives the column B2551, its residue is left out
+    assert small_matrix.columns == ["A1550", "B2549", "B2550", "B2551", "C3540"]
+    assert small_matrix.column_strand.tolist() == ["A", "B", "B", "B", "C"]
+    assert small_matrix.column_number.tolist() == [1550, 2549, 2550, 2551, 3540]
+    assert small_matrix.column_anchor.tolist() == [True, False, True, False, False]
+
+
+def test_residues_loop_and_presence(small_matrix):
+    assert small_matrix.shape == (2, 5)
+    assert small_matrix.row_keys == ["1AAA_A_1", "2BBB_B_1"]
+    assert small_matrix.residues.dtype == np.uint8
+    assert small_matrix.present.tolist() == [[True, False, True, False, True], [False, True, True, False, False]]
+    assert small_matrix.loop.tolist() == [[0, 0, 0, 0, LOOP_FLAG], [0, 0, 0, 0, 0]]
+    assert [small_matrix.row_letters(row) for row in range(2)] == ["V-C-L", "-SW--"]
+    assert small_matrix.row_info[1]["Igtype"] == "IgC1"
+    assert small_matrix.row_info[0]["tmscore"] == "" # missing fields are empty
+
+
+def test_domain_without_mapping_is_an_empty_row():
+    matrix = build_alignment_matrix([make_igmap_info(("9ZZZ", "A", "1"), None), {"1AAA_A_1": record({"A1550": ("V", "")})}])
+    assert matrix.row_keys == ["9ZZZ_A_1", "1AAA_A_1"]
+    assert [matrix.row_letters(row, gap=".") for row in range(2)] == [".", "V"]
+
+
+def test_reindex_to_more_columns(small_matrix):
+    columns = merge_column_keys(small_matrix.columns, ["A1549", "D4550"])
+    reindexed = reindex_columns(small_matrix, columns)
+    assert reindexed.columns == ["A1549", "A1550", "B2549", "B2550", "B2551", "C3540", "D4550"]
+    assert [reindexed.row_letters(row) for row in range(2)] == ["-V-C-L-", "--SW---"]
+    assert reindexed.loop[0, 5] == LOOP_FLAG
+
+
+def test_matrix_holds_the_domain_records(input_folder):
+    resolved_domains = resolve_input_domains(SAMPLE_LINES, input_folder, "igstrand")
+    matrix = build_alignment_matrix([make_igmap_info(*resolved) for resolved in resolved_domains])
+    column_index = {column: col for col, column in enumerate(matrix.columns)}
+    for row, (_, domain_record) in enumerate(resolved_domains):
+        expected = {column_index[key]: value for key, value in domain_record["igstrand_data"].items() if key in column_index}
+        assert set(np.flatnonzero(matrix.present[row])) == set(expected)
+        for col, (res_id, loop_assign) in expected.items():
+            assert chr(matrix.residues[row, col]) == res_id
+            assert bool(matrix.loop[row, col]) == bool(loop_assign)
@@ -0,0 +1,176 @@
+import io
+import json
+import socket
+import zipfile
+import threading
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from alignment_1D_export import matrix_records
+from alignment_1D_igstrand import make_igmap_info, write_1d_matrix, headers
+from alignment_2D_igstrand import write_2d_alignment, template_row_col_default
+from alignment_matrix import build_alignment_matrix
+from alignment_server import AlignmentService, make_server, REQUEST_QUEUE_SIZE
+from conftest import SAMPLE_LINES, xlsx_parts
+from domain_resolver import resolve_input_domains
+
+INPUT_TEXT = "".join(" ".join(line) + "\n" for line in SAMPLE_LINES).encode()
+
+
+@pytest.fixture
+def server(input_folder):
+    server = make_server(AlignmentService(input_folder, jobs=1, max_domains=20), port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def request(server, method, path, body=None, content_type="text/plain"):
+    """
+    return: status, content type and body of the answer
+    """
+    connection = http.client.HTTPConnection(*server.server_address, timeout=60)
+    try:
+        connection.request(method, path, body, {"Content-Type": content_type} if body is not None else {})
+        answer = connection.getresponse()
+        return answer.status, answer.getheader("Content-Type"), answer.read()
+    finally:
+        connection.close()
+
+
+@pytest.fixture
+def resolved_domains(input_folder):
+    return resolve_input_domains(SAMPLE_LINES, input_folder, "igstrand")
+
+
+@pytest.fixture
+def expected_2d(resolved_domains, input_folder, tmp_path):
+    output_file = tmp_path / "2D_expected.xlsx"
+    write_2d_alignment(resolved_domains, input_folder + "/igstrand_template/", str(output_file), "igstrand",
+                       template_row_col_default)
+    return xlsx_parts(output_file)
+
+
+def body_parts(body):
+    with zipfile.ZipFile(io.BytesIO(body)) as xlsx:
+        return {name: xlsx.read(name) for name in xlsx.namelist() if name != "docProps/core.xml"}
+
+
+def test_health(server):
+    assert request(server, "GET", "/health")[:2] == (200, "application/json")
+
+
+def test_1d_json_rows(server, resolved_domains):
+    matrix = build_alignment_matrix([make_igmap_info(*resolved) for resolved in resolved_domains])
+    status, content_type, body = request(server, "POST", "/1d", INPUT_TEXT)
+    assert (status, content_type) == (200, "application/json")
+    assert json.loads(body) == json.loads(json.dumps({"columns": list(matrix.columns), "rows": matrix_records(matrix, headers)}))
+
+    json_body = json.dumps({"domains": [list(line) for line in SAMPLE_LINES]})
+    assert request(server, "POST", "/1d", json_body, "application/json")[2] == body
+
+
+@pytest.mark.parametrize("fmt", ["tsv", "fasta", "stockholm"])
+def test_1d_file_formats(server, resolved_domains, tmp_path, fmt):
+    matrix = build_alignment_matrix([make_igmap_info(*resolved) for resolved in resolved_domains])
+    output_file, = write_1d_matrix(matrix, str(tmp_path / "1D_mapping"), [fmt])
+    status, _, body = request(server, "POST", f"/1d?format={fmt.upper()}", INPUT_TEXT)
+    assert status == 200
+    assert body == open(output_file, "rb").read()
+
+
+def test_2d_workbook_is_the_cli_workbook(server, expected_2d):
+    for _ in range(2): # cold, then warm templates and styles
+        status, content_type, body = request(server, "POST", "/2d", INPUT_TEXT)
+        assert (status, content_type) == (200, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        assert body_parts(body) == expected_2d
+
+
+def test_domain_records(server, resolved_domains):
+    status, _, body = request(server, "POST", "/domains", INPUT_TEXT)
+    assert status == 200
+    records = json.loads(body)
+    assert [tuple(record["input"]) for record in records] == SAMPLE_LINES
+    assert [record["record"] for record in records] == json.loads(json.dumps([dict(record) for _, record in resolved_domains]))
+
+
+@pytest.mark.parametrize("method, path, body, status", [
+    ("GET", "/nothing", None, 404),
+    ("POST", "/3d", INPUT_TEXT, 404),
+    ("POST", "/1d", b"", 400),
+    ("POST", "/1d?format=docx", INPUT_TEXT, 400),
+    ("POST", "/1d", b'{"domains": [["5ESV", "A"]]}', 400),
+    ("POST", "/1d", INPUT_TEXT * 4, 413),
+    ("POST", "/2d", b"5ESV Z 1\n", 422),
+])
+def test_bad_requests(server, method, path, body, status):
+    answer_status, content_type, answer = request(server, method, path, body)
+    assert (answer_status, content_type) == (status, "application/json")
+    assert json.loads(answer)["error"]
+
+
+def test_concurrent_requests_get_the_serial_answers(server, expected_2d, capsys):
+    requests = [("/1d?format=tsv", INPUT_TEXT), ("/2d", INPUT_TEXT), ("/domains", INPUT_TEXT), ("/1d", b"5ESV A 2\n1CD8 A 1\n")]
+    serial = {path: request(server, "POST", path, body) for path, body in requests}
+    capsys.readouterr()
+
+    with ThreadPoolExecutor(16) as executor:
+        answers = list(executor.map(lambda i: (requests[i % 4][0], request(server, "POST", *requests[i % 4])), range(64)))
+    for path, answer in answers:
+        if path == "/2d":
+            assert answer[:2] == serial[path][:2] and body_parts(answer[2]) == expected_2d
+        else:
+            assert answer == serial[path]
+    assert "Mapping files" not in capsys.readouterr().out # the prefetch summary is not printed per request
+
+    stats = json.loads(request(server, "GET", "/stats")[2])
+    assert {path: stats["endpoints"][path]["requests"] for path in ["/1d", "/2d", "/domains"]} == {"/1d": 34, "/2d": 17, "/domains": 17}
+    assert all(endpoint["errors"] == 0 and endpoint["p50_ms"] <= endpoint["p99_ms"] <= endpoint["max_ms"]
+               for endpoint in stats["endpoints"].values())
+    assert stats["caches"]["refnum_cache"]["entries"] >= 1
+    assert stats["caches"]["compiled_templates"]["templates"] >= 1
+
+
+def test_errors_are_counted(server):
+    request(server, "POST", "/1d", b"")
+    request(server, "POST", "/1d", INPUT_TEXT)
+    stats = json.loads(request(server, "GET", "/stats")[2])
+    assert stats["endpoints"]["/1d"]["requests"] == 2
+    assert stats["endpoints"]["/1d"]["errors"] == 1
+
+
+def test_queue_size(input_folder):
+    service = AlignmentService(input_folder)
+    for queue_size in [REQUEST_QUEUE_SIZE, 7]:
+        server = make_server(service, port=0, queue_size=queue_size)
+        try:
+            assert server.request_queue_size == queue_size
+        finally:
+            server.server_close()
+    assert REQUEST_QUEUE_SIZE >= 128
+
+
+def test_unix_socket(input_folder, tmp_path):
+    socket_path = str(tmp_path / "igstrand.sock")
+    server = make_server(AlignmentService(input_folder), unix_socket=socket_path)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.connect(socket_path)
+        client.sendall(b"GET /health HTTP/1.1\r\nHost: local\r\nConnection: close\r\n\r\n")
+        answer = b""
+        while chunk := client.recv(65536):
+            answer += chunk
+        client.close()
+        assert answer.startswith(b"HTTP/1.1 200") and answer.endswith(b'{"status": "ok"}')
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
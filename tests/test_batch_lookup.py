@@ -0,0 +1,50 @@
+import pytest
+
+import igstrand_domain_mapping
+from conftest import SAMPLE_LINES
+from igstrand_domain_mapping import get_igmap_domain, get_igmap_domains, expand_igmap_domains, get_igmap_chain_domains
+
+
+@pytest.fixture
+def delineated_chains(monkeypatch):
+    """
+    Chains passed to igdomain_delineate.
+    """
+    chains = []
+    delineate = igstrand_domain_mapping.igdomain_delineate
+
+    def counted_delineate(chain_data, pdb_chain):
+        chains.append(pdb_chain)
+        return delineate(chain_data, pdb_chain)
+    monkeypatch.setattr(igstrand_domain_mapping, "igdomain_delineate", counted_delineate)
+    return chains
+
+
+def test_batch_gives_the_single_lookups(mapping_folder, delineated_chains):
+    lines = SAMPLE_LINES + [("5ESV", "A", "3"), ("5ESV", "A", "1")]
+    batch = get_igmap_domains(lines, "igstrand", mapping_folder)
+    assert sorted(delineated_chains) == ["1CD8_A", "1RHH_B", "5ESV_A", "5ESV_D", "7TZG_D"] # each chain once
+    assert [pdb_chain_domain for pdb_chain_domain, _ in batch] == lines
+    assert batch[-2][1] is None
+    for pdb_chain_domain, record in batch:
+        single = get_igmap_domain(pdb_chain_domain, "igstrand", mapping_folder)
+        assert (None if single is None else dict(single)) == (None if record is None else dict(record))
+
+
+def test_wildcard_lists_every_domain_of_the_chain(mapping_folder):
+    chain_domains = get_igmap_chain_domains("5ESV", "A", "igstrand", mapping_folder)
+    assert list(chain_domains) == ["1", "2"]
+    expanded = expand_igmap_domains([("1CD8", "A", "1"), ("5ESV", "A", "*")], "igstrand", mapping_folder)
+    assert [[pdb_chain_domain for pdb_chain_domain, _ in line] for line in expanded] == [
+        [("1CD8", "A", "1")], [("5ESV", "A", "1"), ("5ESV", "A", "2")]]
+    assert [dict(record) for _, record in expanded[1]] == [dict(record) for record in chain_domains.values()]
+
+
+def test_wildcard_on_a_chain_without_ig_domains(mapping_folder, capsys):
+    assert expand_igmap_domains([("5ESV", "Z", "*")], "igstrand", mapping_folder) == [[]]
+    assert "No Ig domain is found in 5ESV chain Z" in capsys.readouterr().out
+
+
+def test_lines_need_three_fields(mapping_folder):
+    with pytest.raises(ValueError):
+        get_igmap_domains([("5ESV", "A")], "igstrand", mapping_folder)
@@ -0,0 +1,40 @@
+import pytest
+
+from benchmarks import scenarios
+from benchmarks.scenarios import prepare_corpus, build_matrix_in_chunks, run_scenario
+from igstrand_domain_mapping import get_igmap_domain
+
+NUM_DOMAINS = 30
+
+
+@pytest.fixture(scope="module")
+def corpus(tmp_path_factory):
+    return prepare_corpus(str(tmp_path_factory.mktemp("corpus")), NUM_DOMAINS)
+
+
+def test_corpus_has_undefined_residues(corpus, capsys):
+    # the messages the scenarios have to keep out of the benchmark output
+    for input_line in corpus["input_lines"]:
+        get_igmap_domain(input_line, "igstrand", corpus["mapping_file_path"])["igstrand_data"]
+    assert "undefined residues" in capsys.readouterr().out
+
+
+def test_matrix_is_built_quietly(corpus, capsys, monkeypatch):
+    # the last chunk is built after all records are read, here it is the only one
+    monkeypatch.setattr(scenarios, "MATRIX_CHUNK_DOMAINS", NUM_DOMAINS + 1)
+    matrix = build_matrix_in_chunks(corpus)
+    assert capsys.readouterr().out == ""
+    assert len(matrix.row_keys) == NUM_DOMAINS
+
+
+def test_2d_records_are_parsed_before_timing(corpus, tmp_path, capsys):
+    records = [record for _, record in scenarios.iter_resolved_domains(corpus)]
+    assert capsys.readouterr().out == ""
+    assert all(record._refnum_data is None for record in records)
+
+
+@pytest.mark.parametrize("name", list(scenarios.scenarios))
+def test_scenarios_run(corpus, tmp_path, capsys, name):
+    result = run_scenario(name, corpus, str(tmp_path), repeat=1)
+    assert result["domains"] == NUM_DOMAINS and len(result["seconds"]) == 1
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,95 @@
+import json
+import copy
+import pickle
+
+import pytest
+
+from igstrand_domain_mapping import get_igmap_domain, clear_refnum_cache, DomainRecord
+
+
+@pytest.fixture
+def new_record(mapping_folder):
+    """
+    A not yet parsed record of 5ESV A 1 on each call.
+    """
+    def new_record():
+        clear_refnum_cache()
+        record = get_igmap_domain(("5ESV", "A", "1"), "igstrand", mapping_folder)
+        assert isinstance(record, DomainRecord) and record._refnum_data is not None
+        return record
+    return new_record
+
+
+@pytest.fixture
+def parsed(new_record):
+    record = new_record()
+    record["igstrand_data"]
+    return dict(dict.items(record))
+
+
+def test_parsed_record_has_the_residues(parsed):
+    assert parsed["igstrand_data"]
+    assert set(parsed) >= {"igstrand_data", "undefined_info"}
+
+
+@pytest.mark.parametrize("read", [
+    lambda record: record["igstrand_data"],
+    lambda record: record.get("undefined_info"),
+    lambda record: dict(record.items())["igstrand_data"],
+    lambda record: list(record.values()),
+    lambda record: dict(record)["igstrand_data"],
+    lambda record: {**record}["igstrand_data"],
+    lambda record: record.copy()["igstrand_data"],
+    lambda record: copy.copy(record)["igstrand_data"],
+    lambda record: pickle.loads(pickle.dumps(record))["igstrand_data"],
+    lambda record: json.loads(json.dumps(record))["igstrand_data"],
+    lambda record: ("igstrand_data" in record) and record.get("igstrand_data"),
+], ids=["getitem", "get", "items", "values", "dict", "unpack", "copy", "copy_module", "pickle", "json", "contains_get"])
+def test_every_read_sees_the_parsed_values(new_record, parsed, read):
+    record = new_record()
+    read(record)
+    assert record == parsed
+    assert dict(record) == parsed
+
+
+def test_setdefault_gives_the_parsed_value(new_record, parsed):
+    record = new_record()
+    assert record.setdefault("igstrand_data", 5) == parsed["igstrand_data"]
+    assert record.setdefault("new_field", 5) == 5
+    assert record == dict(parsed, new_field=5)
+
+
+@pytest.mark.parametrize("change", [
+    lambda record: record.update(igstrand_data={}),
+    lambda record: record.update({"igstrand_data": {}}),
+    lambda record: record.__ior__({"igstrand_data": {}}),
+    lambda record: record.__setitem__("igstrand_data", {}),
+], ids=["update_fields", "update", "ior", "setitem"])
+def test_changed_values_are_not_overwritten_by_parsing(new_record, parsed, change):
+    record = new_record()
+    change(record)
+    assert record["igstrand_data"] == {}
+    assert record["undefined_info"] == parsed["undefined_info"]
+
+
+def test_removing_keys(new_record, parsed):
+    record = new_record()
+    del record["igstrand_data"]
+    assert "igstrand_data" not in record
+    assert record["undefined_info"] == parsed["undefined_info"]
+
+    record = new_record()
+    popped = dict(record.popitem() for _ in range(len(record)))
+    assert popped == parsed
+
+    record = new_record()
+    record.clear()
+    assert record == {}
+    assert record.get("igstrand_data") is None
+
+
+def test_or_gives_a_parsed_plain_dict(new_record, parsed):
+    merged = new_record() | {"extra": 1}
+    assert type(merged) is dict
+    assert merged == dict(parsed, extra=1)
+    assert {"extra": 1} | new_record() == dict(parsed, extra=1)
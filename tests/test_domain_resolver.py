@@ -0,0 +1,60 @@
+import pytest
+
+from conftest import SAMPLE_LINES
+import icn3d_igstrand_refnum
+from domain_resolver import (group_by_pdb, resolve_input_domains, iter_resolved_domains, pack_domain_record, unpack_domain_record,
+                             _resolve_domains)
+from pipeline_profile import enable_profile, profile_snapshot
+
+# the PDBs are interleaved, so the groups are not in input order
+INTERLEAVED_LINES = [SAMPLE_LINES[index] for index in [1, 0, 4, 2, 5, 3]] + [("5ESV", "A", "9"), ("1RHH", "B", "1")]
+
+
+def plain(resolved_domains):
+    return [(pdb_chain_domain, None if record is None else dict(record)) for pdb_chain_domain, record in resolved_domains]
+
+
+def test_group_by_pdb_keeps_first_appearance():
+    groups = group_by_pdb(INTERLEAVED_LINES)
+    assert [[index for index, _ in group] for group in groups] == [[0, 3, 5, 6], [1, 7], [2], [4]]
+
+
+@pytest.mark.parametrize("workers", [2, 3])
+def test_workers_give_the_serial_result(input_folder, workers):
+    serial = plain(resolve_input_domains(INTERLEAVED_LINES, input_folder, "igstrand"))
+    assert [pdb_chain_domain for pdb_chain_domain, _ in serial] == INTERLEAVED_LINES
+    assert serial[6][1] is None # no such domain
+    assert plain(resolve_input_domains(INTERLEAVED_LINES, input_folder, "igstrand", workers=workers)) == serial
+
+
+def test_wildcard_lines_expand_in_place(input_folder):
+    resolved = resolve_input_domains([("1CD8", "A", "1"), ("5ESV", "A", "*"), ("1RHH", "B", "1")], input_folder, "igstrand",
+                                     workers=2)
+    assert [pdb_chain_domain for pdb_chain_domain, _ in resolved] == [("1CD8", "A", "1"), ("5ESV", "A", "1"), ("5ESV", "A", "2"),
+                                                                      ("1RHH", "B", "1")]
+
+
+def test_worker_profiles_are_merged(input_folder):
+    enable_profile()
+    resolve_input_domains(INTERLEAVED_LINES, input_folder, "igstrand", workers=2)
+    assert profile_snapshot()["stages"]["delineation"]["calls"] > 0
+
+
+def test_streamed_chunks_give_the_same_records(input_folder):
+    whole = plain(resolve_input_domains(INTERLEAVED_LINES, input_folder, "igstrand"))
+    assert plain(iter_resolved_domains(iter(INTERLEAVED_LINES), input_folder, "igstrand", chunk_lines=3)) == whole
+
+
+def test_packed_records_give_the_same_records(input_folder):
+    resolved_domains = resolve_input_domains(SAMPLE_LINES + [("5ESV", "A", "9")], input_folder, "igstrand")
+    for _, record in resolved_domains:
+        assert unpack_domain_record(pack_domain_record(record)) == (None if record is None else dict(record))
+    empty = {"refpdbname": "", "undefined_info": [], "igstrand_data": {}}
+    assert unpack_domain_record(pack_domain_record(empty)) == empty
+
+
+def test_mapping_files_are_not_looked_up_again(input_folder, monkeypatch):
+    monkeypatch.setattr(icn3d_igstrand_refnum, "find_mapping_file", lambda *args: pytest.fail("looked up again"))
+    summary = {"existing": ["5ESV"], "created": ["1CD8"], "failed": {"1RHH": "no output"}}
+    resolved = _resolve_domains(SAMPLE_LINES, input_folder + "number_mapping_files/", "igstrand", summary, workers=0)
+    assert [pdb for (pdb, _, _), record in resolved if record is not None] == ["5ESV", "5ESV", "5ESV", "1CD8"]
@@ -0,0 +1,101 @@
+import os
+
+import numpy as np
+import pytest
+
+from conftest import SAMPLE_PDBS
+from igstrand_domain_mapping import load_json_file
+from igstrand_index import IgstrandIndex, build_igstrand_index, position_code
+from igstrand_number import parse_igstrand_number
+from refnum_store import iter_refnum_domains
+
+
+@pytest.fixture
+def domains(mapping_folder):
+    """
+    Domain name -> record of every Ig domain of the sample PDBs, read without the index.
+    """
+    domains = {}
+    for pdb in SAMPLE_PDBS:
+        json_data = load_json_file(os.path.join(mapping_folder, f"{pdb}_refnum_igstrand.json"))
+        domains.update((key, dict(record)) for key, record in iter_refnum_domains(json_data, pdb))
+    return domains
+
+
+@pytest.fixture
+def igstrand_index(mapping_folder, tmp_path):
+    index_path = str(tmp_path / "refnum_igstrand.igindex")
+    build_igstrand_index(mapping_folder).save(index_path)
+    return IgstrandIndex.load(index_path + ".npz")
+
+
+def scan(domains, term):
+    """
+    Names of the domains matching one query term, by reading every residue.
+    """
+    field, has_value, value = term.partition("=")
+    matching = set()
+    for name, record in domains.items():
+        residues = [(parse_igstrand_number(igstrand_num), igstrand_num, residue_letter)
+                    for igstrand_num, (residue_letter, _) in record["igstrand_data"].items()]
+        residues = [(parsed, igstrand_num, letter) for parsed, igstrand_num, letter in residues
+                    if parsed is not None and len(letter) == 1]
+        if field == "igtype":
+            found = record["Igtype"] == value
+        elif field == "strand":
+            found = any(parsed[0] == value for parsed, _, _ in residues)
+        else:
+            found = any(position_code(igstrand_num) == position_code(field) and (not has_value or letter in value)
+                        for _, igstrand_num, letter in residues)
+        if found:
+            matching.add(name)
+    return matching
+
+
+def test_every_domain_is_indexed(igstrand_index, domains):
+    assert sorted(igstrand_index.domain_names.tolist()) == sorted(domains)
+
+
+@pytest.mark.parametrize("terms", [
+    ["2550=C"], ["2550=CS"], ["2550"], ["B2550=C"], ["3550=W"], ["2550=C", "3550=W"], ["strand=C''"],
+    ["igtype=IgV"], ["igtype=IgV", "!strand=C''"], ["!2550"], ["strand=Z"], ["igtype=IgX"], ["9999=C"],
+])
+def test_queries_match_a_scan_of_the_residues(igstrand_index, domains, terms):
+    expected = set(domains)
+    for term in terms:
+        if term.startswith("!"):
+            expected -= scan(domains, term[1:])
+        else:
+            expected &= scan(domains, term)
+    names = igstrand_index.query_names(terms)
+    assert names == sorted(names, key=igstrand_index.domain_names.tolist().index)
+    assert set(names) == expected
+
+
+def test_queries_find_domains(igstrand_index):
+    assert igstrand_index.query_names(["2550=C"])
+    assert igstrand_index.query_names(["igtype=IgV", "strand=C''"])
+
+
+@pytest.mark.parametrize("term", ["2550=", "strand=", "igtype=", "!2550="])
+def test_terms_need_a_value_after_the_equal_sign(igstrand_index, term):
+    with pytest.raises(ValueError, match="nothing after '='"):
+        igstrand_index.query([term])
+
+
+@pytest.mark.parametrize("term", ["XYZ=C", ""])
+def test_bad_positions_raise_value_error(igstrand_index, term):
+    with pytest.raises(ValueError):
+        igstrand_index.query([term])
+
+
+def test_other_npz_files_are_not_indexes(tmp_path):
+    np.savez(tmp_path / "other", version=0)
+    with pytest.raises(ValueError):
+        IgstrandIndex.load(tmp_path / "other.npz")
+
+
+def test_empty_folder_gives_an_empty_index(tmp_path):
+    igstrand_index = build_igstrand_index(str(tmp_path) + os.sep)
+    assert len(igstrand_index) == 0
+    assert igstrand_index.query_names(["2550=C"]) == []
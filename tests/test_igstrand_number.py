@@ -0,0 +1,74 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+import igstrand_number
+from igstrand_number import (parse_igstrand_number, encode_igstrand_number, decode_igstrand_number, encode_igstrand_numbers,
+                             decode_igstrand_numbers, igstrand_fields, is_anchor, strand_name, strand_names,
+                             COLUMN_MASK, POSITION_MASK)
+
+NUMBERS = ["A1550", "A'1846a", "C'4548", "C''5550", "B2550_loop", "G+9550z", "1550", "D6550a_loop"]
+
+
+@pytest.mark.parametrize("number_string", NUMBERS)
+def test_codes_give_the_number_back(number_string):
+    assert decode_igstrand_number(encode_igstrand_number(number_string)) == number_string
+
+
+def test_parse():
+    assert parse_igstrand_number("A'1846a_loop") == ("A'", 1846, "a", True)
+    assert parse_igstrand_number("1550") == ("", 1550, "", False)
+    for not_a_number in ["A", "", "A15ab", "A15A", "loop"]:
+        assert parse_igstrand_number(not_a_number) is None
+        with pytest.raises(ValueError):
+            encode_igstrand_number(not_a_number)
+
+
+def test_codes_sort_by_number_insertion_then_strand():
+    ordered = ["A1549", "A1550", "A1550a", "A1550b", "A'1846", "B1846", "C3550", "C'4548", "C''4548"]
+    assert sorted(ordered[::-1], key=encode_igstrand_number) == ordered
+
+
+def test_fields_and_masks():
+    code = encode_igstrand_number("C'4548b_loop")
+    number, insertion, strand_id, loop = igstrand_fields(code)
+    assert (number, insertion, loop, strand_name(code)) == (4548, 2, 1, "C'")
+    assert decode_igstrand_number(code & COLUMN_MASK) == "C'4548"
+    assert code & POSITION_MASK == encode_igstrand_number("4548b")
+    assert is_anchor(encode_igstrand_number("G7550")) and not is_anchor(encode_igstrand_number("G7551"))
+
+
+def test_vectorized_forms_match():
+    codes = encode_igstrand_numbers(NUMBERS)
+    assert codes.dtype == np.int32
+    assert codes.tolist() == [encode_igstrand_number(number_string) for number_string in NUMBERS]
+    assert decode_igstrand_numbers(codes) == NUMBERS
+    assert strand_names(codes).tolist() == [strand_name(code) for code in codes.tolist()]
+    assert is_anchor(codes).tolist() == [number_string.rstrip("abcdefghijklmnopqrstuvwxyz_lop").endswith("50") for number_string in NUMBERS]
+
+
+def test_new_strand_names_are_registered():
+    code = encode_igstrand_number("X'7777")
+    assert strand_name(code) == "X'"
+    assert encode_igstrand_number("X'7778") == code + (1 << 11)
+
+
+def test_new_strands_get_one_id_across_threads():
+    names = [f"Z{i}" for i in range(4)]
+    barrier = threading.Barrier(16)
+
+    def register(i):
+        barrier.wait()
+        return igstrand_number.get_strand_id(names[i % len(names)])
+    try:
+        with ThreadPoolExecutor(16) as executor:
+            strand_ids = list(executor.map(register, range(16)))
+        assert len(set(strand_ids)) == len(names)
+        assert all(igstrand_number.STRANDS[strand_id] == names[i % len(names)] for i, strand_id in enumerate(strand_ids))
+    finally:
+        for name in names:
+            if name in igstrand_number.strand_ids:
+                del igstrand_number.strand_ids[name]
+                igstrand_number.STRANDS.remove(name)
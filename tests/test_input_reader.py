@@ -0,0 +1,66 @@
+import io
+import os
+import sys
+
+from input_reader import (stream_input_file, read_input_file, dedupe_input_lines, sort_input_lines, input_save_name,
+                          parse_input_lines)
+
+INPUT_TEXT = """# pdbid chain domain
+1rhh B 1
+5ESV\tD\t1   # tab separated
+  5esv  A   1
+
+5ESV A
+1RHH B 1
+1CD8 A 1
+5ESV D 1
+"""
+
+
+def input_file(tmp_path, text=INPUT_TEXT):
+    file_path = tmp_path / "input.txt"
+    file_path.write_text(text)
+    return str(file_path)
+
+
+def test_any_whitespace_and_comments(tmp_path, capsys):
+    assert read_input_file(input_file(tmp_path)) == [("1RHH", "B", "1"), ("5ESV", "D", "1"), ("5ESV", "A", "1"),
+                                                     ("1RHH", "B", "1"), ("1CD8", "A", "1"), ("5ESV", "D", "1")]
+    assert "['5ESV', 'A'] has three value" in capsys.readouterr().out
+
+
+def test_dedupe_keeps_the_first_line(tmp_path):
+    assert read_input_file(input_file(tmp_path), dedupe=True) == [("1RHH", "B", "1"), ("5ESV", "D", "1"), ("5ESV", "A", "1"),
+                                                                  ("1CD8", "A", "1")]
+
+
+def test_dedupe_window_is_bounded():
+    lines = [("A", "1", "1"), ("B", "1", "1"), ("C", "1", "1"), ("A", "1", "1"), ("C", "1", "1")]
+    # with two remembered lines, A is forgotten when C is seen; C is still remembered
+    assert list(dedupe_input_lines(lines, window=2)) == lines[:4]
+
+
+def test_sort_by_pdb_keeps_the_order_within_a_pdb(tmp_path):
+    assert read_input_file(input_file(tmp_path), sort_by_pdb=True) == [("1CD8", "A", "1"), ("1RHH", "B", "1"), ("1RHH", "B", "1"),
+                                                                       ("5ESV", "D", "1"), ("5ESV", "A", "1"), ("5ESV", "D", "1")]
+    assert read_input_file(input_file(tmp_path), dedupe=True, sort_by_pdb=True) == [
+        ("1CD8", "A", "1"), ("1RHH", "B", "1"), ("5ESV", "D", "1"), ("5ESV", "A", "1")]
+
+
+def test_sorting_in_chunks_on_disk(tmp_path):
+    lines = [(f"{index % 7}PDB", chr(ord("A") + index % 3), str(index)) for index in range(50)]
+    expected = sorted(lines, key=lambda line: line[0]) # stable: input order within a PDB
+    assert list(sort_input_lines(iter(lines), chunk_lines=8, tmp_dir=str(tmp_path))) == expected
+    assert os.listdir(tmp_path) == [] # chunk files are removed
+
+
+def test_stdin(monkeypatch):
+    monkeypatch.setattr(sys, "stdin", io.StringIO("5esv a 1\n1CD8 A 1\n"))
+    lines = stream_input_file("-")
+    assert not isinstance(lines, list)
+    assert list(lines) == [("5ESV", "a", "1"), ("1CD8", "A", "1")]
+    assert input_save_name("-") == "stdin"
+
+
+def test_parse_text_lines():
+    assert list(parse_input_lines(["5ESV H *", "# only a comment", ""])) == [("5ESV", "H", "*")]
@@ -0,0 +1,44 @@
+import json
+
+import json5
+import pytest
+
+from conftest import MAPPING_FILES, SAMPLE_PDBS
+from igstrand_domain_mapping import repair_node_json, load_json_text, load_json_file, json_loader_stats
+from mapping_files import read_mapping_text
+
+
+def test_repair_drops_trailing_commas_and_closes_the_array():
+    node_text = '[\n{"5ESV": {"igs": [\n{"a": 1,},\n],}},\n'
+    assert json.loads(repair_node_json(node_text)) == [{"5ESV": {"igs": [{"a": 1}]}}]
+
+
+def test_repair_keeps_commas_inside_strings():
+    node_text = '[{"key": "a, ]", "b": "x,}",},]'
+    assert json.loads(repair_node_json(node_text)) == [{"key": "a, ]", "b": "x,}"}]
+
+
+def test_json5_is_the_fallback():
+    fast_before, json5_before = json_loader_stats["fast"], json_loader_stats["json5"]
+    data, loader = load_json_text("[{unquoted: 1,},]")
+    assert (data, loader) == ([{"unquoted": 1}], "json5")
+    data, loader = load_json_text('[{"quoted": 1,},]')
+    assert (data, loader) == ([{"quoted": 1}], "fast")
+    assert json_loader_stats["fast"] == fast_before + 1
+    assert json_loader_stats["json5"] == json5_before + 1
+
+
+@pytest.mark.parametrize("pdb", SAMPLE_PDBS)
+def test_fast_loader_matches_json5(pdb):
+    json_text = read_mapping_text(str(MAPPING_FILES / f"{pdb}_refnum_igstrand.json")).rstrip("\n")
+    data, loader = load_json_text(json_text)
+    assert loader == "fast"
+    if not json_text.endswith("]"):
+        json_text += "]"
+    assert data == json5.loads(json_text)
+
+
+def test_empty_file_gives_none(tmp_path):
+    empty_file = tmp_path / "EMPT_refnum_igstrand.json"
+    empty_file.write_text("\n")
+    assert load_json_file(str(empty_file)) is None
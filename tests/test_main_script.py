@@ -0,0 +1,44 @@
+import sys
+import shutil
+
+import pytest
+
+import main_script
+from conftest import SAMPLE_PDBS, xlsx_parts
+from igstrand_domain_mapping import refnum_cache_info, clear_refnum_cache
+
+
+def run_main(monkeypatch, *options):
+    monkeypatch.setattr(sys, "argv", ["main_script.py", *options])
+    main_script.main()
+
+
+@pytest.fixture
+def sample_txt(work_dir, sample_input_file):
+    shutil.copy(sample_input_file, "sample.txt")
+    return "sample.txt"
+
+
+def test_1d_and_2d_read_each_mapping_file_once(work_dir, sample_txt, monkeypatch):
+    run_main(monkeypatch, "-f", sample_txt, "-d", "1D,2D")
+    assert refnum_cache_info()["misses"] == len(SAMPLE_PDBS)
+    assert (work_dir / "output" / "1D_mapping_sampleigstrand.xlsx").exists()
+    assert (work_dir / "output" / "2D_mapping_igstrand.xlsx").exists()
+
+
+def test_combined_run_writes_the_files_of_separate_runs(work_dir, sample_txt, monkeypatch):
+    output = work_dir / "output"
+    run_main(monkeypatch, "-f", sample_txt, "-d", "1D,2D")
+    combined = {name: xlsx_parts(output / name) for name in ["1D_mapping_sampleigstrand.xlsx", "2D_mapping_igstrand.xlsx"]}
+
+    for dimension, name in [("1D", "1D_mapping_sampleigstrand.xlsx"), ("2D", "2D_mapping_igstrand.xlsx")]:
+        (output / name).unlink()
+        clear_refnum_cache()
+        run_main(monkeypatch, "-f", sample_txt, "-d", dimension)
+        assert xlsx_parts(output / name) == combined[name]
+
+
+def test_invalid_dimension_writes_nothing(work_dir, sample_txt, monkeypatch, capsys):
+    run_main(monkeypatch, "-f", sample_txt, "-d", "3D")
+    assert "Invalid dimension specified: 3D" in capsys.readouterr().out
+    assert list((work_dir / "output").iterdir()) == []
@@ -0,0 +1,86 @@
+import os
+
+import pytest
+
+import mapping_files
+from alignment_1D_manifest import file_signature
+from conftest import SAMPLE_LINES, SAMPLE_PDBS, MAPPING_FILES
+from igstrand_domain_mapping import get_igmap_domain, clear_refnum_cache
+from mapping_files import (migrate_mapping_files, find_mapping_file, iter_mapping_files, mapping_layout,
+                           mapping_file_target, read_mapping_bytes, write_mapping_bytes, LAYOUT_FILE_NAME)
+
+
+def domain_records(mapping_folder):
+    clear_refnum_cache()
+    return [dict(get_igmap_domain(line, "igstrand", mapping_folder)) for line in SAMPLE_LINES]
+
+
+def mapping_file_names(mapping_folder):
+    return sorted(os.path.relpath(os.path.join(folder, name), mapping_folder)
+                  for folder, _, names in os.walk(mapping_folder) for name in names if "_refnum_" in name)
+
+
+@pytest.mark.parametrize("sharded, compression, suffix", [(True, "zst", ".zst"), (True, "gz", ".gz"), (False, "zst", ".zst")])
+def test_migration_keeps_the_records(mapping_folder, sharded, compression, suffix):
+    expected = domain_records(mapping_folder)
+    mtimes = {pdb: os.stat(file_path).st_mtime_ns for pdb, file_path in iter_mapping_files(mapping_folder)}
+
+    assert migrate_mapping_files(mapping_folder, sharded, compression) == len(SAMPLE_PDBS)
+    assert mapping_layout(mapping_folder) == {"sharded": sharded, "compression": compression}
+    for pdb in SAMPLE_PDBS:
+        file_name = f"{pdb}_refnum_igstrand.json{suffix}"
+        file_path = find_mapping_file(pdb, mapping_folder)
+        assert file_path == os.path.join(mapping_folder, pdb[1:3].lower() if sharded else "", file_name)
+        assert os.stat(file_path).st_mtime_ns == mtimes[pdb]
+        assert read_mapping_bytes(file_path) == (MAPPING_FILES / f"{pdb}_refnum_igstrand.json").read_bytes()
+    assert len(mapping_file_names(mapping_folder)) == len(SAMPLE_PDBS)
+    assert domain_records(mapping_folder) == expected
+
+    mapping_files._layouts.clear() # the layout is read again from mapping_layout.json
+    assert domain_records(mapping_folder) == expected
+    assert migrate_mapping_files(mapping_folder, sharded, compression) == 0
+
+
+def test_migrating_back_gives_the_original_files(mapping_folder):
+    migrate_mapping_files(mapping_folder, True, "zst")
+    assert migrate_mapping_files(mapping_folder, False, "none") == len(SAMPLE_PDBS)
+    assert mapping_file_names(mapping_folder) == [f"{pdb}_refnum_igstrand.json" for pdb in sorted(SAMPLE_PDBS)]
+    for pdb in SAMPLE_PDBS:
+        assert (open(os.path.join(mapping_folder, f"{pdb}_refnum_igstrand.json"), "rb").read()
+                == (MAPPING_FILES / f"{pdb}_refnum_igstrand.json").read_bytes())
+
+
+def test_interrupted_migration_is_finished_by_running_again(mapping_folder):
+    expected = domain_records(mapping_folder)
+    # the new files of two PDBs were written before the run stopped, their old files are still there
+    layout = {"sharded": True, "compression": "zst"}
+    mapping_files._layouts[os.path.abspath(mapping_folder)] = layout
+    for pdb in SAMPLE_PDBS[:2]:
+        write_mapping_bytes(read_mapping_bytes(os.path.join(mapping_folder, f"{pdb}_refnum_igstrand.json")),
+                            mapping_file_target(pdb, mapping_folder))
+    # and a gz copy of an earlier migration
+    pdb = SAMPLE_PDBS[-1]
+    write_mapping_bytes(read_mapping_bytes(os.path.join(mapping_folder, f"{pdb}_refnum_igstrand.json")),
+                        os.path.join(mapping_folder, f"{pdb}_refnum_igstrand.json.gz"))
+    mapping_files._layouts.clear()
+    assert len(mapping_file_names(mapping_folder)) == len(SAMPLE_PDBS) + 3
+
+    assert migrate_mapping_files(mapping_folder, True, "zst") == len(SAMPLE_PDBS) - 2
+    assert mapping_file_names(mapping_folder) == sorted(
+        os.path.join(pdb[1:3].lower(), f"{pdb}_refnum_igstrand.json.zst") for pdb in SAMPLE_PDBS)
+    assert domain_records(mapping_folder) == expected
+
+
+def test_unknown_compression(mapping_folder):
+    with pytest.raises(ValueError):
+        migrate_mapping_files(mapping_folder, True, "bz2")
+    assert not os.path.exists(os.path.join(mapping_folder, LAYOUT_FILE_NAME))
+
+
+def test_zst_files_without_zstandard_are_skipped(mapping_folder, monkeypatch, capsys):
+    migrate_mapping_files(mapping_folder, False, "zst")
+    monkeypatch.setattr(mapping_files, "zstandard", None)
+    clear_refnum_cache()
+    assert get_igmap_domain(("5ESV", "A", "1"), "igstrand", mapping_folder) is None
+    assert "Mapping file of 5ESV can not be read" in capsys.readouterr().out
+    assert file_signature("5ESV", mapping_folder) is None
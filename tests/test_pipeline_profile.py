@@ -0,0 +1,62 @@
+import gzip
+import json
+import os
+import shutil
+import sys
+
+import main_script
+from conftest import MAPPING_FILES, SAMPLE_PDBS
+from igstrand_domain_mapping import load_json_file
+from pipeline_profile import (enable_profile, profile_stage, profile_count, profile_snapshot, profile_report,
+                              format_profile_summary)
+
+
+def test_nothing_is_recorded_when_off():
+    assert profile_stage("a") is profile_stage("b")
+    with profile_stage("a", items=3):
+        profile_count("n")
+    assert profile_snapshot() == {"stages": {}, "counters": {}}
+
+
+def test_stages_and_counters():
+    enable_profile()
+    with profile_stage("outer", items=2):
+        with profile_stage("inner") as stage:
+            stage.items = 5
+        with profile_stage("inner"):
+            profile_count("bytes", 10)
+    profile_count("bytes", 5)
+    snapshot = profile_snapshot()
+    assert {name: (stage["calls"], stage["items"]) for name, stage in snapshot["stages"].items()} == {"outer": (1, 2), "inner": (2, 5)}
+    assert snapshot["stages"]["outer"]["wall"] >= snapshot["stages"]["inner"]["wall"]
+    assert snapshot["counters"] == {"bytes": 15}
+    summary = format_profile_summary(profile_report(caches={"cache": {"hits": 1}}))
+    assert "outer" in summary and "bytes=15" in summary and "cache: hits=1" in summary
+
+
+def test_json_bytes_read_are_file_bytes(tmp_path):
+    plain_file = tmp_path / "5ESV_refnum_igstrand.json"
+    shutil.copy(MAPPING_FILES / "5ESV_refnum_igstrand.json", plain_file)
+    plain_file.write_text(plain_file.read_text().replace("5ESV_A_2_V", "5ESV_A_2_Ü")) # not one byte per character
+    gz_file = tmp_path / "1CD8_refnum_igstrand.json.gz"
+    gz_file.write_bytes(gzip.compress((MAPPING_FILES / "1CD8_refnum_igstrand.json").read_bytes()))
+    enable_profile()
+    assert load_json_file(str(plain_file)) and load_json_file(str(gz_file))
+    assert profile_snapshot()["counters"]["json_bytes_read"] == os.path.getsize(plain_file) + os.path.getsize(gz_file)
+
+
+def test_profile_option_writes_the_report(work_dir, sample_input_file, monkeypatch, capsys):
+    shutil.copy(sample_input_file, "sample.txt")
+    monkeypatch.setattr(sys, "argv", ["main_script.py", "-f", "sample.txt", "-d", "1D,2D", "--profile"])
+    main_script.main()
+    with open(work_dir / "output" / "profile_sampleigstrand.json") as f:
+        report = json.load(f)
+    for stage in ["total", "prefetch", "resolve", "json_parse", "delineation", "matrix_build", "cell_filling_1d",
+                  "save_1d", "cell_filling_2d", "save_2d"]:
+        assert report["stages"][stage]["calls"] > 0, stage
+    assert report["stages"]["json_parse"]["calls"] == len(SAMPLE_PDBS)
+    counters = report["counters"]
+    assert counters["json_bytes_read"] == sum(os.path.getsize(MAPPING_FILES / f"{pdb}_refnum_igstrand.json") for pdb in SAMPLE_PDBS)
+    assert counters["bytes_written_2d"] == os.path.getsize(work_dir / "output" / "2D_mapping_igstrand.xlsx")
+    assert report["caches"]["refnum_cache"]["misses"] == len(SAMPLE_PDBS)
+    assert "Profile saved as" in capsys.readouterr().out
@@ -0,0 +1,74 @@
+import os
+import sys
+import subprocess
+
+import pytest
+
+from conftest import SRC, MAPPING_FILES, WORKER_STUB, needs_node
+from icn3d_igstrand_refnum import prefetch_igstrand_references
+
+pytestmark = needs_node
+
+TIMEOUT = 3
+
+
+@pytest.fixture
+def empty_folder(tmp_path):
+    mapping_dir = tmp_path / "number_mapping_files"
+    mapping_dir.mkdir()
+    return str(mapping_dir) + os.sep
+
+
+def prefetch(pdb_names, mapping_folder, use_worker):
+    return prefetch_igstrand_references(pdb_names, mapping_folder, jobs=2, timeout=TIMEOUT, node_script=str(WORKER_STUB),
+                                        use_worker=use_worker)
+
+
+@pytest.mark.parametrize("use_worker", [False, True], ids=["per_pdb", "worker"])
+def test_missing_files_are_created_once(empty_folder, use_worker):
+    summary = prefetch(["1cd8", "1CD8", "5esv"], empty_folder, use_worker)
+    assert summary == {"existing": [], "created": ["1CD8", "5ESV"], "failed": {}}
+    for pdb in ["1CD8", "5ESV"]:
+        with open(os.path.join(empty_folder, f"{pdb}_refnum_igstrand.json")) as created, \
+                open(MAPPING_FILES / f"{pdb}_refnum_igstrand.json") as original:
+            assert created.read() == original.read()
+
+    summary = prefetch(["1CD8"], empty_folder, use_worker)
+    assert summary == {"existing": ["1CD8"], "created": [], "failed": {}}
+
+
+@pytest.mark.parametrize("use_worker", [False, True], ids=["per_pdb", "worker"])
+def test_crash_is_a_failure_of_that_pdb_only(empty_folder, use_worker, caplog):
+    summary = prefetch(["CRASH", "1CD8"], empty_folder, use_worker)
+    assert summary["created"] == ["1CD8"]
+    assert list(summary["failed"]) == ["CRASH"]
+    assert not os.path.exists(os.path.join(empty_folder, "CRASH_refnum_igstrand.json"))
+    assert "CRASH_refnum_igstrand.json is not created" in caplog.text
+
+
+@pytest.mark.parametrize("use_worker", [False, True], ids=["per_pdb", "worker"])
+def test_hang_times_out(empty_folder, use_worker, caplog):
+    summary = prefetch(["HANG", "1CD8"], empty_folder, use_worker)
+    assert summary["created"] == ["1CD8"]
+    assert "timed out" in summary["failed"]["HANG"]
+    assert "HANG_refnum_igstrand.json is not created" in caplog.text
+
+
+@pytest.mark.parametrize("worker_option", [[], ["--worker"]], ids=["per_pdb", "worker"])
+def test_cli_failures_reach_the_log(input_folder, tmp_path, worker_option):
+    os.remove(os.path.join(input_folder, "number_mapping_files", "1CD8_refnum_igstrand.json"))
+    input_file = tmp_path / "prefetch.txt"
+    input_file.write_text("1CD8 A 1\nCRASH A 1\nHANG A 1\n")
+    output_folder = tmp_path / "output"
+    output_folder.mkdir()
+    env = dict(os.environ, input_file_path=input_folder, output_file_path=str(output_folder) + os.sep)
+    subprocess.run([sys.executable, str(SRC / "alignment_1D_igstrand.py"), "-f", input_file.name, "--format", "tsv",
+                    "--node-script", str(WORKER_STUB), "--timeout", str(TIMEOUT), *worker_option],
+                   cwd=tmp_path, env=env, check=True, capture_output=True, timeout=60)
+
+    log_text = (tmp_path / "igstrand.log").read_text()
+    assert "CRASH_refnum_igstrand.json is not created" in log_text
+    assert "HANG_refnum_igstrand.json is not created" in log_text
+    assert os.path.exists(os.path.join(input_folder, "number_mapping_files", "1CD8_refnum_igstrand.json"))
+    tsv_rows = (output_folder / "1D_mapping_prefetchigstrand.tsv").read_text().splitlines()
+    assert [row.split("\t")[0] for row in tsv_rows[1:]] == ["1CD8_A_1", "CRASH_A_1", "HANG_A_1"]
@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+import igstrand_domain_mapping as mapping
+from igstrand_domain_mapping import (get_refnum_data, get_igmap_domain, refnum_cache_info, configure_refnum_cache,
+                                     json_loader_stats)
+
+
+@pytest.fixture
+def cache_limits():
+    """
+    Restore the cache settings changed by a test.
+    """
+    saved = dict(mapping.refnum_cache_config)
+    yield
+    configure_refnum_cache(saved["enabled"], saved["max_entries"], saved["max_bytes"])
+
+
+def test_each_pdb_is_parsed_once(mapping_folder):
+    before = sum(json_loader_stats.values())
+    for chain, domain in [("A", "1"), ("A", "2"), ("D", "1"), ("A", "1")]:
+        assert get_igmap_domain(("5ESV", chain, domain), "igstrand", mapping_folder) is not None
+    info = refnum_cache_info()
+    assert info["misses"] == 1
+    assert info["hits"] == 3
+    assert info["entries"] == 1
+    assert sum(json_loader_stats.values()) - before == 1
+
+
+def test_changed_file_is_parsed_again(mapping_folder):
+    first = get_refnum_data("5ESV", "igstrand", mapping_folder)
+    file_path = os.path.join(mapping_folder, "5ESV_refnum_igstrand.json")
+    stat = os.stat(file_path)
+    os.utime(file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    second = get_refnum_data("5ESV", "igstrand", mapping_folder)
+    assert second is not first
+    assert second == first
+    assert refnum_cache_info()["misses"] == 2
+
+
+def test_least_recently_used_entry_is_evicted(mapping_folder, cache_limits):
+    configure_refnum_cache(max_entries=2)
+    for pdb in ["5ESV", "1CD8", "5ESV", "7TZG"]:
+        get_refnum_data(pdb, "igstrand", mapping_folder)
+    info = refnum_cache_info()
+    assert info["entries"] == 2
+    assert info["evictions"] == 1
+    get_refnum_data("5ESV", "igstrand", mapping_folder) # still cached
+    assert refnum_cache_info()["hits"] == 2
+
+
+def test_cache_is_bounded_by_file_size(mapping_folder, cache_limits):
+    configure_refnum_cache(max_bytes=os.path.getsize(os.path.join(mapping_folder, "5ESV_refnum_igstrand.json")))
+    get_refnum_data("5ESV", "igstrand", mapping_folder)
+    get_refnum_data("1CD8", "igstrand", mapping_folder)
+    info = refnum_cache_info()
+    assert info["entries"] == 1
+    assert info["bytes"] <= info["max_bytes"]
+
+
+def test_cache_can_be_switched_off(mapping_folder, cache_limits):
+    get_refnum_data("5ESV", "igstrand", mapping_folder, use_cache=False)
+    assert refnum_cache_info()["entries"] == 0
+    configure_refnum_cache(enabled=False)
+    get_refnum_data("5ESV", "igstrand", mapping_folder)
+    get_refnum_data("5ESV", "igstrand", mapping_folder)
+    info = refnum_cache_info()
+    assert info["entries"] == 0
+    assert info["hits"] == 0
@@ -0,0 +1,107 @@
+import os
+
+import pytest
+
+from conftest import SAMPLE_LINES, SAMPLE_PDBS
+from igstrand_domain_mapping import get_igmap_chain_domains, get_igmap_domain, refnum_cache_info, close_refnum_stores
+from refnum_store import (compile_refnum_store, RefnumStore, _encode_domain, store_key_hash, HEADER, SLOT, FIELD_SEP,
+                          STORE_MAGIC, STORE_VERSION)
+
+
+@pytest.fixture
+def store_path(mapping_folder):
+    store_path = os.path.join(mapping_folder, "refnum_igstrand.igstore")
+    n_files, n_domains = compile_refnum_store(mapping_folder, store_path)
+    assert n_files == len(SAMPLE_PDBS)
+    assert n_domains > len(SAMPLE_LINES)
+    return store_path
+
+
+def json_domains(mapping_folder, pdb, chain):
+    """
+    Domains of a chain read from its json file, with the store switched off.
+    """
+    os.environ["refnum_store"] = "0"
+    close_refnum_stores()
+    try:
+        return {domain: dict(record) for domain, record in get_igmap_chain_domains(pdb, chain, "igstrand", mapping_folder).items()}
+    finally:
+        del os.environ["refnum_store"]
+        close_refnum_stores()
+
+
+@pytest.mark.parametrize("pdb, chain", sorted({(pdb, chain) for pdb, chain, _ in SAMPLE_LINES}))
+def test_store_gives_the_json_records(store_path, mapping_folder, pdb, chain):
+    expected = json_domains(mapping_folder, pdb, chain)
+    with RefnumStore(store_path) as refnum_store:
+        for domain, record in expected.items():
+            stored = refnum_store.get_domain(pdb, chain, domain)
+            assert stored.pop("igstrand_data") == {key: tuple(value) for key, value in record.pop("igstrand_data").items()}
+            assert stored == record
+        assert refnum_store.get_domain(pdb, chain, str(len(expected) + 1)) is None
+
+
+def test_lookups_use_the_store_without_json(store_path, mapping_folder):
+    for pdb_chain_domain in SAMPLE_LINES:
+        assert get_igmap_domain(pdb_chain_domain, "igstrand", mapping_folder) is not None
+    assert refnum_cache_info()["misses"] == 0
+
+
+def test_newer_json_file_is_read_instead_of_the_store(store_path, mapping_folder):
+    file_path = os.path.join(mapping_folder, "5ESV_refnum_igstrand.json")
+    stat = os.stat(file_path)
+    os.utime(file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert get_igmap_domain(("5ESV", "A", "1"), "igstrand", mapping_folder) is not None
+    assert get_igmap_domain(("1CD8", "A", "1"), "igstrand", mapping_folder) is not None
+    assert refnum_cache_info()["misses"] == 1
+
+
+def test_unknown_pdb_is_not_in_the_store(store_path):
+    with RefnumStore(store_path) as refnum_store:
+        assert refnum_store.pdb_mtime("9ZZZ") is None
+        assert refnum_store.get_domain("9ZZZ", "A", "1") is None
+
+
+def test_other_files_are_not_stores(tmp_path):
+    not_a_store = tmp_path / "bad.igstore"
+    not_a_store.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        RefnumStore(str(not_a_store))
+
+
+def test_records_with_missing_residues_and_many_loop_names(tmp_path):
+    record = {"3Ddomain_order": 1, "refpdbname": "not_a_reference", "igD_res_range": "1-2", "3dD_res_range": "1:2",
+              "tmscore": 0.5, "seqid": 1, "nresAlign": 2, "undefined_info": [],
+              "igstrand_data": {"1550": ("", "A"), "1551": ("K", "B")}}
+    loop_codes = {f"loop {i}": i for i in range(300)}
+    body = bytearray(b"\0" * HEADER.size) + _encode_domain("1ABC_A_1", record, 0, loop_codes)
+    assert (loop_codes["A"], loop_codes["B"]) == (300, 301)
+    loop_names = FIELD_SEP.join(sorted(loop_codes, key=loop_codes.get)).encode()
+    names_offset = len(body)
+    body += b"igstrand" + loop_names
+    body += b"\0" * (-len(body) % 8)
+    slots_offset = len(body)
+    slots = [(0, 0)] * 8
+    key_hash = store_key_hash("1ABC_A_1")
+    slots[key_hash & 7] = (key_hash, HEADER.size + 1)
+    body[:HEADER.size] = HEADER.pack(STORE_MAGIC, STORE_VERSION, 8, slots_offset, names_offset, 8, len(loop_names))
+    store_path = tmp_path / "refnum_igstrand.igstore"
+    store_path.write_bytes(bytes(body) + b"".join(SLOT.pack(*slot) for slot in slots))
+    with RefnumStore(str(store_path)) as refnum_store:
+        assert refnum_store.get_domain("1ABC", "A", "1")["igstrand_data"] == record["igstrand_data"]
+        assert refnum_store.get_domain("1ABC", "A", "1")["Igtype"] == ""
+
+
+def test_residues_of_more_than_one_letter_are_not_stored():
+    record = {"3Ddomain_order": 1, "refpdbname": "", "igD_res_range": "", "3dD_res_range": "", "tmscore": 0, "seqid": 0,
+              "nresAlign": 0, "undefined_info": [], "igstrand_data": {"1550": ("KK", "")}}
+    with pytest.raises(ValueError):
+        _encode_domain("1ABC_A_1", record, 0, {"": 0})
+
+
+def test_stores_of_another_version_are_skipped(store_path, mapping_folder):
+    with open(store_path, "r+b") as store_file:
+        store_file.seek(8)
+        store_file.write((STORE_VERSION + 1).to_bytes(4, "little"))
+    assert get_igmap_domain(("5ESV", "A", "1"), "igstrand", mapping_folder) is not None
+    assert refnum_cache_info()["misses"] == 1
@@ -0,0 +1,104 @@
+import io
+import os
+import queue
+
+import pytest
+
+from conftest import MAPPING_FILES, WORKER_STUB, needs_node
+from icn3d_igstrand_refnum import RefnumWorker, RefnumWorkerPool
+
+
+def read_frames(output):
+    frames = queue.Queue()
+    RefnumWorker._read_frames(io.BytesIO(output), frames)
+    return [frames.get_nowait() for _ in range(frames.qsize())]
+
+
+def test_frames_are_cut_by_byte_length():
+    payload = '[\n{"ÅB12": "#refnum ok 3\\n"},\n]\n'.encode()
+    output = (b"#ready\n" + b"loading icn3d\n" + b"#refnum ok %d\n" % len(payload) + payload
+              + b"#refnum error 9\nnot found" + b"#refnum ok 2\n[]")
+    assert read_frames(output) == [("ready", b""), ("ok", payload), ("error", b"not found"), ("ok", b"[]"), None]
+
+
+def test_closed_output_ends_with_none():
+    assert read_frames(b"") == [None]
+
+
+@pytest.mark.parametrize("header", [b"#refnum ok\n", b"#refnum ok many\n", b"#refnum ok 2 3\n"])
+def test_broken_header_ends_the_frames(header):
+    assert read_frames(b"#ready\n" + header + b"#refnum ok 2\n[]") == [("ready", b""), None]
+
+
+@pytest.fixture
+def worker():
+    worker = RefnumWorker(str(WORKER_STUB), start_timeout=10)
+    yield worker
+    worker.close()
+
+
+@needs_node
+def test_worker_answers_with_the_refnum_text(worker):
+    for pdb in ["5esv", "1CD8", "5ESV"]:
+        assert worker.request(pdb, timeout=10) == (MAPPING_FILES / f"{pdb.upper()}_refnum_igstrand.json").read_text()
+    assert '"9ZZZ"' in worker.request("9ZZZ", timeout=10)
+
+
+@needs_node
+def test_worker_restarts_after_a_crash(worker):
+    worker.request("1CD8", timeout=10)
+    first_pid = worker.process.pid
+    with pytest.raises(RuntimeError, match="exited"):
+        worker.request("CRASH", timeout=10)
+    assert worker.process is None
+    assert worker.request("1CD8", timeout=10).startswith("[")
+    assert worker.process.pid != first_pid
+
+
+@needs_node
+def test_worker_restarts_after_a_timeout(worker):
+    with pytest.raises(TimeoutError):
+        worker.request("HANG", timeout=1)
+    assert worker.process is None
+    # the late answer of the old process can not be taken for the next request
+    assert worker.request("5ESV", timeout=10) == (MAPPING_FILES / "5ESV_refnum_igstrand.json").read_text()
+
+
+@needs_node
+def test_worker_that_never_gets_ready(tmp_path):
+    silent_script = tmp_path / "silent.js"
+    silent_script.write_text("setInterval(function() {}, 1000);\n")
+    worker = RefnumWorker(str(silent_script), start_timeout=1)
+    with pytest.raises(RuntimeError, match="did not start"):
+        worker.start()
+    assert worker.process is None
+
+
+@needs_node
+def test_pool_writes_mapping_files(tmp_path):
+    mapping_folder = str(tmp_path) + os.sep
+    with RefnumWorkerPool(2, str(WORKER_STUB), timeout=10) as pool:
+        assert pool.create_mapping_file("1CD8", mapping_folder) == (True, "")
+        created, reason = pool.create_mapping_file("CRASH", mapping_folder)
+        assert not created and "exited" in reason
+        assert pool.create_mapping_file("5ESV", mapping_folder) == (True, "")
+        processes = [worker.process for worker in pool.workers if worker.process is not None]
+    assert processes and all(process.poll() is not None for process in processes)
+    assert sorted(os.listdir(tmp_path)) == ["1CD8_refnum_igstrand.json", "5ESV_refnum_igstrand.json"]
+
+
+@needs_node
+def test_pool_starts_all_workers(tmp_path):
+    with RefnumWorkerPool(3, str(WORKER_STUB), timeout=10) as pool:
+        pool.start()
+        assert len(pool.workers) == 3
+        assert all(worker.process.poll() is None for worker in pool.workers)
+
+
+@needs_node
+def test_pool_without_a_started_worker(tmp_path):
+    silent_script = tmp_path / "silent.js"
+    silent_script.write_text("setInterval(function() {}, 1000);\n")
+    with RefnumWorkerPool(2, str(silent_script), timeout=1) as pool:
+        with pytest.raises(RuntimeError, match="no refnum worker started"):
+            pool.start()
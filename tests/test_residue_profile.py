@@ -0,0 +1,98 @@
+import math
+import json
+
+import pytest
+
+from alignment_1D_igstrand import run_1d_alignment
+from conftest import SAMPLE_LINES
+from domain_resolver import resolve_input_domains
+from residue_profile import ResidueProfile, write_residue_stats, load_residue_stats, residue_stats_headers
+
+
+@pytest.fixture
+def resolved_domains(input_folder):
+    return resolve_input_domains(SAMPLE_LINES, input_folder, "igstrand")
+
+
+def record(igtype, **igstrand_data):
+    return {"Igtype": igtype, "refpdbname": "ref", "igstrand_data": igstrand_data}
+
+
+def test_statistics_of_a_position():
+    profile = ResidueProfile()
+    for residue, loop in [("C", ""), ("C", ""), ("S", "1"), ("W", "")]:
+        profile.add_domain(record("IgV", B2550=(residue, loop)))
+    profile.add_domain(record("IgV", C3550=("W", ""), B2550=("", ""))) # no residue at B2550
+    profile.add_domain(None)
+
+    rows = {row["position"]: row for row in profile.statistics()}
+    assert list(rows) == ["B2550", "C3550"]
+    row = rows["B2550"]
+    assert (row["group"], row["domains"], row["residues"]) == ("all", 5, 4)
+    assert row["occupancy"] == pytest.approx(0.8)
+    assert row["loop_fraction"] == pytest.approx(0.25)
+    assert row["entropy"] == pytest.approx(1.5)
+    assert (row["consensus"], row["consensus_fraction"]) == ("C", 0.5)
+    assert row["frequencies"] == {"C": 0.5, "S": 0.25, "W": 0.25}
+    assert rows["C3550"]["entropy"] == 0
+
+
+def test_consensus_ties_go_to_the_first_letter():
+    profile = ResidueProfile()
+    for residue in "WCSC W":
+        profile.add_domain(record("IgV", A1550=(residue.strip(), "")))
+    assert profile.statistics()[0]["consensus"] == "C"
+
+
+def test_rows_follow_the_alignment_order(resolved_domains):
+    rows = ResidueProfile().add_domains(resolved_domains).statistics()
+    positions = [row["position"] for row in rows]
+    assert len(positions) == len(set(positions))
+    for row in rows:
+        assert sum(row["frequencies"].values()) == pytest.approx(1)
+        assert 0 <= row["entropy"] <= math.log2(len(row["frequencies"])) + 1e-9
+        assert 0 < row["occupancy"] <= 1
+
+
+@pytest.mark.parametrize("group_by", [None, "Igtype", "refpdbname"])
+def test_merged_shards_equal_the_whole(resolved_domains, tmp_path, group_by):
+    whole = ResidueProfile(group_by).add_domains(resolved_domains)
+    shard_files = []
+    for shard, shard_domains in enumerate([resolved_domains[:2], resolved_domains[2:3], resolved_domains[3:]]):
+        shard_files.append(write_residue_stats(ResidueProfile(group_by).add_domains(shard_domains), tmp_path / f"shard{shard}")[1])
+
+    merged = load_residue_stats(shard_files[0])
+    for shard_file in shard_files[1:]:
+        merged.merge(load_residue_stats(shard_file))
+    assert merged.counts == json.loads(json.dumps(whole.counts))
+    assert merged.statistics() == whole.statistics()
+    write_residue_stats(whole, tmp_path / "whole")
+    write_residue_stats(merged, tmp_path / "merged")
+    assert (tmp_path / "merged.residue_stats.tsv").read_text() == (tmp_path / "whole.residue_stats.tsv").read_text()
+
+
+def test_groups_split_the_domains(resolved_domains):
+    domains = sum(1 for _, map_igstrand_info in resolved_domains if map_igstrand_info)
+    profile = ResidueProfile("Igtype").add_domains(resolved_domains)
+    igtypes = {map_igstrand_info["Igtype"] for _, map_igstrand_info in resolved_domains if map_igstrand_info}
+    assert set(profile.counts) == igtypes
+    assert sum(group_counts["domains"] for group_counts in profile.counts.values()) == domains
+    assert ResidueProfile().add_domains(resolved_domains).counts["all"]["domains"] == domains
+
+
+def test_invalid_profiles_raise_value_error(tmp_path):
+    with pytest.raises(ValueError):
+        ResidueProfile("chain")
+    with pytest.raises(ValueError):
+        ResidueProfile("Igtype").merge(ResidueProfile())
+    with pytest.raises(ValueError):
+        ResidueProfile.from_json({"version": 0, "group_by": None, "counts": {}})
+
+
+def test_1d_run_writes_the_statistics(resolved_domains, tmp_path):
+    output_path = str(tmp_path) + "/"
+    run_1d_alignment(resolved_domains, output_path, "sample", "igstrand", formats=("tsv",), residue_stats="Igtype")
+    write_residue_stats(ResidueProfile("Igtype").add_domains(resolved_domains), tmp_path / "expected")
+    tsv_lines = (tmp_path / "1D_mapping_sampleigstrand.residue_stats.tsv").read_text().splitlines()
+    assert tsv_lines[0].split("\t") == residue_stats_headers
+    assert tsv_lines == (tmp_path / "expected.residue_stats.tsv").read_text().splitlines()
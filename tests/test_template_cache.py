@@ -0,0 +1,95 @@
+import os
+import pickle
+
+import pytest
+
+import alignment_2D_igstrand
+from alignment_2D_igstrand import load_compiled_template, compile_template, open_template_file, TEMPLATE_CACHE_DIR
+from pipeline_profile import enable_profile, profile_snapshot
+
+TEMPLATE_LENGTH = (47, 21)
+
+
+@pytest.fixture
+def template_path(input_folder):
+    enable_profile()
+    return input_folder + "igstrand_template/"
+
+
+def load(template_path):
+    return load_compiled_template("IgC1", "igstrand", template_path, TEMPLATE_LENGTH)
+
+
+def counters():
+    return profile_snapshot()["counters"]
+
+
+def cache_file(template_path):
+    return os.path.join(template_path, TEMPLATE_CACHE_DIR, f"igstrand_template_IgC1.xlsx.{TEMPLATE_LENGTH[0]}x{TEMPLATE_LENGTH[1]}.pkl")
+
+
+def touch(file_path):
+    stat = os.stat(file_path)
+    os.utime(file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+def test_compiled_template_matches_the_xlsx(template_path):
+    compiled = load(template_path)
+    ws, _ = open_template_file("IgC1", "igstrand", template_path)
+    expected = compile_template(ws, TEMPLATE_LENGTH)
+    for key in ["static_values", "number_cells", "text_cells"]:
+        assert compiled[key] == expected[key]
+    assert [cell[:3] for cell in compiled["cells"]] == [cell[:3] for cell in expected["cells"]]
+    assert compiled["number_cells"] and "SHEET A" in compiled["text_cells"]
+
+
+def test_template_is_compiled_once(template_path):
+    first = load(template_path)
+    assert load(template_path) is first
+    assert counters() == {"template_compiles": 1, "template_memory_hits": 1}
+    assert os.path.exists(cache_file(template_path))
+
+
+def test_cache_file_is_used_by_the_next_run(template_path):
+    first = load(template_path)
+    alignment_2D_igstrand._compiled_templates.clear()
+    second = load(template_path)
+    assert second is not first
+    assert second["cells"][0][:3] == first["cells"][0][:3]
+    assert counters() == {"template_compiles": 1, "template_file_hits": 1}
+
+
+def test_changed_xlsx_is_compiled_again(template_path):
+    load(template_path)
+    touch(template_path + "igstrand_template_IgC1.xlsx")
+    load(template_path)
+    alignment_2D_igstrand._compiled_templates.clear()
+    load(template_path)
+    assert counters() == {"template_compiles": 2, "template_file_hits": 1}
+
+
+@pytest.mark.parametrize("cache_content", [b"not a pickle", b"cno_such_module\nStyle\n.", pickle.dumps({"version": -1})],
+                         ids=["broken", "missing_class", "old_version"])
+def test_unusable_cache_file_is_replaced(template_path, cache_content):
+    os.makedirs(os.path.dirname(cache_file(template_path)))
+    with open(cache_file(template_path), "wb") as f:
+        f.write(cache_content)
+    load(template_path)
+    assert counters() == {"template_compiles": 1}
+    with open(cache_file(template_path), "rb") as f:
+        assert pickle.load(f)["version"] == alignment_2D_igstrand.TEMPLATE_CACHE_VERSION
+
+
+def test_cache_file_of_another_openpyxl_is_replaced(template_path, monkeypatch):
+    load(template_path)
+    alignment_2D_igstrand._compiled_templates.clear()
+    monkeypatch.setattr(alignment_2D_igstrand.openpyxl, "__version__", "0.0.1")
+    load(template_path)
+    assert counters() == {"template_compiles": 2}
+    with open(cache_file(template_path), "rb") as f:
+        assert pickle.load(f)["openpyxl"] == "0.0.1"
+
+
+def test_missing_template(template_path):
+    with pytest.raises(FileNotFoundError):
+        load_compiled_template("IgX", "igstrand", template_path, TEMPLATE_LENGTH)